@@ -0,0 +1,122 @@
+import itertools
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+from .routing import haversine_meters
+
+COMPLAINTS_QUERY = """
+MATCH (r:Reclamacao)
+WHERE r.lat IS NOT NULL AND r.lon IS NOT NULL AND r.data_abertura IS NOT NULL
+RETURN r.id AS id, r.servico AS servico, r.lat AS lat, r.lon AS lon,
+       r.data_abertura.epochSeconds AS timestamp
+"""
+
+METERS_PER_DEGREE_LAT = 110540.0
+METERS_PER_DEGREE_LON = 111320.0
+
+# Self bucket plus the 13 neighbours in one half of the 3x3x3 (x, y, time) block,
+# so each unordered pair of buckets is visited once
+HALF_NEIGHBORHOOD = [(0, 0, 0)] + [
+    offset for offset in itertools.product((-1, 0, 1), repeat=3) if offset > (0, 0, 0)
+]
+
+
+def _bucket_pairs(keys, offset):
+    """Index pairs (i, j) between every bucket and the bucket at key + offset"""
+    unique, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+
+    position = np.searchsorted(unique, unique + offset)
+    position = np.minimum(position, len(unique) - 1)
+    found = unique[position] == unique + offset
+
+    a = np.flatnonzero(found)
+    b = position[found]
+    sizes = counts[a] * counts[b]
+    if sizes.sum() == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    block = np.repeat(np.arange(len(a)), sizes)
+    within = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    i = starts[a][block] + within // counts[b][block]
+    j = starts[b][block] + within % counts[b][block]
+
+    if offset == 0:
+        keep = i < j
+        i, j = i[keep], j[keep]
+    return i, j
+
+
+def find_cluster_pairs(frame, radius_meters=200, window_days=7):
+    """Complaint pairs of the same category within radius_meters and window_days.
+
+    Complaints are hashed into radius-sized spatial cells x window-sized time bins per
+    category, so only neighbouring buckets are compared instead of all pairs.
+    Returns (i, j, distance_meters, hours) over the rows of frame.
+    """
+    if len(frame) < 2:
+        empty = np.empty(0)
+        return empty.astype(np.int64), empty.astype(np.int64), empty, empty
+
+    lat = frame['lat'].to_numpy(dtype=np.float64)
+    lon = frame['lon'].to_numpy(dtype=np.float64)
+    ts = frame['timestamp'].to_numpy(dtype=np.float64)
+    category, _ = pd.factorize(frame['servico'].fillna(''))
+
+    window_seconds = window_days * 86400.0
+    x = lon * METERS_PER_DEGREE_LON * np.cos(np.radians(np.nanmean(lat)))
+    y = lat * METERS_PER_DEGREE_LAT
+
+    # Shift every axis to start at 1 and pad by 2 so +/-1 offsets never wrap
+    cx = np.floor(x / radius_meters).astype(np.int64)
+    cy = np.floor(y / radius_meters).astype(np.int64)
+    ct = np.floor(ts / window_seconds).astype(np.int64)
+    cx, cy, ct = cx - cx.min() + 1, cy - cy.min() + 1, ct - ct.min() + 1
+    nx, ny, nt = cx.max() + 2, cy.max() + 2, ct.max() + 2
+
+    keys = ((category.astype(np.int64) * nx + cx) * ny + cy) * nt + ct
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    pairs = []
+    for dx, dy, dt in HALF_NEIGHBORHOOD:
+        offset = (dx * ny + dy) * nt + dt
+        i, j = _bucket_pairs(sorted_keys, offset)
+        if len(i) == 0:
+            continue
+
+        i, j = order[i], order[j]
+        hours = np.abs(ts[i] - ts[j]) / 3600.0
+        distance = haversine_meters(lat[i], lon[i], lat[j], lon[j])
+        keep = (distance <= radius_meters) & (hours <= window_days * 24)
+
+        pairs.append(np.stack([i[keep], j[keep], distance[keep], hours[keep]]))
+
+    if not pairs:
+        empty = np.empty(0)
+        return empty.astype(np.int64), empty.astype(np.int64), empty, empty
+
+    pairs = np.concatenate(pairs, axis=1)
+    return pairs[0].astype(np.int64), pairs[1].astype(np.int64), pairs[2], pairs[3]
+
+
+def cluster_labels(num_complaints, i, j):
+    """Connected components over the pair graph; singletons get -1"""
+    graph = sparse.csr_matrix(
+        (np.ones(len(i)), (i, j)), shape=(num_complaints, num_complaints)
+    )
+    _, labels = connected_components(graph, directed=False)
+
+    sizes = np.bincount(labels)
+    labels = np.where(sizes[labels] > 1, labels, -1)
+
+    # Renumber clusters densely, largest first
+    clustered = labels[labels >= 0]
+    if len(clustered) == 0:
+        return labels, np.ones(num_complaints, dtype=np.int64)
+    ids, counts = np.unique(clustered, return_counts=True)
+    rank = np.full(labels.max() + 1, -1)
+    rank[ids[np.argsort(-counts, kind='stable')]] = np.arange(len(ids))
+    dense = np.where(labels >= 0, rank[np.maximum(labels, 0)], -1)
+    return dense, np.where(labels >= 0, sizes[np.maximum(labels, 0)], 1)
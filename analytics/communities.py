@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+COMMUNITY_STOPS_QUERY = """
+MATCH (s:Stop)
+WHERE s.community_id IS NOT NULL
+RETURN s.id AS id, s.community_id AS community_id, s.lat AS lat, s.lon AS lon,
+       coalesce(s.risk_score, 0.0) AS risk_score
+"""
+
+COMMUNITY_EDGES_QUERY = """
+MATCH (a:Stop)-[:CONNECTS_TO]->(b:Stop)
+WHERE a.community_id IS NOT NULL AND b.community_id IS NOT NULL
+RETURN a.id AS source, b.id AS target
+"""
+
+
+def community_rollup(stops, edges, high_risk_threshold=0.6):
+    """Per-community aggregates and the community x community flow matrix in one pass.
+
+    stops needs id, community_id, lat, lon, risk_score; edges needs source, target.
+    The risk flow of a connection is the mean risk of its two stops. Returns
+    (communities, flows): communities has one row per community with size, risk,
+    centroid and internal connection totals; flows has one row per ordered pair of
+    distinct communities joined by at least one CONNECTS_TO.
+    """
+    stop_ids = stops['id'].to_numpy(dtype=object)
+    labels, community_ids = pd.factorize(stops['community_id'])
+    risk = stops['risk_score'].fillna(0.0).to_numpy(dtype=np.float64)
+    lat = stops['lat'].to_numpy(dtype=np.float64)
+    lon = stops['lon'].to_numpy(dtype=np.float64)
+    k = len(community_ids)
+
+    size = np.bincount(labels, minlength=k)
+    max_risk = np.full(k, -np.inf)
+    np.maximum.at(max_risk, labels, risk)
+
+    communities = pd.DataFrame({
+        'id': community_ids.to_numpy(),
+        'size': size,
+        'avg_risk': np.bincount(labels, weights=risk, minlength=k) / size,
+        'max_risk': max_risk,
+        'high_risk_stops': np.bincount(labels, weights=risk >= high_risk_threshold, minlength=k).astype(np.int64),
+        'centroid_lat': np.bincount(labels, weights=lat, minlength=k) / size,
+        'centroid_lon': np.bincount(labels, weights=lon, minlength=k) / size,
+    })
+
+    index = pd.Series(np.arange(len(stop_ids)), index=stop_ids)
+    sources = edges['source'].map(index)
+    targets = edges['target'].map(index)
+    known = sources.notna() & targets.notna()
+    sources = sources[known].to_numpy(dtype=np.int64)
+    targets = targets[known].to_numpy(dtype=np.int64)
+
+    a, b = labels[sources], labels[targets]
+    edge_risk = (risk[sources] + risk[targets]) / 2.0
+
+    # Summing duplicate (a, b) entries aggregates every stop edge into its community pair
+    counts = sparse.coo_matrix((np.ones(len(a)), (a, b)), shape=(k, k)).tocsr()
+    flows = sparse.coo_matrix((edge_risk, (a, b)), shape=(k, k)).tocsr()
+    counts.sum_duplicates()
+    flows.sum_duplicates()
+
+    communities['internal_connections'] = counts.diagonal().astype(np.int64)
+    communities['internal_risk_flow'] = flows.diagonal()
+    communities['external_connections'] = (
+        np.asarray(counts.sum(axis=1)).ravel() - communities['internal_connections']
+    ).astype(np.int64)
+
+    counts = counts.tocoo()
+    flow_values = np.asarray(flows[counts.row, counts.col]).ravel()
+    between = counts.row != counts.col
+
+    flows = pd.DataFrame({
+        'source': communities['id'].to_numpy()[counts.row[between]],
+        'target': communities['id'].to_numpy()[counts.col[between]],
+        'connections': counts.data[between].astype(np.int64),
+        'risk_flow': flow_values[between],
+    })
+    flows['avg_risk'] = flows['risk_flow'] / flows['connections']
+
+    return communities, flows
+
+
+def _replace_community_graph(tx, communities, flows, batch_size):
+    tx.run("MATCH (c:Community) DETACH DELETE c")
+
+    rows = communities.to_dict('records')
+    for i in range(0, len(rows), batch_size):
+        tx.run("""
+            UNWIND $rows AS row
+            CREATE (c:Community)
+            SET c = row,
+                c.last_update = datetime()
+        """, rows=rows[i:i + batch_size])
+
+    rows = flows.to_dict('records')
+    for i in range(0, len(rows), batch_size):
+        tx.run("""
+            UNWIND $rows AS row
+            MATCH (a:Community {id: row.source})
+            MATCH (b:Community {id: row.target})
+            CREATE (a)-[f:FLOWS_TO]->(b)
+            SET f.connections = row.connections,
+                f.risk_flow = row.risk_flow,
+                f.avg_risk = row.avg_risk
+        """, rows=rows[i:i + batch_size])
+
+
+def write_community_graph(session, communities, flows, batch_size):
+    """Replace Community nodes and FLOWS_TO edges with the given rollup.
+
+    Delete and rebuild share one write transaction, so readers never see an
+    empty or half-written community graph.
+    """
+    session.execute_write(_replace_community_graph, communities, flows, batch_size)
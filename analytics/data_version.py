@@ -0,0 +1,29 @@
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+INITIAL_VERSION = 'initial'
+
+
+def new_data_version():
+    return f"{datetime.now():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+
+def bump_data_version(path, token=None):
+    """Write a new data-version token; readers drop everything cached under the old one"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    token = token or new_data_version()
+    temporary = path.with_name(f".{path.name}.{os.getpid()}")
+    temporary.write_text(token)
+    os.replace(temporary, path)
+    return token
+
+
+def read_data_version(path):
+    try:
+        return Path(path).read_text().strip() or INITIAL_VERSION
+    except FileNotFoundError:
+        return INITIAL_VERSION
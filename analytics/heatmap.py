@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+
+from .neighbors import KEY_STRIDE, KEY_OFFSET
+
+HEATMAP_COLUMNS = ['lat', 'lon', 'count', 'peso']
+
+
+def cell_degrees(zoom, cells_per_tile):
+    """Grid cell size for a zoom level: cells_per_tile cells across one web-map tile"""
+    return 360.0 / 2 ** zoom / cells_per_tile
+
+
+def grid_cells(lats, lons, zoom, cells_per_tile):
+    """Packed int64 grid cell id of every point at one zoom level"""
+    size = cell_degrees(zoom, cells_per_tile)
+    x = np.floor(np.asarray(lons, dtype=np.float64) / size).astype(np.int64)
+    y = np.floor(np.asarray(lats, dtype=np.float64) / size).astype(np.int64)
+    return x * KEY_STRIDE + y + KEY_OFFSET
+
+
+def grid_cell_ids(lat, lon, zooms, cells_per_tile):
+    """The 'grid' subdocument stored on a complaint: {'z<zoom>': cell id} per level"""
+    return {
+        f'z{zoom}': int(grid_cells([lat], [lon], zoom, cells_per_tile)[0])
+        for zoom in zooms
+    }
+
+
+def cell_centers(cells, zoom, cells_per_tile):
+    """(lats, lons) of the centres of packed grid cells"""
+    size = cell_degrees(zoom, cells_per_tile)
+    cells = np.asarray(cells, dtype=np.int64)
+    x = cells // KEY_STRIDE
+    y = cells - x * KEY_STRIDE - KEY_OFFSET
+    return (y + 0.5) * size, (x + 0.5) * size
+
+
+def heatmap_match(zoom, match=None):
+    """$match stage selecting the complaints drawn on the heatmap at one zoom level"""
+    return {'$match': {**(match or {}), f'grid.z{zoom}': {'$exists': True}}}
+
+
+def heatmap_pipeline(zoom, match=None):
+    """MongoDB aggregation of complaint counts and peso sums per stored grid cell"""
+    return [
+        heatmap_match(zoom, match),
+        {'$group': {
+            '_id': f'$grid.z{zoom}',
+            'count': {'$sum': 1},
+            'peso': {'$sum': '$peso'},
+        }},
+    ]
+
+
+def breakdown_pipeline(zoom, fields, match=None):
+    """Complaint counts per value of each field, over the same complaints as the heatmap.
+
+    One $facet per field, so every breakdown comes back in a single document.
+    """
+    return [
+        heatmap_match(zoom, match),
+        {'$facet': {
+            field: [
+                {'$group': {'_id': f'${field}', 'count': {'$sum': 1}}},
+                {'$sort': {'count': -1, '_id': 1}},
+            ]
+            for field in fields
+        }},
+    ]
+
+
+def breakdown_series(result, fields):
+    """{field: counts Series, largest first} from the output document of breakdown_pipeline"""
+    return {
+        field: pd.Series(
+            [group['count'] for group in result.get(field, [])],
+            index=[group['_id'] for group in result.get(field, [])],
+            name='count', dtype=np.int64
+        )
+        for field in fields
+    }
+
+
+def heatmap_frame(groups, zoom, cells_per_tile):
+    """Turn the $group output of heatmap_pipeline into lat/lon/count/peso rows"""
+    if not groups:
+        return pd.DataFrame(columns=HEATMAP_COLUMNS)
+
+    cells = np.fromiter((group['_id'] for group in groups), dtype=np.int64, count=len(groups))
+    lats, lons = cell_centers(cells, zoom, cells_per_tile)
+    return pd.DataFrame({
+        'lat': lats,
+        'lon': lons,
+        'count': np.fromiter((group['count'] for group in groups), dtype=np.int64, count=len(groups)),
+        'peso': np.fromiter((group['peso'] or 0.0 for group in groups), dtype=np.float64, count=len(groups)),
+    })
+
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class RouteStopIncidence:
+    """Sparse route x stop matrix built from (Route)-[:SERVES]->(Stop)"""
+
+    def __init__(self, route_ids, stop_ids, route_codes, stop_codes, trips):
+        self.route_ids = route_ids
+        self.stop_ids = stop_ids
+
+        shape = (len(route_ids), len(stop_ids))
+        ones = np.ones(len(route_codes), dtype=np.float64)
+
+        self.matrix = sparse.csr_matrix((ones, (route_codes, stop_codes)), shape=shape)
+        self.trips = sparse.csr_matrix((trips, (route_codes, stop_codes)), shape=shape)
+
+    @classmethod
+    def from_neo4j(cls, session):
+        result = session.run("""
+            MATCH (r:Route)-[sv:SERVES]->(s:Stop)
+            RETURN r.id AS route_id, s.id AS stop_id,
+                   coalesce(sv.total_trips_daily, 0) AS trips
+        """)
+        rows = result.values()
+
+        if not rows:
+            return None
+
+        route_col, stop_col, trips_col = zip(*rows)
+        route_codes, route_ids = pd.factorize(pd.Series(route_col))
+        stop_codes, stop_ids = pd.factorize(pd.Series(stop_col))
+
+        return cls(
+            route_ids=np.asarray(route_ids),
+            stop_ids=np.asarray(stop_ids),
+            route_codes=route_codes,
+            stop_codes=stop_codes,
+            trips=np.asarray(trips_col, dtype=np.float64)
+        )
+
+    def load_stop_risk(self, session):
+        result = session.run("""
+            MATCH (s:Stop)
+            RETURN s.id AS id, s.risk_score AS risk_score
+        """)
+        risk = pd.DataFrame(result.values(), columns=['id', 'risk_score'])
+        risk = risk.set_index('id')['risk_score'].astype(float)
+
+        return risk.reindex(self.stop_ids).to_numpy()
+
+    def route_metrics(self, risk, high_risk_threshold, percentiles=()):
+        valid = ~np.isnan(risk)
+        risk_filled = np.where(valid, risk, 0.0)
+
+        total_stops = np.diff(self.matrix.indptr)
+        valid_stops = self.matrix @ valid.astype(np.float64)
+        risk_sum = self.matrix @ risk_filled
+        high_risk = self.matrix @ (risk_filled >= high_risk_threshold).astype(np.float64)
+
+        trips_total = self.trips @ valid.astype(np.float64)
+        trips_weighted = self.trips @ risk_filled
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_risk = np.where(valid_stops > 0, risk_sum / valid_stops, np.nan)
+            weighted_risk = np.where(trips_total > 0, trips_weighted / trips_total, avg_risk)
+
+        metrics = pd.DataFrame({
+            'id': self.route_ids,
+            'total_stops': total_stops.astype(np.int64),
+            'avg_risk_score': avg_risk,
+            'high_risk_stops': high_risk.astype(np.int64),
+            'weighted_risk_score': weighted_risk
+        })
+
+        for p, values in self._row_percentiles(risk, percentiles).items():
+            metrics[f'risk_p{p}'] = values
+
+        return metrics
+
+    def _row_percentiles(self, risk, percentiles):
+        if not percentiles:
+            return {}
+
+        # Sort every row's stop risks in one pass; NaNs sort to the end of each row
+        rows = np.repeat(np.arange(self.matrix.shape[0]), np.diff(self.matrix.indptr))
+        values = risk[self.matrix.indices]
+        values = values[np.lexsort((values, rows))]
+
+        starts = self.matrix.indptr[:-1]
+        counts = np.bincount(rows[~np.isnan(values)], minlength=self.matrix.shape[0])
+        has_values = counts > 0
+
+        results = {}
+        for p in percentiles:
+            position = starts + (np.maximum(counts, 1) - 1) * (p / 100.0)
+            lower = np.floor(position).astype(np.int64)
+            upper = np.ceil(position).astype(np.int64)
+            fraction = position - lower
+
+            lower = np.minimum(lower, len(values) - 1)
+            upper = np.minimum(upper, len(values) - 1)
+            interpolated = values[lower] + (values[upper] - values[lower]) * fraction
+
+            results[p] = np.where(has_values, interpolated, np.nan)
+
+        return results
+
+
+def metrics_to_rows(metrics):
+    """Convert a metrics DataFrame to UNWIND-ready dicts with NaN mapped to null"""
+    metrics = metrics.astype(object).where(metrics.notna(), None)
+    return metrics.to_dict('records')
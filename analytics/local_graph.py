@@ -0,0 +1,356 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy import sparse, stats
+
+from .routing import STOPS_QUERY, EDGES_QUERY
+
+_WORKER_GRAPH = None
+
+
+def _init_brandes_worker(n, indptr, indices, multiplicity, rev_indptr, rev_indices, rev_multiplicity):
+    global _WORKER_GRAPH
+    _WORKER_GRAPH = (
+        n,
+        indptr.tolist(), indices.tolist(), multiplicity.tolist(),
+        rev_indptr.tolist(), rev_indices.tolist(), rev_multiplicity.tolist()
+    )
+
+
+def _brandes_sources(sources):
+    """Directed, unweighted Brandes dependency accumulation for a batch of sources.
+
+    Returns per-node sums of dependencies and of squared dependencies, the latter
+    feeding the variance of sampled estimates.
+    """
+    n, indptr, indices, mult, rev_indptr, rev_indices, rev_mult = _WORKER_GRAPH
+    centrality = [0.0] * n
+    squares = [0.0] * n
+
+    for s in sources:
+        sigma = [0.0] * n
+        dist = [-1] * n
+        delta = [0.0] * n
+        sigma[s] = 1.0
+        dist[s] = 0
+        order = [s]
+
+        head = 0
+        while head < len(order):
+            v = order[head]
+            head += 1
+            next_dist = dist[v] + 1
+            for e in range(indptr[v], indptr[v + 1]):
+                w = indices[e]
+                if dist[w] < 0:
+                    dist[w] = next_dist
+                    order.append(w)
+                if dist[w] == next_dist:
+                    # Parallel CONNECTS_TO edges count as distinct shortest paths
+                    sigma[w] += sigma[v] * mult[e]
+
+        for w in reversed(order):
+            coefficient = (1.0 + delta[w]) / sigma[w]
+            prev_dist = dist[w] - 1
+            for e in range(rev_indptr[w], rev_indptr[w + 1]):
+                v = rev_indices[e]
+                if dist[v] == prev_dist:
+                    delta[v] += sigma[v] * rev_mult[e] * coefficient
+            if w != s:
+                centrality[w] += delta[w]
+                squares[w] += delta[w] * delta[w]
+
+    return centrality, squares
+
+
+def _louvain_level(indptr, indices, data, degrees, total_weight, rng):
+    """One Louvain local-moving phase; returns community per node and whether any node moved"""
+    n = len(degrees)
+    community = list(range(n))
+    community_total = list(degrees)
+    moved_any = False
+
+    improved = True
+    while improved:
+        improved = False
+        for i in rng.permutation(n).tolist():
+            current = community[i]
+            k_i = degrees[i]
+
+            links = {}
+            for e in range(indptr[i], indptr[i + 1]):
+                j = indices[e]
+                if j != i:
+                    links[community[j]] = links.get(community[j], 0.0) + data[e]
+
+            community_total[current] -= k_i
+            best = current
+            best_gain = links.get(current, 0.0) - community_total[current] * k_i / total_weight
+
+            for candidate, weight in links.items():
+                gain = weight - community_total[candidate] * k_i / total_weight
+                if gain > best_gain + 1e-12:
+                    best, best_gain = candidate, gain
+
+            community_total[best] += k_i
+            if best != current:
+                community[i] = best
+                improved = True
+                moved_any = True
+
+    return np.asarray(community, dtype=np.int64), moved_any
+
+
+class LocalGraphAnalytics:
+    """In-process PageRank, betweenness and community detection over Stop/CONNECTS_TO"""
+
+    def __init__(self, stop_ids, sources, targets, weights):
+        self.stop_ids = np.asarray(stop_ids, dtype=object)
+        n = len(self.stop_ids)
+        shape = (n, n)
+
+        # Duplicate (source, target) pairs are summed: multiplicity and total weight
+        ones = np.ones(len(sources), dtype=np.float64)
+        self.adjacency = sparse.csr_matrix((ones, (sources, targets)), shape=shape)
+        self.adjacency.sum_duplicates()
+        self.weighted = sparse.csr_matrix((weights, (sources, targets)), shape=shape)
+        self.weighted.sum_duplicates()
+
+    @classmethod
+    def from_frames(cls, stops, edges):
+        stop_ids = stops['id'].drop_duplicates().to_numpy(dtype=object)
+        index = pd.Series(np.arange(len(stop_ids)), index=stop_ids)
+
+        edges = edges.reindex(columns=['source', 'target', 'distance'])
+        sources = edges['source'].map(index)
+        targets = edges['target'].map(index)
+        known = sources.notna() & targets.notna()
+
+        return cls(
+            stop_ids,
+            sources[known].to_numpy(dtype=np.int64),
+            targets[known].to_numpy(dtype=np.int64),
+            edges['distance'][known].fillna(0.0).to_numpy(dtype=np.float64)
+        )
+
+    @classmethod
+    def from_neo4j(cls, session):
+        stops = pd.DataFrame(session.run(STOPS_QUERY).data())
+        edges = pd.DataFrame(session.run(EDGES_QUERY).data())
+        return cls.from_frames(stops, edges)
+
+    @property
+    def num_nodes(self):
+        return len(self.stop_ids)
+
+    @property
+    def num_relationships(self):
+        return int(self.adjacency.sum())
+
+    def pagerank(self, damping=0.85, max_iterations=20, tolerance=1e-7):
+        """Power iteration with the GDS formulation: PR = (1 - d) + d * sum(PR(u) / out(u))"""
+        out_degree = np.asarray(self.adjacency.sum(axis=1)).ravel()
+        inverse_degree = np.divide(1.0, out_degree, out=np.zeros_like(out_degree), where=out_degree > 0)
+        transition = self.adjacency.T.tocsr()
+
+        scores = np.full(self.num_nodes, 1.0 - damping)
+        iterations = 0
+        for iterations in range(1, max_iterations + 1):
+            updated = (1.0 - damping) + damping * (transition @ (scores * inverse_degree))
+            converged = np.max(np.abs(updated - scores)) < tolerance
+            scores = updated
+            if converged:
+                break
+
+        return scores, iterations
+
+    def _brandes(self, sources, workers=None):
+        workers = workers or os.cpu_count() or 1
+        reverse = self.adjacency.T.tocsr()
+        graph_args = (
+            self.num_nodes,
+            self.adjacency.indptr, self.adjacency.indices, self.adjacency.data,
+            reverse.indptr, reverse.indices, reverse.data
+        )
+
+        batches = [b.tolist() for b in np.array_split(sources, max(1, workers * 4)) if len(b)]
+        totals = np.zeros(self.num_nodes)
+        squares = np.zeros(self.num_nodes)
+
+        if workers == 1 or len(batches) == 1:
+            _init_brandes_worker(*graph_args)
+            partials = map(_brandes_sources, batches)
+            for partial_total, partial_squares in partials:
+                totals += partial_total
+                squares += partial_squares
+        else:
+            # Spawned workers: forking from the scheduler's threads can copy held locks
+            with ProcessPoolExecutor(max_workers=workers,
+                                     mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=_init_brandes_worker,
+                                     initargs=graph_args) as executor:
+                for partial_total, partial_squares in executor.map(_brandes_sources, batches):
+                    totals += partial_total
+                    squares += partial_squares
+
+        return totals, squares
+
+    def betweenness(self, sources=None, workers=None):
+        """Unnormalized directed betweenness, Brandes, parallelized over source batches"""
+        if sources is None:
+            sources = np.arange(self.num_nodes)
+        totals, _ = self._brandes(np.asarray(sources, dtype=np.int64), workers)
+        return totals
+
+    def approximate_betweenness(self, initial_sample=256, target_error=0.05, top_k=10,
+                                confidence=0.95, max_sample=None, seed=42, workers=None):
+        """Source-sampled betweenness with adaptive sample size.
+
+        Sources are drawn without replacement and the sample doubles until the
+        confidence-interval half-width of every top-k estimate is within
+        target_error of its value (or the sample covers max_sample / all nodes).
+        Returns (estimate, standard_error, report).
+        """
+        n = self.num_nodes
+        order = np.random.default_rng(seed).permutation(n)
+        max_sample = min(max_sample or n, n)
+        z = float(stats.norm.ppf(0.5 + confidence / 2))
+
+        totals = np.zeros(n)
+        squares = np.zeros(n)
+        sampled = 0
+        batch = min(max(initial_sample, 2), max_sample)
+
+        while True:
+            chunk = order[sampled:sampled + batch]
+            chunk_totals, chunk_squares = self._brandes(chunk, workers)
+            totals += chunk_totals
+            squares += chunk_squares
+            sampled += len(chunk)
+
+            mean = totals / sampled
+            variance = np.maximum(squares / sampled - mean ** 2, 0.0) * sampled / max(sampled - 1, 1)
+            # Finite population correction: the error vanishes once every source is sampled
+            correction = (n - sampled) / max(n - 1, 1)
+            estimate = n * mean
+            std_error = n * np.sqrt(variance / sampled * correction)
+
+            top = np.argsort(estimate)[::-1][:top_k]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                relative = np.where(estimate[top] > 0, z * std_error[top] / estimate[top], 0.0)
+            relative_error = float(relative.max()) if len(relative) else 0.0
+
+            if relative_error <= target_error or sampled >= max_sample:
+                break
+            batch = min(sampled, max_sample - sampled)
+
+        report = {
+            'sample_size': sampled,
+            'exact': sampled >= n,
+            'confidence': confidence,
+            'top_k': top_k,
+            'relative_error': relative_error,
+            'target_error': target_error,
+        }
+        return estimate, std_error, report
+
+    def _undirected_weights(self):
+        symmetric = (self.weighted + self.weighted.T).tocsr()
+        symmetric.sum_duplicates()
+        return symmetric
+
+    def louvain(self, seed=42, max_levels=10):
+        graph = self._undirected_weights()
+        rng = np.random.default_rng(seed)
+        membership = np.arange(self.num_nodes)
+
+        for _ in range(max_levels):
+            degrees = np.asarray(graph.sum(axis=1)).ravel()
+            total_weight = degrees.sum()
+            if total_weight <= 0:
+                break
+
+            community, moved = _louvain_level(
+                graph.indptr.tolist(), graph.indices.tolist(), graph.data.tolist(),
+                degrees.tolist(), total_weight, rng
+            )
+            if not moved:
+                break
+
+            _, community = np.unique(community, return_inverse=True)
+            membership = community[membership]
+
+            # Collapse each community into a node: W' = P^T W P
+            assignment = sparse.csr_matrix(
+                (np.ones(len(community)), (np.arange(len(community)), community)),
+                shape=(len(community), community.max() + 1)
+            )
+            graph = (assignment.T @ graph @ assignment).tocsr()
+
+        return membership
+
+    def label_propagation(self, max_iterations=10, seed=42):
+        """Asynchronous weighted label propagation (adopt the heaviest neighbour label)"""
+        graph = self._undirected_weights()
+        indptr, indices, data = graph.indptr.tolist(), graph.indices.tolist(), graph.data.tolist()
+        rng = np.random.default_rng(seed)
+        labels = list(range(self.num_nodes))
+
+        for _ in range(max_iterations):
+            changed = False
+            for i in rng.permutation(self.num_nodes).tolist():
+                votes = {}
+                for e in range(indptr[i], indptr[i + 1]):
+                    j = indices[e]
+                    if j != i:
+                        votes[labels[j]] = votes.get(labels[j], 0.0) + data[e]
+                if not votes:
+                    continue
+
+                best = max(votes.values())
+                if votes.get(labels[i], -1.0) < best:
+                    labels[i] = min(label for label, weight in votes.items() if weight == best)
+                    changed = True
+            if not changed:
+                break
+
+        _, labels = np.unique(labels, return_inverse=True)
+        return labels
+
+    def communities(self, algorithm='louvain'):
+        if algorithm == 'label_propagation':
+            return self.label_propagation()
+        return self.louvain()
+
+    def modularity(self, labels):
+        graph = self._undirected_weights().tocoo()
+        total_weight = graph.data.sum()
+        if total_weight <= 0:
+            return 0.0
+
+        labels = np.asarray(labels)
+        internal = graph.data[labels[graph.row] == labels[graph.col]].sum()
+        degrees = np.bincount(graph.row, weights=graph.data, minlength=self.num_nodes)
+        community_degree = np.bincount(labels, weights=degrees)
+        return float(internal / total_weight - np.sum((community_degree / total_weight) ** 2))
+
+
+def write_node_properties(session, stop_ids, properties, batch_size):
+    """Batched UNWIND write of per-stop analysis properties"""
+    frame = pd.DataFrame(properties)
+    frame.insert(0, 'id', stop_ids)
+    rows = frame.to_dict('records')
+
+    written = 0
+    for i in range(0, len(rows), batch_size):
+        result = session.run("""
+            UNWIND $rows AS row
+            MATCH (s:Stop {id: row.id})
+            SET s += row
+            RETURN count(s) AS written
+        """, rows=rows[i:i + batch_size])
+        written += result.single()['written']
+
+    return written
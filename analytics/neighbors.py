@@ -0,0 +1,253 @@
+import json
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .data_version import new_data_version
+from .routing import EARTH_RADIUS_METERS, haversine_meters
+
+METERS_PER_DEGREE = np.pi * EARTH_RADIUS_METERS / 180.0
+# Cell y indices are offset so (x, y) packs into one sortable int64 key
+KEY_STRIDE = 1 << 32
+KEY_OFFSET = 1 << 31
+# Name of the saved build StopNeighbors.load() opens
+CURRENT = 'CURRENT'
+# Queries with fewer points run in-process; a pool only pays off for large point sets
+PARALLEL_MIN_POINTS = 10000
+
+_WORKER_GRID = None
+
+
+class SpatialGrid:
+    """Uniform grid over a set of points (stops) for fixed-radius neighbour queries"""
+
+    def __init__(self, lats, lons, cell_meters):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.cell_meters = float(cell_meters)
+
+        # Equirectangular projection scaled at the highest latitude, so projected
+        # distances never exceed great-circle ones and a radius spans at most one cell
+        self.cos_lat = float(np.cos(np.radians(np.nanmax(np.abs(self.lats))))) if len(self.lats) else 1.0
+        keys = self._keys(self.lats, self.lons)
+        self.order = np.argsort(keys, kind='stable')
+        self.sorted_keys = keys[self.order]
+
+    def _cells(self, lats, lons):
+        x = np.floor(lons * METERS_PER_DEGREE * self.cos_lat / self.cell_meters)
+        y = np.floor(lats * METERS_PER_DEGREE / self.cell_meters)
+        return x.astype(np.int64), y.astype(np.int64)
+
+    def _keys(self, lats, lons):
+        cx, cy = self._cells(lats, lons)
+        return cx * KEY_STRIDE + cy + KEY_OFFSET
+
+    def query(self, lats, lons, radius_meters, workers=1):
+        """All (point, indexed point) pairs within radius_meters.
+
+        Returns (point_index, grid_index, distance_meters), ordered by point. The
+        radius must not exceed the cell size. With workers > 1 the query points are
+        split across a process pool.
+        """
+        if radius_meters > self.cell_meters:
+            raise ValueError("radius_meters must not exceed the grid cell size")
+
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        workers = workers or os.cpu_count() or 1
+
+        if workers == 1 or len(lats) < PARALLEL_MIN_POINTS:
+            return self._query_chunk(lats, lons, radius_meters, 0)
+
+        bounds = np.linspace(0, len(lats), workers * 4 + 1).astype(np.int64)
+        chunks = [(lats[a:b], lons[a:b], radius_meters, a) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+        # Spawned workers: forking from the scheduler's threads can copy held locks
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_grid_worker, initargs=(self,)) as executor:
+            parts = list(executor.map(_query_worker, chunks))
+
+        return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+    def _query_chunk(self, lats, lons, radius_meters, start):
+        points = np.flatnonzero(~(np.isnan(lats) | np.isnan(lons)))
+        cx, cy = self._cells(lats[points], lons[points])
+
+        found_points, found_grid = [], []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                keys = (cx + dx) * KEY_STRIDE + (cy + dy) + KEY_OFFSET
+                left = np.searchsorted(self.sorted_keys, keys, side='left')
+                right = np.searchsorted(self.sorted_keys, keys, side='right')
+                counts = right - left
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+
+                owner = np.repeat(np.arange(len(points)), counts)
+                within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                found_points.append(points[owner])
+                found_grid.append(self.order[left[owner] + within])
+
+        if not found_points:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0)
+
+        i = np.concatenate(found_points)
+        j = np.concatenate(found_grid)
+        distance = haversine_meters(lats[i], lons[i], self.lats[j], self.lons[j])
+        keep = distance <= radius_meters
+        i, j, distance = i[keep], j[keep], distance[keep]
+
+        order = np.lexsort((distance, i))
+        return i[order] + start, j[order], distance[order]
+
+
+def _init_grid_worker(grid):
+    global _WORKER_GRID
+    _WORKER_GRID = grid
+
+
+def _query_worker(args):
+    lats, lons, radius_meters, start = args
+    return _WORKER_GRID._query_chunk(lats, lons, radius_meters, start)
+
+
+def stops_near_points(stops, lats, lons, radius_meters, workers=None):
+    """Every (point, stop) pair within radius_meters, e.g. complaints against stops.
+
+    stops needs id, lat, lon. The grid is built over the stops and the points are
+    the queries, so large point sets (complaints) are split across the process
+    pool. Returns point (position in lats/lons), stop_id and distance_meters,
+    ordered by point and distance.
+    """
+    stops = stops.drop_duplicates('id').reset_index(drop=True)
+    grid = SpatialGrid(stops['lat'].to_numpy(dtype=np.float64),
+                       stops['lon'].to_numpy(dtype=np.float64), radius_meters)
+    i, j, distance = grid.query(lats, lons, radius_meters, workers=workers)
+
+    return pd.DataFrame({
+        'point': i,
+        'stop_id': stops['id'].to_numpy()[j],
+        'distance_meters': distance,
+    })
+
+
+class StopNeighbors:
+    """Sparse stop x stop matrix of distances between stops within radius_meters.
+
+    Every stored entry is a neighbour pair, including explicit zeros for stops that
+    share coordinates. Saved as plain .npy arrays so load() can memory-map them.
+    """
+
+    FILES = ('indptr', 'indices', 'distances', 'stop_ids')
+
+    def __init__(self, stop_ids, matrix, radius_meters):
+        self.stop_ids = np.asarray(stop_ids)
+        self.matrix = matrix
+        self.radius_meters = float(radius_meters)
+        self.index = {stop_id: i for i, stop_id in enumerate(self.stop_ids.tolist())}
+
+    @classmethod
+    def build(cls, stop_ids, lats, lons, radius_meters, workers=None):
+        n = len(stop_ids)
+        grid = SpatialGrid(lats, lons, radius_meters)
+        i, j, distance = grid.query(lats, lons, radius_meters, workers=workers)
+
+        keep = i != j
+        i, j, distance = i[keep], j[keep], distance[keep].astype(np.float32)
+
+        # Assemble CSR directly so zero distances stay stored entries
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(i, minlength=n), out=indptr[1:])
+        index_dtype = np.int32 if len(j) < np.iinfo(np.int32).max else np.int64
+        matrix = sparse.csr_matrix(
+            (distance, j.astype(index_dtype), indptr.astype(index_dtype)), shape=(n, n)
+        )
+        return cls(np.asarray(stop_ids).astype(str), matrix, radius_meters)
+
+    @classmethod
+    def from_frame(cls, stops, radius_meters, workers=None):
+        stops = stops.drop_duplicates('id').reset_index(drop=True)
+        return cls.build(
+            stops['id'].to_numpy(), stops['lat'].to_numpy(dtype=np.float64),
+            stops['lon'].to_numpy(dtype=np.float64), radius_meters, workers=workers
+        )
+
+    def save(self, directory, keep=2):
+        """Write the arrays to a new build under directory and point CURRENT at it.
+
+        The build is staged in a temporary directory and renamed, then CURRENT is
+        swapped with os.replace, so a concurrent load() sees the old or the new
+        matrix, never a partial one. Only the newest `keep` builds are kept.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        build = new_data_version()
+        staging = directory / f".{build}.tmp"
+        staging.mkdir()
+
+        np.save(staging / 'indptr.npy', self.matrix.indptr)
+        np.save(staging / 'indices.npy', self.matrix.indices)
+        np.save(staging / 'distances.npy', self.matrix.data)
+        np.save(staging / 'stop_ids.npy', self.stop_ids.astype(str))
+        (staging / 'meta.json').write_text(json.dumps({
+            'radius_meters': self.radius_meters,
+            'num_stops': len(self.stop_ids),
+            'num_pairs': int(self.matrix.nnz),
+        }))
+        staging.rename(directory / build)
+
+        temporary = directory / f".{CURRENT}.{os.getpid()}"
+        temporary.write_text(build)
+        os.replace(temporary, directory / CURRENT)
+
+        builds = sorted(
+            (path for path in directory.iterdir() if (path / 'meta.json').exists()),
+            key=lambda path: path.stat().st_mtime_ns
+        )
+        for path in builds[:-keep] if keep else []:
+            shutil.rmtree(path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        """Open the current saved matrix; arrays are memory-mapped, nothing is recomputed"""
+        directory = Path(directory)
+        directory = directory / (directory / CURRENT).read_text().strip()
+        meta = json.loads((directory / 'meta.json').read_text())
+        arrays = {name: np.load(directory / f'{name}.npy', mmap_mode=mmap_mode) for name in cls.FILES}
+
+        n = meta['num_stops']
+        matrix = sparse.csr_matrix(
+            (arrays['distances'], arrays['indices'], arrays['indptr']), shape=(n, n), copy=False
+        )
+        return cls(arrays['stop_ids'], matrix, meta['radius_meters'])
+
+    @classmethod
+    def exists(cls, directory):
+        return (Path(directory) / CURRENT).exists()
+
+    def neighbors(self, stop_id, radius_meters=None):
+        """Stops within radius_meters (default: the build radius) of stop_id, nearest first"""
+        i = self.index.get(stop_id)
+        if i is None:
+            return pd.DataFrame(columns=['id', 'distance_meters'])
+
+        start, end = self.matrix.indptr[i], self.matrix.indptr[i + 1]
+        columns = np.asarray(self.matrix.indices[start:end])
+        distances = np.asarray(self.matrix.data[start:end], dtype=np.float64)
+        if radius_meters is not None:
+            keep = distances <= radius_meters
+            columns, distances = columns[keep], distances[keep]
+
+        order = np.argsort(distances, kind='stable')
+        return pd.DataFrame({
+            'id': self.stop_ids[columns[order]],
+            'distance_meters': distances[order],
+        })
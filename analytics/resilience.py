@@ -0,0 +1,176 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import shortest_path
+
+RESILIENCE_STOPS_QUERY = """
+MATCH (s:Stop)
+RETURN s.id AS id, s.name AS name,
+       coalesce(s.risk_score, 0.0) AS risk_score,
+       s.risk_level AS risk_level,
+       coalesce(s.betweenness_centrality, 0.0) AS betweenness_centrality
+"""
+
+RESILIENCE_EDGES_QUERY = """
+MATCH (s1:Stop)-[:CONNECTS_TO]->(s2:Stop)
+RETURN DISTINCT s1.id AS source, s2.id AS target
+"""
+
+STRATEGIES = ('risk', 'betweenness', 'critical')
+
+
+def removal_order(stops, strategy='risk'):
+    """Stop positions in the order they are knocked out.
+
+    'risk' ranks by risk_score, 'betweenness' by betweenness_centrality and
+    'critical' takes the stops with risk_level 'Alto' first, by betweenness.
+    """
+    if strategy == 'risk':
+        keys = ['risk_score', 'betweenness_centrality']
+    elif strategy == 'betweenness':
+        keys = ['betweenness_centrality', 'risk_score']
+    elif strategy == 'critical':
+        stops = stops.assign(high_risk=stops['risk_level'].eq('Alto'))
+        keys = ['high_risk', 'betweenness_centrality', 'risk_score']
+    else:
+        raise ValueError(f"Unknown strategy '{strategy}', expected one of {STRATEGIES}")
+
+    ranked = stops.reset_index(drop=True).sort_values(keys, ascending=False, kind='stable')
+    return ranked.index.to_numpy(dtype=np.int64)
+
+
+class ResilienceSimulator:
+    """Connectivity of the stop network, treated as undirected, as stops are removed"""
+
+    def __init__(self, stop_ids, sources, targets):
+        self.stop_ids = np.asarray(stop_ids, dtype=object)
+        n = len(self.stop_ids)
+
+        keep = sources != targets
+        graph = sparse.coo_matrix(
+            (np.ones(int(keep.sum())), (sources[keep], targets[keep])), shape=(n, n)
+        ).tocsr()
+        graph = ((graph + graph.T) > 0).astype(np.float64).tocsr()
+        self.graph = graph
+
+    @classmethod
+    def from_frames(cls, stops, edges):
+        stop_ids = stops['id'].to_numpy(dtype=object)
+        index = pd.Series(np.arange(len(stop_ids)), index=stop_ids)
+
+        sources = edges['source'].map(index)
+        targets = edges['target'].map(index)
+        known = sources.notna() & targets.notna()
+
+        return cls(
+            stop_ids,
+            sources[known].to_numpy(dtype=np.int64),
+            targets[known].to_numpy(dtype=np.int64)
+        )
+
+    @property
+    def num_stops(self):
+        return len(self.stop_ids)
+
+    def sweep(self, order, max_removed):
+        """Component statistics after removing the first k stops of order, for k = 0..max_removed.
+
+        Runs in reverse: the stops are removed up front and added back one at a time
+        with a union-find, so the whole sweep costs a single pass over the edges.
+        Disconnected pairs count unordered pairs of remaining stops with no path.
+        """
+        n = self.num_stops
+        order = np.asarray(order, dtype=np.int64)[:max_removed]
+        max_removed = len(order)
+
+        parent = list(range(n))
+        size = [1] * n
+        present = [False] * n
+
+        indptr, indices = self.graph.indptr.tolist(), self.graph.indices.tolist()
+
+        def find(v):
+            root = v
+            while parent[root] != root:
+                root = parent[root]
+            while parent[v] != root:
+                parent[v], v = root, parent[v]
+            return root
+
+        state = {'pairs': 0, 'components': 0, 'largest': 0}
+
+        def add(v):
+            present[v] = True
+            state['components'] += 1
+            state['largest'] = max(state['largest'], 1)
+            for e in range(indptr[v], indptr[v + 1]):
+                w = indices[e]
+                if not present[w]:
+                    continue
+                a, b = find(v), find(w)
+                if a == b:
+                    continue
+                if size[a] < size[b]:
+                    a, b = b, a
+                state['pairs'] += size[a] * size[b]
+                parent[b] = a
+                size[a] += size[b]
+                state['components'] -= 1
+                state['largest'] = max(state['largest'], size[a])
+
+        # Build the graph with every stop in order removed, then restore them in reverse
+        removed = set(order.tolist())
+        for v in range(n):
+            if v not in removed:
+                add(v)
+
+        rows = []
+        for k in range(max_removed, -1, -1):
+            remaining = n - k
+            total_pairs = remaining * (remaining - 1) // 2
+            rows.append({
+                'removed': k,
+                'remaining_stops': remaining,
+                'components': state['components'],
+                'largest_component': state['largest'],
+                'largest_component_fraction': state['largest'] / n if n else 0.0,
+                'connected_pairs': state['pairs'],
+                'disconnected_pairs': total_pairs - state['pairs'],
+                'disconnected_fraction': 1.0 - state['pairs'] / total_pairs if total_pairs else 0.0,
+            })
+            if k > 0:
+                add(int(order[k - 1]))
+
+        return pd.DataFrame(rows[::-1])
+
+    def average_path_length(self, removed, sample_size=200, seed=42):
+        """Mean hop count between a sample of remaining stops and every stop they reach"""
+        keep = np.ones(self.num_stops, dtype=bool)
+        keep[np.asarray(removed, dtype=np.int64)] = False
+        remaining = np.flatnonzero(keep)
+        if len(remaining) < 2:
+            return float('nan')
+
+        graph = self.graph[remaining][:, remaining]
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(len(remaining), size=min(sample_size, len(remaining)), replace=False)
+
+        lengths = shortest_path(graph, directed=False, unweighted=True, indices=sample)
+        finite = lengths[np.isfinite(lengths) & (lengths > 0)]
+        return float(finite.mean()) if len(finite) else float('nan')
+
+    def simulate(self, order, max_removed=500, checkpoints=(0, 1, 5, 10, 25, 50, 100, 250, 500),
+                 sample_size=200, seed=42):
+        """Full component sweep plus sampled path lengths at the checkpoints"""
+        sweep = self.sweep(order, max_removed)
+        sweep['avg_path_length'] = np.nan
+
+        order = np.asarray(order, dtype=np.int64)
+        for k in sorted(set(checkpoints)):
+            if k > sweep['removed'].max():
+                continue
+            sweep.loc[sweep['removed'] == k, 'avg_path_length'] = self.average_path_length(
+                order[:k], sample_size=sample_size, seed=seed
+            )
+
+        return sweep
@@ -0,0 +1,475 @@
+import heapq
+import math
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import dijkstra
+
+EARTH_RADIUS_METERS = 6371008.8
+
+STOPS_QUERY = """
+MATCH (s:Stop)
+RETURN s.id AS id, s.name AS name, s.lat AS lat, s.lon AS lon,
+       coalesce(s.risk_score, 0.0) AS risk_score
+"""
+
+EDGES_QUERY = """
+MATCH (s1:Stop)-[c:CONNECTS_TO]->(s2:Stop)
+RETURN s1.id AS source, s2.id AS target,
+       c.distance_meters AS distance,
+       c.risk_adjusted_cost AS cost,
+       c.travel_time_seconds AS travel_time
+"""
+
+WEIGHTS = ('distance', 'cost', 'travel_time')
+TRADEOFF_STEPS = (0.0, 0.25, 0.5, 0.75, 1.0)
+
+
+def haversine_meters(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class TransitGraph:
+    """Stop/CONNECTS_TO network held as CSR arrays for in-memory path queries"""
+
+    def __init__(self, stops, edges, tree_cache_size=256):
+        stops = stops.drop_duplicates('id').reset_index(drop=True)
+        edges = edges.reindex(columns=['source', 'target', 'distance', 'cost', 'travel_time'])
+
+        self.stop_ids = stops['id'].to_numpy(dtype=object)
+        self.names = stops['name'].fillna('').to_numpy(dtype=object)
+        self.lats = stops['lat'].to_numpy(dtype=np.float64)
+        self.lons = stops['lon'].to_numpy(dtype=np.float64)
+        self.risk = stops['risk_score'].fillna(0.0).to_numpy(dtype=np.float64)
+        self.index = {stop_id: i for i, stop_id in enumerate(self.stop_ids)}
+
+        sources = edges['source'].map(self.index)
+        targets = edges['target'].map(self.index)
+        known = sources.notna() & targets.notna()
+
+        distance = edges['distance'].fillna(0.0).astype(np.float64)
+        frame = pd.DataFrame({
+            'source': sources[known].astype(np.int64),
+            'target': targets[known].astype(np.int64),
+            'distance': distance[known],
+            'cost': edges['cost'].astype(np.float64).fillna(distance)[known],
+            'travel_time': edges['travel_time'].fillna(0.0).astype(np.float64)[known],
+        })
+
+        # One CONNECTS_TO exists per route serving a stop pair: collapse them
+        frame = (frame.groupby(['source', 'target'], sort=True)
+                      .min()
+                      .reset_index())
+
+        self.targets = frame['target'].to_numpy(dtype=np.int64)
+        self.sources = frame['source'].to_numpy(dtype=np.int64)
+        self.offsets = np.zeros(len(self.stop_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.sources, minlength=len(self.stop_ids)), out=self.offsets[1:])
+
+        self.weights = {name: frame[name].to_numpy(dtype=np.float64) for name in WEIGHTS}
+
+        # Python-list views are much faster than NumPy scalars inside the heap loop
+        self._offsets = self.offsets.tolist()
+        self._targets = self.targets.tolist()
+        self._weights = {name: values.tolist() for name, values in self.weights.items()}
+        self._lat_rad = np.radians(self.lats).tolist()
+        self._lon_rad = np.radians(self.lons).tolist()
+        self._cos_lat = np.cos(np.radians(self.lats)).tolist()
+        self._heuristic_scale = self._admissible_scales()
+
+        self._blended = {}
+        self._matrices = {}
+        # One graph serves every webapp session, so the LRUs are shared across threads
+        self._cache_lock = threading.Lock()
+        self._trees = OrderedDict()
+        self._reach = OrderedDict()
+        self._reverse = None
+        self.tree_cache_size = tree_cache_size
+
+    @classmethod
+    def from_neo4j(cls, session):
+        stops = pd.DataFrame(session.run(STOPS_QUERY).data())
+        edges = pd.DataFrame(session.run(EDGES_QUERY).data())
+        return cls(stops, edges)
+
+    @property
+    def num_stops(self):
+        return len(self.stop_ids)
+
+    @property
+    def num_edges(self):
+        return len(self.targets)
+
+    def _admissible_scales(self):
+        # Largest c with c * straight_line(u, v) <= weight(u, v) on every edge keeps
+        # c * straight_line(node, target) an admissible, consistent A* heuristic
+        straight = haversine_meters(
+            self.lats[self.sources], self.lons[self.sources],
+            self.lats[self.targets], self.lons[self.targets]
+        )
+        usable = straight > 1.0
+        scales = {}
+        for name, values in self.weights.items():
+            if name == 'travel_time' or not usable.any():
+                scales[name] = 0.0
+                continue
+            scales[name] = float(min(1.0, np.min(values[usable] / straight[usable])))
+        return scales
+
+    def _heuristic(self, target, scale):
+        if scale <= 0.0 or np.isnan(self.lats[target]):
+            return None
+
+        lat_rad, lon_rad, cos_lat = self._lat_rad, self._lon_rad, self._cos_lat
+        t_lat, t_lon, t_cos = lat_rad[target], lon_rad[target], cos_lat[target]
+        factor = 2 * EARTH_RADIUS_METERS * scale
+
+        def h(v):
+            a = (math.sin((lat_rad[v] - t_lat) / 2) ** 2
+                 + cos_lat[v] * t_cos * math.sin((lon_rad[v] - t_lon) / 2) ** 2)
+            if a != a:
+                return 0.0
+            return factor * math.asin(math.sqrt(min(a, 1.0)))
+
+        return h
+
+    def _search(self, source, target, weights, scale, banned_nodes=None, banned_edges=None):
+        offsets = self._offsets
+        targets = self._targets
+
+        h = self._heuristic(target, scale)
+
+        dist = {source: 0.0}
+        parent = {source: -1}
+        done = set()
+        heap = [(0.0 if h is None else h(source), 0.0, source)]
+
+        while heap:
+            _, d, u = heapq.heappop(heap)
+            if u in done:
+                continue
+            done.add(u)
+            if u == target:
+                break
+
+            for e in range(offsets[u], offsets[u + 1]):
+                v = targets[e]
+                if banned_nodes and v in banned_nodes:
+                    continue
+                if banned_edges and e in banned_edges:
+                    continue
+                nd = d + weights[e]
+                if nd < dist.get(v, float('inf')):
+                    dist[v] = nd
+                    parent[v] = u
+                    priority = nd if h is None else nd + h(v)
+                    heapq.heappush(heap, (priority, nd, v))
+
+        if target not in done:
+            return None, len(done)
+
+        path = [target]
+        while parent[path[-1]] != -1:
+            path.append(parent[path[-1]])
+        path.reverse()
+        return path, len(done)
+
+    def _bounded_search(self, source, budget, weights):
+        """Dijkstra from source that stops expanding past budget; returns settle order"""
+        offsets = self._offsets
+        targets = self._targets
+
+        dist = {source: 0.0}
+        parent = {source: -1}
+        order = []
+        done = set()
+        heap = [(0.0, source)]
+
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in done:
+                continue
+            done.add(u)
+            order.append(u)
+
+            for e in range(offsets[u], offsets[u + 1]):
+                v = targets[e]
+                nd = d + weights[e]
+                if nd <= budget and nd < dist.get(v, float('inf')):
+                    dist[v] = nd
+                    parent[v] = u
+                    heapq.heappush(heap, (nd, v))
+
+        return order, dist, parent
+
+    def _cache_get(self, cache, key):
+        with self._cache_lock:
+            value = cache.get(key)
+            if value is not None:
+                cache.move_to_end(key)
+            return value
+
+    def _cache_put(self, cache, key, value):
+        with self._cache_lock:
+            cache[key] = value
+            cache.move_to_end(key)
+            while len(cache) > self.tree_cache_size:
+                cache.popitem(last=False)
+
+    def reachable(self, source_id, budget, weight='travel_time'):
+        """Every stop reachable from source_id within budget along weight.
+
+        Returns a DataFrame ordered by cost with the hops of the cheapest path and the
+        risk exposure along it: exposure sums the risk_score of the stops passed
+        after the origin, max_risk is the riskiest of them. Results are cached per
+        (stop, weight, budget).
+        """
+        if weight not in self.weights:
+            raise ValueError(f"Unknown weight '{weight}', expected one of {WEIGHTS}")
+
+        source = self.index.get(source_id)
+        if source is None:
+            return None
+
+        cache_key = (source, weight, float(budget))
+        cached = self._cache_get(self._reach, cache_key)
+        if cached is not None:
+            return cached
+
+        order, dist, parent = self._bounded_search(source, float(budget), self._weights[weight])
+
+        # Settle order puts every parent before its children
+        risk = self.risk
+        hops = {source: 0}
+        exposure = {source: 0.0}
+        max_risk = {source: 0.0}
+        for v in order[1:]:
+            u = parent[v]
+            hops[v] = hops[u] + 1
+            exposure[v] = exposure[u] + risk[v]
+            max_risk[v] = max(max_risk[u], risk[v])
+
+        nodes = np.asarray(order, dtype=np.int64)
+        result = pd.DataFrame({
+            'id': self.stop_ids[nodes],
+            'name': self.names[nodes],
+            'lat': self.lats[nodes],
+            'lon': self.lons[nodes],
+            'risk_score': risk[nodes],
+            weight: [dist[v] for v in order],
+            'hops': [hops[v] for v in order],
+            'exposure': [exposure[v] for v in order],
+            'max_risk': [max_risk[v] for v in order],
+        })
+
+        self._cache_put(self._reach, cache_key, result)
+        return result
+
+    def neighbors(self, source_id, hops=1):
+        """Stop ids within hops connections of source_id, ignoring direction"""
+        source = self.index.get(source_id)
+        if source is None:
+            return []
+
+        if self._reverse is None:
+            order = np.argsort(self.targets, kind='stable')
+            offsets = np.zeros(self.num_stops + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.targets, minlength=self.num_stops), out=offsets[1:])
+            self._reverse = (offsets.tolist(), self.sources[order].tolist())
+
+        adjacency = [(self._offsets, self._targets), self._reverse]
+        seen = {source}
+        frontier = [source]
+        for _ in range(hops):
+            next_frontier = []
+            for u in frontier:
+                for offsets, targets in adjacency:
+                    for e in range(offsets[u], offsets[u + 1]):
+                        v = targets[e]
+                        if v not in seen:
+                            seen.add(v)
+                            next_frontier.append(v)
+            frontier = next_frontier
+
+        seen.discard(source)
+        return [self.stop_ids[v] for v in seen]
+
+    def _edge_position(self, u, v):
+        start, end = self._offsets[u], self._offsets[u + 1]
+        return start + int(np.searchsorted(self.targets[start:end], v))
+
+    def _edge_positions(self, path):
+        positions = [self._edge_position(u, v) for u, v in zip(path, path[1:])]
+        return np.asarray(positions, dtype=np.int64)
+
+    def describe_path(self, path):
+        edges = self._edge_positions(path)
+        return {
+            'stop_ids': [self.stop_ids[i] for i in path],
+            'names': [self.names[i] for i in path],
+            'coordinates': [(self.lats[i], self.lons[i]) for i in path],
+            'hops': len(path) - 1,
+            'distance_meters': float(self.weights['distance'][edges].sum()),
+            'risk_adjusted_cost': float(self.weights['cost'][edges].sum()),
+            'travel_time_seconds': float(self.weights['travel_time'][edges].sum()),
+            'max_stop_risk': float(self.risk[path].max()),
+            'avg_stop_risk': float(self.risk[path].mean()),
+        }
+
+    def shortest_path(self, source_id, target_id, weight='cost', use_heuristic=True):
+        """Dijkstra, or A* with a haversine heuristic, between two stop ids.
+
+        weight='cost' follows risk_adjusted_cost (safest path),
+        weight='distance' follows distance_meters (shortest path).
+        """
+        if weight not in self.weights:
+            raise ValueError(f"Unknown weight '{weight}', expected one of {WEIGHTS}")
+
+        source = self.index.get(source_id)
+        target = self.index.get(target_id)
+        if source is None or target is None:
+            return None
+
+        scale = self._heuristic_scale[weight] if use_heuristic else 0.0
+        path, expanded = self._search(source, target, self._weights[weight], scale)
+        if path is None:
+            return None
+
+        result = self.describe_path(path)
+        result['weight'] = weight
+        result['expanded_stops'] = expanded
+        return result
+
+    def safest_path(self, source_id, target_id):
+        return self.shortest_path(source_id, target_id, weight='cost')
+
+    def _blend(self, risk_weight):
+        """Edge weights (1 - a) * distance + a * risk_adjusted_cost and their A* scale"""
+        key = round(float(risk_weight), 4)
+        if not 0.0 <= key <= 1.0:
+            raise ValueError("risk_weight must be between 0 and 1")
+
+        if key not in self._blended:
+            values = (1.0 - key) * self.weights['distance'] + key * self.weights['cost']
+            scale = ((1.0 - key) * self._heuristic_scale['distance']
+                     + key * self._heuristic_scale['cost'])
+            self._blended[key] = (values, values.tolist(), scale)
+
+        return key, self._blended[key]
+
+    def shortest_path_tree(self, source, risk_weight=1.0):
+        """Cached full Dijkstra tree (distances, predecessors) from a stop index"""
+        key, (values, _, _) = self._blend(risk_weight)
+
+        cache_key = (source, key)
+        cached = self._cache_get(self._trees, cache_key)
+        if cached is not None:
+            return cached
+
+        if key not in self._matrices:
+            # Built from raw CSR arrays so zero-length connections stay explicit edges
+            self._matrices[key] = sparse.csr_matrix(
+                (values, self.targets, self.offsets),
+                shape=(self.num_stops, self.num_stops)
+            )
+
+        tree = dijkstra(self._matrices[key], indices=source, return_predecessors=True)
+        self._cache_put(self._trees, cache_key, tree)
+        return tree
+
+    def _tree_path(self, source, target, risk_weight):
+        distances, predecessors = self.shortest_path_tree(source, risk_weight)
+        if not np.isfinite(distances[target]):
+            return None
+
+        path = [target]
+        while path[-1] != source:
+            path.append(int(predecessors[path[-1]]))
+        path.reverse()
+        return path
+
+    def _path_weight(self, path, values):
+        return float(values[self._edge_positions(path)].sum())
+
+    def k_shortest_paths(self, source_id, target_id, k=3, risk_weight=1.0):
+        """Yen's k loopless shortest paths under a distance/risk blended weight.
+
+        risk_weight=0 ranks by distance_meters, 1 by risk_adjusted_cost.
+        """
+        source = self.index.get(source_id)
+        target = self.index.get(target_id)
+        if source is None or target is None:
+            return []
+
+        key, (values, weights, scale) = self._blend(risk_weight)
+
+        first = self._tree_path(source, target, key)
+        if first is None:
+            return []
+
+        accepted = [first]
+        seen = {tuple(first)}
+        candidates = []
+
+        while len(accepted) < k:
+            previous = accepted[-1]
+
+            for i in range(len(previous) - 1):
+                spur = previous[i]
+                root = previous[:i + 1]
+
+                banned_edges = {
+                    self._edge_position(path[i], path[i + 1])
+                    for path in accepted
+                    if len(path) > i + 1 and path[:i + 1] == root
+                }
+                banned_nodes = set(root[:-1])
+
+                spur_path, _ = self._search(spur, target, weights, scale,
+                                            banned_nodes=banned_nodes,
+                                            banned_edges=banned_edges)
+                if spur_path is None:
+                    continue
+
+                candidate = root[:-1] + spur_path
+                if tuple(candidate) in seen:
+                    continue
+
+                seen.add(tuple(candidate))
+                heapq.heappush(candidates, (self._path_weight(candidate, values), candidate))
+
+            if not candidates:
+                break
+
+            accepted.append(heapq.heappop(candidates)[1])
+
+        results = []
+        for rank, path in enumerate(accepted, 1):
+            result = self.describe_path(path)
+            result['rank'] = rank
+            result['risk_weight'] = key
+            result['blended_cost'] = self._path_weight(path, values)
+            results.append(result)
+        return results
+
+    def pareto_paths(self, source_id, target_id, k=3, risk_weights=TRADEOFF_STEPS):
+        """Non-dominated (distance_meters, risk_adjusted_cost) paths across tradeoffs"""
+        pool = {}
+        for risk_weight in risk_weights:
+            for path in self.k_shortest_paths(source_id, target_id, k=k, risk_weight=risk_weight):
+                pool.setdefault(tuple(path['stop_ids']), path)
+
+        paths = sorted(pool.values(), key=lambda p: (p['distance_meters'], p['risk_adjusted_cost']))
+
+        frontier = []
+        best_cost = float('inf')
+        for path in paths:
+            if path['risk_adjusted_cost'] < best_cost:
+                frontier.append(path)
+                best_cost = path['risk_adjusted_cost']
+        return frontier
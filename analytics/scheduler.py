@@ -0,0 +1,110 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class Stage:
+    """A named unit of work that may start once every stage in depends_on has finished"""
+
+    def __init__(self, name, fn, depends_on=()):
+        self.name = name
+        self.fn = fn
+        self.depends_on = tuple(depends_on)
+
+
+def _topological_order(stages):
+    by_name = {stage.name: stage for stage in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("Duplicate stage names")
+
+    for stage in stages:
+        missing = [d for d in stage.depends_on if d not in by_name]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' depends on unknown stages: {missing}")
+
+    order, state = [], {}
+
+    def visit(name):
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise ValueError(f"Dependency cycle through stage '{name}'")
+        state[name] = 'visiting'
+        for dependency in by_name[name].depends_on:
+            visit(dependency)
+        state[name] = 'done'
+        order.append(by_name[name])
+
+    for stage in stages:
+        visit(stage.name)
+    return order
+
+
+def run_stages(stages, max_workers=4):
+    """Run stages on a bounded thread pool, each as soon as its dependencies finish.
+
+    Returns {name: (start, end)} in seconds since the scheduler started. If a stage
+    raises, no new stages are started, running ones are awaited and the first
+    error is re-raised.
+    """
+    order = _topological_order(stages)
+    remaining = {stage.name: set(stage.depends_on) for stage in order}
+    timings = {}
+    origin = time.perf_counter()
+
+    def timed(stage):
+        start = time.perf_counter() - origin
+        stage.fn()
+        return start, time.perf_counter() - origin
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        running = {}
+        error = None
+
+        while remaining or running:
+            if error is None:
+                ready = [stage for stage in order
+                         if stage.name in remaining and not remaining[stage.name]]
+                for stage in ready:
+                    del remaining[stage.name]
+                    running[executor.submit(timed, stage)] = stage.name
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    timings[name] = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                for dependencies in remaining.values():
+                    dependencies.discard(name)
+
+        if error is not None:
+            raise error
+
+    return timings
+
+
+def critical_path(stages, timings):
+    """Longest dependency chain by measured stage durations: (stage names, seconds)"""
+    finish, previous = {}, {}
+
+    for stage in _topological_order(stages):
+        start, end = timings[stage.name]
+        before = max(stage.depends_on, key=lambda d: finish[d], default=None)
+        finish[stage.name] = (end - start) + (finish[before] if before else 0.0)
+        previous[stage.name] = before
+
+    if not finish:
+        return [], 0.0
+
+    name = max(finish, key=finish.get)
+    total = finish[name]
+    path = []
+    while name is not None:
+        path.append(name)
+        name = previous[name]
+    return path[::-1], total
@@ -0,0 +1,143 @@
+import json
+import os
+import shutil
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .system_stats import read_system_stats
+
+SNAPSHOT_STOPS_QUERY = """
+MATCH (s:Stop)
+RETURN s.id as id, s.name as name, s.lat as lat, s.lon as lon,
+       s.risk_score as risk_score,
+       COALESCE(s.risk_score_normalized, 0) as risk_score_normalized,
+       s.risk_level as risk_level,
+       s.total_reclamacoes as total_complaints
+ORDER BY s.risk_score_normalized DESC
+"""
+
+SNAPSHOT_ROUTES_QUERY = """
+MATCH (r:Route)
+RETURN r.id as id, r.short_name as name, r.long_name as full_name,
+       r.avg_risk_score as avg_risk, r.total_stops as total_stops,
+       r.high_risk_stops as high_risk_stops
+ORDER BY r.avg_risk_score DESC
+"""
+
+SNAPSHOT_EDGES_QUERY = """
+MATCH (s1:Stop)-[c:CONNECTS_TO]->(s2:Stop)
+RETURN s1.id as source, s2.id as target, s1.name as source_name,
+       s2.name as target_name, c.distance_meters as distance,
+       c.risk_adjusted_cost as cost, s1.risk_score as source_risk,
+       s2.risk_score as target_risk
+"""
+
+TABLES = {
+    'stops': SNAPSHOT_STOPS_QUERY,
+    'routes': SNAPSHOT_ROUTES_QUERY,
+    'edges': SNAPSHOT_EDGES_QUERY,
+}
+MANIFEST = 'manifest.json'
+# Names the bundle readers serve, independent of the data version
+CURRENT = 'CURRENT'
+
+
+class Snapshot:
+    """Dashboard tables and system stats exported for one data version"""
+
+    def __init__(self, version, tables, stats):
+        self.version = version
+        self.tables = tables
+        self.stats = stats
+
+    @property
+    def stops(self):
+        return self.tables['stops']
+
+    @property
+    def routes(self):
+        return self.tables['routes']
+
+    @property
+    def edges(self):
+        return self.tables['edges']
+
+
+def write_snapshot(session, directory, version, keep=2):
+    """Export the dashboard tables as Parquet and the system stats as JSON.
+
+    The bundle is written to <directory>/<version>/ through a temporary directory
+    and published by renaming and then pointing CURRENT at it, so readers never see
+    a partial snapshot. Only the newest `keep` bundles are kept. Returns the bundle
+    path.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    target = directory / version
+    staging = directory / f".{version}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+
+    rows = {}
+    for name, query in TABLES.items():
+        frame = pd.DataFrame(session.run(query).data())
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), staging / f"{name}.parquet")
+        rows[name] = len(frame)
+
+    stats = read_system_stats(session) or {}
+    (staging / 'stats.json').write_text(json.dumps(stats, default=str))
+    (staging / MANIFEST).write_text(json.dumps({'version': version, 'rows': rows}))
+
+    shutil.rmtree(target, ignore_errors=True)
+    staging.rename(target)
+
+    temporary = directory / f".{CURRENT}.{os.getpid()}"
+    temporary.write_text(version)
+    os.replace(temporary, directory / CURRENT)
+
+    bundles = sorted(
+        (path for path in directory.iterdir() if (path / MANIFEST).exists()),
+        key=lambda path: path.stat().st_mtime_ns
+    )
+    for path in bundles[:-keep] if keep else []:
+        shutil.rmtree(path, ignore_errors=True)
+
+    return target
+
+
+def current_snapshot_version(directory):
+    """Version of the bundle CURRENT points at, or None"""
+    try:
+        return (Path(directory) / CURRENT).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def retire_snapshot(directory):
+    """Stop serving the current bundle, for steps that change the exported tables
+    without writing a new one; readers go live until the next write_snapshot"""
+    (Path(directory) / CURRENT).unlink(missing_ok=True)
+
+
+def load_snapshot(directory, version=None):
+    """The bundle written for version (default: the CURRENT one), or None if there is none.
+
+    Parquet files are opened memory-mapped, so loading reads pages straight from
+    the OS cache instead of copying the files through Python buffers.
+    """
+    version = version or current_snapshot_version(directory)
+    if version is None:
+        return None
+
+    path = Path(directory) / version
+    if not (path / MANIFEST).exists():
+        return None
+
+    tables = {
+        name: pq.read_table(path / f"{name}.parquet", memory_map=True).to_pandas()
+        for name in TABLES
+    }
+    stats = json.loads((path / 'stats.json').read_text())
+    return Snapshot(version, tables, stats)
@@ -0,0 +1,131 @@
+import json
+import os
+import numpy as np
+
+NAME_FIELDS = ['name', 'nome', 'NOME', 'bairro', 'BAIRRO', 'nome_bairro']
+REGION_FIELDS = ['regiao', 'REGIAO', 'regiao_adm', 'rp', 'RP']
+POPULATION_FIELDS = ['populacao', 'POPULACAO', 'pop', 'populacao_2010']
+
+
+def _first_field(properties, fields, default=None):
+    for field in fields:
+        if properties.get(field) not in (None, ''):
+            return properties[field]
+    return default
+
+
+def load_polygons_geojson(path):
+    """Read Polygon/MultiPolygon features as lists of (lon, lat) rings"""
+    if not path or not os.path.exists(path):
+        return []
+
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    polygons = []
+    for feature in data.get('features', []):
+        geometry = feature.get('geometry') or {}
+        properties = feature.get('properties') or {}
+
+        if geometry.get('type') == 'Polygon':
+            parts = [geometry['coordinates']]
+        elif geometry.get('type') == 'MultiPolygon':
+            parts = geometry['coordinates']
+        else:
+            continue
+
+        name = _first_field(properties, NAME_FIELDS)
+        if name is None:
+            continue
+
+        rings = [np.asarray(ring, dtype=np.float64)[:, :2] for part in parts for ring in part]
+        population = _first_field(properties, POPULATION_FIELDS, 0)
+
+        polygons.append({
+            'name': str(name),
+            'regiao': str(_first_field(properties, REGION_FIELDS, '')),
+            'populacao': int(float(population or 0)),
+            'rings': rings
+        })
+
+    return polygons
+
+
+def points_in_rings(lons, lats, rings):
+    """Even-odd ray casting of many points against a polygon's rings (holes included)"""
+    inside = np.zeros(len(lons), dtype=bool)
+
+    for ring in rings:
+        x1, y1 = ring[:, 0], ring[:, 1]
+        x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+
+        px = lons[:, None]
+        py = lats[:, None]
+
+        crosses = (y1 > py) != (y2 > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_at_y = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= np.logical_xor.reduce(crosses & (px < x_at_y), axis=1)
+
+    return inside
+
+
+class PolygonIndex:
+    """Uniform grid over polygon bounding boxes for batch point-in-polygon assignment"""
+
+    def __init__(self, polygons, cell_size_deg=0.01):
+        self.polygons = polygons
+        self.cell_size = cell_size_deg
+        self.cells = {}
+
+        for idx, polygon in enumerate(polygons):
+            coords = np.vstack(polygon['rings'])
+            min_x, min_y = np.floor(coords.min(axis=0) / self.cell_size).astype(int)
+            max_x, max_y = np.floor(coords.max(axis=0) / self.cell_size).astype(int)
+
+            for cx in range(min_x, max_x + 1):
+                for cy in range(min_y, max_y + 1):
+                    self.cells.setdefault((cx, cy), []).append(idx)
+
+    def assign(self, lats, lons, max_cells=2_000_000):
+        """Return the polygon index containing each point, or -1"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        assigned = np.full(len(lats), -1, dtype=np.int64)
+
+        valid = ~(np.isnan(lats) | np.isnan(lons))
+        cell_x = np.floor(np.where(valid, lons, 0) / self.cell_size).astype(int)
+        cell_y = np.floor(np.where(valid, lats, 0) / self.cell_size).astype(int)
+
+        # Group points by grid cell, then group cells by candidate polygon
+        candidates = {}
+        keys, inverse = np.unique(np.stack([cell_x, cell_y], axis=1), axis=0, return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+
+        for k, (cx, cy) in enumerate(keys):
+            members = order[bounds[k]:bounds[k + 1]]
+            members = members[valid[members]]
+            for idx in self.cells.get((int(cx), int(cy)), []):
+                candidates.setdefault(idx, []).append(members)
+
+        for idx, member_lists in candidates.items():
+            members = np.concatenate(member_lists)
+            members = members[assigned[members] < 0]
+
+            # Bound the points x edges comparison matrix for detailed polygons
+            longest_ring = max(len(ring) for ring in self.polygons[idx]['rings'])
+            chunk_size = max(256, max_cells // longest_ring)
+
+            for start in range(0, len(members), chunk_size):
+                chunk = members[start:start + chunk_size]
+                inside = points_in_rings(lons[chunk], lats[chunk], self.polygons[idx]['rings'])
+                assigned[chunk[inside]] = idx
+
+        return assigned
+
+    def assign_names(self, lats, lons):
+        assigned = self.assign(lats, lons)
+        names = np.array([p['name'] for p in self.polygons] + [None], dtype=object)
+        return names[assigned]
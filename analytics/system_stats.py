@@ -0,0 +1,85 @@
+SYSTEM_STATS_NAME = 'global'
+
+# Plain label counts are answered from the count store without touching nodes.
+# total_stops counts scored stops only, so it lives in STOP_STATS_QUERY.
+COUNTS_QUERY = """
+CALL { MATCH (r:Route) RETURN count(r) AS total_routes }
+CALL { MATCH (rec:Reclamacao) RETURN count(rec) AS total_complaints }
+RETURN total_routes, total_complaints
+"""
+
+STOP_STATS_QUERY = """
+MATCH (s:Stop)
+WHERE s.risk_score IS NOT NULL
+RETURN count(s) AS total_stops,
+       avg(s.risk_score) AS avg_risk_score,
+       avg(s.risk_score_normalized) AS avg_risk,
+       percentileCont(s.risk_score_normalized, 0.67) AS p67,
+       count(CASE WHEN s.risk_level = 'Alto' THEN 1 END) AS high_risk_stops,
+       count(CASE WHEN s.risk_score >= $high_risk THEN 1 END) AS high_risk_count
+"""
+
+COMPLAINT_STATS_QUERY = """
+MATCH (rec:Reclamacao)
+RETURN count(CASE WHEN rec.status = 'Aberto' THEN 1 END) AS open_complaints
+"""
+
+TOP_CATEGORIES_QUERY = """
+MATCH (c:Categoria)
+WITH c, COUNT { (c)<-[:HAS_TYPE]-(:Reclamacao) } AS total
+ORDER BY total DESC
+LIMIT $limit
+RETURN collect(c.nome) AS top_category_names, collect(total) AS top_category_counts
+"""
+
+READ_QUERY = """
+MATCH (m:SystemStats {name: $name})
+RETURN m.total_stops AS total_stops,
+       m.total_routes AS total_routes,
+       m.total_complaints AS total_complaints,
+       m.open_complaints AS open_complaints,
+       m.avg_risk AS avg_risk,
+       m.avg_risk_score AS avg_risk_score,
+       m.p67 AS p67,
+       m.high_risk_stops AS high_risk_stops,
+       m.high_risk_count AS high_risk_count,
+       m.top_category_names AS top_category_names,
+       m.top_category_counts AS top_category_counts,
+       m.updated_at AS updated_at
+"""
+
+
+def _store(session, values):
+    session.run("""
+        MERGE (m:SystemStats {name: $name})
+        SET m += $values,
+            m.updated_at = datetime()
+    """, name=SYSTEM_STATS_NAME, values=values)
+
+
+def refresh_system_stats(session, high_risk_threshold, top_categories=5):
+    """Recompute every figure on the SystemStats node (one scan per label)"""
+    values = session.run(COUNTS_QUERY).single().data()
+    values.update(session.run(STOP_STATS_QUERY, high_risk=high_risk_threshold).single().data())
+    values.update(session.run(COMPLAINT_STATS_QUERY).single().data())
+    values.update(session.run(TOP_CATEGORIES_QUERY, limit=top_categories).single().data())
+
+    _store(session, values)
+    return values
+
+
+def record_complaint_sync(session, open_delta):
+    """Refresh label counts and shift the open-complaint count by open_delta"""
+    values = session.run(COUNTS_QUERY).single().data()
+    session.run("""
+        MERGE (m:SystemStats {name: $name})
+        SET m += $values,
+            m.open_complaints = coalesce(m.open_complaints, 0) + $open_delta,
+            m.updated_at = datetime()
+    """, name=SYSTEM_STATS_NAME, values=values, open_delta=open_delta)
+
+
+def read_system_stats(session):
+    """The SystemStats node as a dict, or None before the first refresh"""
+    record = session.run(READ_QUERY, name=SYSTEM_STATS_NAME).single()
+    return record.data() if record else None
@@ -0,0 +1,294 @@
+import gzip
+import hashlib
+import json
+import math
+import sqlite3
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Stored with each build; a store written with a different layout is rebuilt from scratch
+TILE_SCHEMA_VERSION = '1'
+
+FEATURE_COLUMNS = ['layer', 'key', 'geometry', 'properties', 'min_lon', 'min_lat',
+                   'max_lon', 'max_lat', 'min_zoom', 'max_zoom']
+
+MAX_MERCATOR_LAT = 85.0511287798
+
+
+def tile_range(min_lon, min_lat, max_lon, max_lat, zoom):
+    """Inclusive XYZ tile index ranges (x0, y0, x1, y1) covering bounding boxes"""
+    n = 2 ** zoom
+
+    def tile_x(lon):
+        return np.clip(np.floor((np.asarray(lon) + 180.0) / 360.0 * n), 0, n - 1).astype(np.int64)
+
+    def tile_y(lat):
+        lat = np.radians(np.clip(np.asarray(lat, dtype=np.float64), -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+        y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * n
+        return np.clip(np.floor(y), 0, n - 1).astype(np.int64)
+
+    # Tile rows grow southwards, so the northern edge gives the first row
+    return tile_x(min_lon), tile_y(max_lat), tile_x(max_lon), tile_y(min_lat)
+
+
+def tile_bounds(zoom, x, y):
+    """(min_lon, min_lat, max_lon, max_lat) of an XYZ tile"""
+    n = 2 ** zoom
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+def _cover(features, zoom):
+    """(feature position, x, y) for every tile of zoom each feature's bbox touches"""
+    active = np.flatnonzero(
+        (features['min_zoom'].to_numpy() <= zoom) & (features['max_zoom'].to_numpy() >= zoom)
+    )
+    if len(active) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+
+    x0, y0, x1, y1 = tile_range(
+        features['min_lon'].to_numpy()[active], features['min_lat'].to_numpy()[active],
+        features['max_lon'].to_numpy()[active], features['max_lat'].to_numpy()[active], zoom
+    )
+    width = x1 - x0 + 1
+    counts = width * (y1 - y0 + 1)
+
+    owner = np.repeat(np.arange(len(active)), counts)
+    within = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+    return active[owner], x0[owner] + within % width[owner], y0[owner] + within // width[owner]
+
+
+def _feature(layer, key, geometry, properties, lons, lats, min_zoom, max_zoom):
+    return {
+        'layer': layer,
+        'key': str(key),
+        'geometry': json.dumps(geometry, separators=(',', ':')),
+        'properties': json.dumps(properties, separators=(',', ':'), default=str),
+        'min_lon': min(lons), 'min_lat': min(lats),
+        'max_lon': max(lons), 'max_lat': max(lats),
+        'min_zoom': min_zoom, 'max_zoom': max_zoom,
+    }
+
+
+def _clean(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def tile_features(stops, edges, complaint_cells, min_zoom, max_zoom, connections_min_zoom=13):
+    """Flat feature table for the tile layers connections and complaints.
+
+    stops needs id, lat, lon, risk_score and places the connections; the stop
+    markers themselves come from the viewport query. edges needs source and
+    target ids. complaint_cells maps a heatmap zoom level to its
+    lat/lon/count/peso frame; each level is drawn from its own zoom up to the
+    next level's.
+    """
+    rows = []
+
+    positions = stops.drop_duplicates('id').set_index('id')
+    edges = edges[edges['source'].isin(positions.index) & edges['target'].isin(positions.index)]
+    edges = edges.drop_duplicates(['source', 'target'])
+    a = positions.loc[edges['source']]
+    b = positions.loc[edges['target']]
+    for source, target, lat1, lon1, lat2, lon2, risk1, risk2 in zip(
+            edges['source'], edges['target'], a['lat'], a['lon'], b['lat'], b['lon'],
+            a['risk_score'], b['risk_score']):
+        if any(_clean(v) is None for v in (lat1, lon1, lat2, lon2)):
+            continue
+        lons = [round(float(lon1), 6), round(float(lon2), 6)]
+        lats = [round(float(lat1), 6), round(float(lat2), 6)]
+        risk = (_clean(risk1) or 0.0) / 2 + (_clean(risk2) or 0.0) / 2
+        rows.append(_feature('connections', f"{source}>{target}", {
+            'type': 'LineString', 'coordinates': [[lons[0], lats[0]], [lons[1], lats[1]]]
+        }, {'source': source, 'target': target, 'risk': round(risk, 4)},
+            lons, lats, max(connections_min_zoom, min_zoom), max_zoom))
+
+    levels = sorted(complaint_cells)
+    for i, level in enumerate(levels):
+        first = min_zoom if i == 0 else level
+        last = levels[i + 1] - 1 if i + 1 < len(levels) else max_zoom
+        for cell in complaint_cells[level].itertuples(index=False):
+            lon, lat = round(float(cell.lon), 6), round(float(cell.lat), 6)
+            rows.append(_feature('complaints', f"{level}:{lon}:{lat}", {
+                'type': 'Point', 'coordinates': [lon, lat]
+            }, {'count': int(cell.count), 'peso': round(float(cell.peso), 3), 'level': level},
+                [lon], [lat], first, last))
+
+    return pd.DataFrame(rows, columns=FEATURE_COLUMNS)
+
+
+class TileStore:
+    """Tile pyramid of the map layers in an MBTiles-schema SQLite file.
+
+    Tiles hold gzipped GeoJSON (one FeatureCollection per layer) rather than
+    Mapbox vector tile protobufs, which folium cannot draw. The features of the
+    last build are kept alongside, so update() only rewrites the tiles touched by
+    features that were added, removed or changed since.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def _connect(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path)
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS tiles (
+                zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row);
+            CREATE TABLE IF NOT EXISTS features (
+                layer TEXT, key TEXT, fingerprint TEXT,
+                min_lon REAL, min_lat REAL, max_lon REAL, max_lat REAL,
+                min_zoom INTEGER, max_zoom INTEGER,
+                PRIMARY KEY (layer, key)
+            );
+        """)
+        return conn
+
+    def exists(self):
+        return self.path.exists()
+
+    def metadata(self):
+        with sqlite3.connect(self.path) as conn:
+            return dict(conn.execute("SELECT name, value FROM metadata"))
+
+    def update(self, features, min_zoom, max_zoom, full=False):
+        """Bring the pyramid in line with features; returns (tiles written, tiles deleted)"""
+        features = features.reset_index(drop=True)
+        features['fingerprint'] = [
+            hashlib.sha1(f"{g}|{p}|{a}|{b}".encode()).hexdigest()
+            for g, p, a, b in zip(features['geometry'], features['properties'],
+                                  features['min_zoom'], features['max_zoom'])
+        ]
+
+        conn = self._connect()
+        try:
+            meta = dict(conn.execute("SELECT name, value FROM metadata"))
+            full = full or meta.get('schema_version') != TILE_SCHEMA_VERSION or \
+                meta.get('minzoom') != str(min_zoom) or meta.get('maxzoom') != str(max_zoom)
+
+            previous = pd.read_sql_query("SELECT * FROM features", conn)
+            if full:
+                changed, stale = features, previous
+            else:
+                merged = features[['layer', 'key', 'fingerprint']].merge(
+                    previous[['layer', 'key', 'fingerprint']], on=['layer', 'key'],
+                    how='outer', suffixes=('', '_old'), indicator=True
+                )
+                differs = merged['_merge'].ne('both') | merged['fingerprint'].ne(merged['fingerprint_old'])
+                keys = merged.loc[differs, ['layer', 'key']]
+                changed = features.merge(keys, on=['layer', 'key'])
+                stale = previous.merge(keys, on=['layer', 'key'])
+
+            written = deleted = 0
+            with conn:
+                if full:
+                    conn.execute("DELETE FROM tiles")
+
+                layers = features['layer'].tolist()
+                encoded = [
+                    f'{{"type":"Feature","id":{json.dumps(f"{layer}:{key}")},'
+                    f'"geometry":{geometry},"properties":{properties}}}'
+                    for layer, key, geometry, properties in zip(
+                        layers, features['key'], features['geometry'], features['properties'])
+                ]
+
+                for zoom in range(min_zoom, max_zoom + 1):
+                    n = 2 ** zoom
+                    dirty = np.unique(np.concatenate([
+                        xs * n + ys for _, xs, ys in (_cover(changed, zoom), _cover(stale, zoom))
+                    ]))
+                    if len(dirty) == 0:
+                        continue
+
+                    # Group the features of the dirty tiles by tile key
+                    positions, xs, ys = _cover(features, zoom)
+                    keys = xs * n + ys
+                    keep = np.isin(keys, dirty)
+                    order = np.argsort(keys[keep], kind='stable')
+                    positions, keys = positions[keep][order], keys[keep][order]
+                    tiles, starts = np.unique(keys, return_index=True)
+
+                    # MBTiles rows are TMS: counted from the south
+                    conn.executemany("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?)", (
+                        (zoom, tile // n, n - 1 - tile % n, self._encode(layers, encoded, members))
+                        for tile, members in zip(tiles.tolist(), np.split(positions, starts[1:]))
+                    ))
+                    written += len(tiles)
+
+                    empty = np.setdiff1d(dirty, tiles).tolist()
+                    deleted += conn.executemany(
+                        "DELETE FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+                        ((zoom, tile // n, n - 1 - tile % n) for tile in empty)
+                    ).rowcount
+
+                conn.execute("DELETE FROM features")
+                conn.executemany(
+                    "INSERT INTO features VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    features[['layer', 'key', 'fingerprint', 'min_lon', 'min_lat', 'max_lon',
+                              'max_lat', 'min_zoom', 'max_zoom']].itertuples(index=False)
+                )
+                bounds = []
+                if len(features):
+                    bounds = [features['min_lon'].min(), features['min_lat'].min(),
+                              features['max_lon'].max(), features['max_lat'].max()]
+                conn.executemany("INSERT OR REPLACE INTO metadata VALUES (?, ?)", [
+                    ('name', 'riomobi'),
+                    ('format', 'json'),
+                    ('minzoom', str(min_zoom)),
+                    ('maxzoom', str(max_zoom)),
+                    ('bounds', ','.join(f"{v:.6f}" for v in bounds)),
+                    ('schema_version', TILE_SCHEMA_VERSION),
+                ])
+        finally:
+            conn.close()
+
+        return written, deleted
+
+    @staticmethod
+    def _encode(layers, encoded, positions):
+        """gzipped {layer: FeatureCollection} JSON of the features at positions"""
+        grouped = {}
+        for position in positions.tolist():
+            grouped.setdefault(layers[position], []).append(encoded[position])
+        body = ','.join(
+            f'"{layer}":{{"type":"FeatureCollection","features":[{",".join(items)}]}}'
+            for layer, items in grouped.items()
+        )
+        return gzip.compress(f'{{{body}}}'.encode())
+
+    def read(self, zoom, bounds):
+        """Layers of the tiles covering bounds (south, west, north, east) at zoom.
+
+        Returns {layer: FeatureCollection}; features crossing tile borders appear once.
+        """
+        meta = self.metadata()
+        zoom = min(max(int(zoom), int(meta['minzoom'])), int(meta['maxzoom']))
+        south, west, north, east = bounds
+        x0, y0, x1, y1 = (int(v) for v in tile_range(west, south, east, north, zoom))
+        rows = (2 ** zoom - 1 - y1, 2 ** zoom - 1 - y0)
+
+        with sqlite3.connect(self.path) as conn:
+            blobs = conn.execute("""
+                SELECT tile_data FROM tiles
+                WHERE zoom_level = ? AND tile_column BETWEEN ? AND ? AND tile_row BETWEEN ? AND ?
+            """, (zoom, x0, x1, rows[0], rows[1])).fetchall()
+
+        layers, seen = {}, set()
+        for (blob,) in blobs:
+            for layer, collection in json.loads(gzip.decompress(blob)).items():
+                target = layers.setdefault(layer, {'type': 'FeatureCollection', 'features': []})
+                for feature in collection['features']:
+                    if feature['id'] not in seen:
+                        seen.add(feature['id'])
+                        target['features'].append(feature)
+        return layers
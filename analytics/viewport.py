@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+
+from .neighbors import KEY_STRIDE, KEY_OFFSET
+
+CLUSTER_COLUMNS = ['lat', 'lon', 'count', 'avg_risk', 'max_risk', 'high_risk_stops']
+
+
+class StopViewport:
+    """Bounding-box lookups and per-zoom clusters over a stops frame.
+
+    Stops are kept sorted by longitude, so a bbox query is two binary searches plus
+    a latitude mask over the longitude slice. Below detail_zoom the stops are
+    pre-aggregated into grid clusters, cells_per_tile cells across each web-map
+    tile of that zoom, so zoomed-out views never ship individual markers.
+    """
+
+    def __init__(self, stops, detail_zoom=15, cells_per_tile=4, max_markers=2000,
+                 risk_column='risk_score_normalized'):
+        stops = stops[stops['lat'].notna() & stops['lon'].notna()]
+        self.stops = stops.sort_values('lon', kind='stable').reset_index(drop=True)
+        self.lons = self.stops['lon'].to_numpy(dtype=np.float64)
+        self.lats = self.stops['lat'].to_numpy(dtype=np.float64)
+        self.detail_zoom = detail_zoom
+        self.max_markers = max_markers
+
+        risk = self.stops[risk_column].fillna(0.0).to_numpy(dtype=np.float64)
+        high_risk = self.stops['risk_level'].eq('Alto').to_numpy(dtype=bool)
+
+        self.clusters = {
+            zoom: self._aggregate(360.0 / 2 ** zoom / cells_per_tile, risk, high_risk)
+            for zoom in range(detail_zoom)
+        }
+
+    def _aggregate(self, cell_degrees, risk, high_risk):
+        if len(self.lats) == 0:
+            return pd.DataFrame(columns=CLUSTER_COLUMNS)
+
+        # Pack (x, y) cells into one int64 key; 1-D unique is much faster than axis=0
+        x = np.floor(self.lons / cell_degrees).astype(np.int64)
+        y = np.floor(self.lats / cell_degrees).astype(np.int64)
+        _, labels = np.unique(x * KEY_STRIDE + y + KEY_OFFSET, return_inverse=True)
+        labels = labels.ravel()
+        k = labels.max() + 1
+
+        count = np.bincount(labels, minlength=k)
+        max_risk = np.full(k, -np.inf)
+        np.maximum.at(max_risk, labels, risk)
+
+        clusters = pd.DataFrame({
+            'lat': np.bincount(labels, weights=self.lats, minlength=k) / count,
+            'lon': np.bincount(labels, weights=self.lons, minlength=k) / count,
+            'count': count,
+            'avg_risk': np.bincount(labels, weights=risk, minlength=k) / count,
+            'max_risk': max_risk,
+            'high_risk_stops': np.bincount(labels, weights=high_risk, minlength=k).astype(np.int64),
+        })
+        return clusters.sort_values('lon', kind='stable').reset_index(drop=True)
+
+    def in_bounds(self, south, west, north, east):
+        """Stops inside the bounding box"""
+        left = np.searchsorted(self.lons, west, side='left')
+        right = np.searchsorted(self.lons, east, side='right')
+        lats = self.lats[left:right]
+        keep = np.flatnonzero((lats >= south) & (lats <= north)) + left
+        return self.stops.iloc[keep]
+
+    def clusters_in_bounds(self, zoom, south, west, north, east):
+        """Clusters of the given zoom level whose centroid lies inside the bounding box"""
+        clusters = self.clusters[min(max(int(zoom), 0), self.detail_zoom - 1)]
+        lons = clusters['lon'].to_numpy()
+        left = np.searchsorted(lons, west, side='left')
+        right = np.searchsorted(lons, east, side='right')
+        window = clusters.iloc[left:right]
+        return window[window['lat'].between(south, north)]
+
+    def view(self, bounds, zoom):
+        """('stops', frame) or ('clusters', frame) for a viewport.
+
+        bounds is (south, west, north, east) or None for the whole dataset. Individual
+        stops are returned from detail_zoom on, or earlier when the viewport holds no
+        more than max_markers stops.
+        """
+        if bounds is None:
+            bounds = (-90.0, -180.0, 90.0, 180.0)
+
+        stops = self.in_bounds(*bounds)
+        if int(zoom) >= self.detail_zoom or len(stops) <= self.max_markers:
+            return 'stops', stops
+        return 'clusters', self.clusters_in_bounds(zoom, *bounds)
@@ -14,9 +14,88 @@ GOOGLE_MAPS_API_KEY = os.getenv('GOOGLE_MAPS_API_KEY', '')
 
 GTFS_DIR = os.getenv('GTFS_DIR', './data/gtfs/')
 RECLAMACOES_1746_FILE = os.getenv('RECLAMACOES_FILE', './data/1746/chamados_v2.csv')
+NEIGHBORHOODS_FILE = os.getenv('NEIGHBORHOODS_FILE', './data/neighborhoods/bairros.geojson')
+ARTIFACTS_DIR = os.getenv('ARTIFACTS_DIR', './data/artifacts/')
+# Bumped by every pipeline step that changes data; the webapp cache is keyed by it
+DATA_VERSION_FILE = os.getenv('DATA_VERSION_FILE', os.path.join(ARTIFACTS_DIR, 'data_version'))
+# Webapp query cache: in-process LRU, plus a SQLite file shared by server processes when set
+WEBAPP_CACHE_MAX_ENTRIES = int(os.getenv('WEBAPP_CACHE_MAX_ENTRIES', '256'))
+WEBAPP_CACHE_DB = os.getenv('WEBAPP_CACHE_DB', '')
+# Threads used to fetch a stop panel's independent drill-down queries at once
+WEBAPP_FETCH_WORKERS = int(os.getenv('WEBAPP_FETCH_WORKERS', '5'))
+# Parquet/JSON bundles exported by the metrics and analysis steps for the dashboard
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', os.path.join(ARTIFACTS_DIR, 'snapshots'))
+WEBAPP_USE_SNAPSHOT = os.getenv('WEBAPP_USE_SNAPSHOT', 'true').lower() == 'true'
 
 BATCH_SIZE = 1000
-MAX_DISTANCE_AFFECTS_METERS = 100
+MAX_DISTANCE_AFFECTS_METERS = int(os.getenv('MAX_DISTANCE_AFFECTS_METERS', '100'))
+# Sync links complaints to every stop within the search radius (NEAR); the metrics
+# step derives AFFECTS for MAX_DISTANCE_AFFECTS_METERS, so any radius up to it and
+# any kernel can be tried without re-syncing
+AFFECTS_SEARCH_RADIUS_METERS = int(os.getenv('AFFECTS_SEARCH_RADIUS_METERS', '300'))
+# Distance decay of risk_contribution = peso * kernel(distance):
+# 'flat' (1), 'linear' (1 - d / radius), 'gaussian' or 'exponential' over the bandwidth
+RISK_DECAY_KERNELS = ('flat', 'linear', 'gaussian', 'exponential')
+RISK_DECAY_KERNEL = os.getenv('RISK_DECAY_KERNEL', 'flat')
+if RISK_DECAY_KERNEL not in RISK_DECAY_KERNELS:
+    raise ValueError(f"Unknown RISK_DECAY_KERNEL '{RISK_DECAY_KERNEL}', expected one of {RISK_DECAY_KERNELS}")
+RISK_DECAY_BANDWIDTH_METERS = float(os.getenv('RISK_DECAY_BANDWIDTH_METERS', '50'))
+HIGH_RISK_THRESHOLD = 0.6
+
+# 'matrix' computes route metrics from a sparse route x stop incidence matrix,
+# 'cypher' keeps the per-route aggregation inside Neo4j
+ROUTE_METRICS_MODE = os.getenv('ROUTE_METRICS_MODE', 'matrix')
+ROUTE_RISK_PERCENTILES = [50, 75, 90]
+
+# 'gds' uses the Graph Data Science plugin, 'local' the in-process SciPy engine,
+# 'auto' falls back to 'local' when GDS is not installed
+ANALYSIS_BACKEND = os.getenv('ANALYSIS_BACKEND', 'auto')
+LOCAL_COMMUNITY_ALGORITHM = os.getenv('LOCAL_COMMUNITY_ALGORITHM', 'louvain')
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', '0')) or None
+# Independent analysis stages run concurrently, each in its own session; 1 runs them in order
+ANALYSIS_STAGE_WORKERS = int(os.getenv('ANALYSIS_STAGE_WORKERS', '4'))
+
+# Betweenness source sampling, 0 runs exact betweenness. With the local engine the
+# sample doubles until the top-k estimates are within the target relative error
+BETWEENNESS_SAMPLE_SIZE = int(os.getenv('BETWEENNESS_SAMPLE_SIZE', '0'))
+BETWEENNESS_MAX_SAMPLE_SIZE = int(os.getenv('BETWEENNESS_MAX_SAMPLE_SIZE', '0')) or None
+BETWEENNESS_TARGET_ERROR = float(os.getenv('BETWEENNESS_TARGET_ERROR', '0.1'))
+BETWEENNESS_CONFIDENCE = 0.95
+BETWEENNESS_TOP_K = 10
+
+# Precomputed stop x stop neighbour matrix (memory-mapped .npy arrays)
+NEIGHBOR_RADIUS_METERS = int(os.getenv('NEIGHBOR_RADIUS_METERS', '500'))
+NEIGHBOR_MATRIX_DIR = os.getenv('NEIGHBOR_MATRIX_DIR', os.path.join(ARTIFACTS_DIR, 'stop_neighbors'))
+
+# Viewport stop map: individual markers from MAP_DETAIL_ZOOM on (or when the view holds
+# at most MAP_MAX_MARKERS stops), grid clusters with this many cells per tile below it
+MAP_DETAIL_ZOOM = int(os.getenv('MAP_DETAIL_ZOOM', '15'))
+MAP_MAX_MARKERS = int(os.getenv('MAP_MAX_MARKERS', '2000'))
+MAP_CLUSTER_CELLS_PER_TILE = int(os.getenv('MAP_CLUSTER_CELLS_PER_TILE', '4'))
+
+# Most CONNECTS_TO edges the network graph page loads and draws (WebGL traces)
+NETWORK_GRAPH_MAX_EDGES = int(os.getenv('NETWORK_GRAPH_MAX_EDGES', '20000'))
+
+# Complaint heatmap: grid cell ids stored on each MongoDB complaint at these zoom levels,
+# HEATMAP_CELLS_PER_TILE cells across a map tile (14 -> cells of roughly 300 m)
+HEATMAP_ZOOM_LEVELS = [10, 12, 14]
+HEATMAP_CELLS_PER_TILE = int(os.getenv('HEATMAP_CELLS_PER_TILE', '8'))
+
+# Map tile pyramid (MBTiles-schema SQLite of gzipped GeoJSON tiles) from scripts/build_tiles.py
+TILES_FILE = os.getenv('TILES_FILE', os.path.join(ARTIFACTS_DIR, 'map_tiles.mbtiles'))
+TILE_MIN_ZOOM = int(os.getenv('TILE_MIN_ZOOM', '10'))
+TILE_MAX_ZOOM = int(os.getenv('TILE_MAX_ZOOM', '16'))
+TILE_CONNECTIONS_MIN_ZOOM = 13
+
+# Resilience simulation: stops removed per strategy and sampled sources for path lengths
+RESILIENCE_MAX_REMOVED = int(os.getenv('RESILIENCE_MAX_REMOVED', '500'))
+RESILIENCE_SAMPLE_SIZE = int(os.getenv('RESILIENCE_SAMPLE_SIZE', '200'))
+RESILIENCE_CHECKPOINTS = [0, 1, 5, 10, 25, 50, 100, 250, 500]
+
+# Complaint clustering: same category within the radius and time window
+CLUSTER_RADIUS_METERS = 200
+CLUSTER_WINDOW_DAYS = 7
+CLUSTER_WRITE_EDGES = os.getenv('CLUSTER_WRITE_EDGES', 'true').lower() == 'true'
 
 CATEGORIA_PESOS = {
     'Segurança Pública': 1.5,
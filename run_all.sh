@@ -30,6 +30,7 @@ run_script "03_load_1746_to_mongodb.py" || exit 1
 run_script "04_sync_1746_to_neo4j.py" || exit 1
 run_script "05_calculate_metrics.py" || exit 1
 run_script "06_run_analyses.py" || exit 1
+run_script "build_tiles.py" || exit 1
 
 echo "=============================================="
 echo "${GREEN}Full load complete${NC}"
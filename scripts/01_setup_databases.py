@@ -58,7 +58,8 @@ def setup_neo4j():
                 "CREATE CONSTRAINT trip_id_unique IF NOT EXISTS FOR (t:Trip) REQUIRE t.id IS UNIQUE",
                 "CREATE CONSTRAINT reclamacao_id_unique IF NOT EXISTS FOR (rec:Reclamacao) REQUIRE rec.id IS UNIQUE",
                 "CREATE CONSTRAINT neighborhood_name_unique IF NOT EXISTS FOR (n:Neighborhood) REQUIRE n.name IS UNIQUE",
-                "CREATE CONSTRAINT categoria_nome_unique IF NOT EXISTS FOR (c:Categoria) REQUIRE c.nome IS UNIQUE"
+                "CREATE CONSTRAINT categoria_nome_unique IF NOT EXISTS FOR (c:Categoria) REQUIRE c.nome IS UNIQUE",
+                "CREATE CONSTRAINT community_id_unique IF NOT EXISTS FOR (c:Community) REQUIRE c.id IS UNIQUE"
             ]
 
             for constraint in constraints:
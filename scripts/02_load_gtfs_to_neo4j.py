@@ -3,6 +3,9 @@ import pandas as pd
 import numpy as np
 from neo4j import GraphDatabase
 from tqdm import tqdm
+from analytics.data_version import bump_data_version
+from analytics.snapshot import retire_snapshot
+from analytics.spatial import load_polygons_geojson
 import config
 import sys
 import zipfile
@@ -222,27 +225,43 @@ class GTFSLoader:
     def create_neighborhoods(self):
         print("Setting up neighborhoods...")
 
-        neighborhoods = [
-            {"name": "Copacabana", "regiao": "Zona Sul", "populacao": 146392},
-            {"name": "Ipanema", "regiao": "Zona Sul", "populacao": 42080},
-            {"name": "Centro", "regiao": "Centro", "populacao": 41142},
-            {"name": "Botafogo", "regiao": "Zona Sul", "populacao": 82890},
-            {"name": "Tijuca", "regiao": "Zona Norte", "populacao": 181839},
-            {"name": "Barra da Tijuca", "regiao": "Zona Oeste", "populacao": 300823},
-        ]
+        polygons = load_polygons_geojson(config.NEIGHBORHOODS_FILE)
+
+        if polygons:
+            neighborhoods = [
+                {
+                    "name": p["name"],
+                    "regiao": p["regiao"],
+                    "populacao": p["populacao"],
+                    "min_lon": float(min(r[:, 0].min() for r in p["rings"])),
+                    "min_lat": float(min(r[:, 1].min() for r in p["rings"])),
+                    "max_lon": float(max(r[:, 0].max() for r in p["rings"])),
+                    "max_lat": float(max(r[:, 1].max() for r in p["rings"])),
+                }
+                for p in polygons
+            ]
+            print(f"Loaded {len(neighborhoods)} polygons from {config.NEIGHBORHOODS_FILE}")
+        else:
+            print(f"No polygon file at {config.NEIGHBORHOODS_FILE}, using default neighborhoods")
+            neighborhoods = [
+                {"name": "Copacabana", "regiao": "Zona Sul", "populacao": 146392},
+                {"name": "Ipanema", "regiao": "Zona Sul", "populacao": 42080},
+                {"name": "Centro", "regiao": "Centro", "populacao": 41142},
+                {"name": "Botafogo", "regiao": "Zona Sul", "populacao": 82890},
+                {"name": "Tijuca", "regiao": "Zona Norte", "populacao": 181839},
+                {"name": "Barra da Tijuca", "regiao": "Zona Oeste", "populacao": 300823},
+            ]
 
         with self.driver.session() as session:
-            for n in neighborhoods:
-                session.run("""
-                    CREATE (:Neighborhood {
-                        name: $name,
-                        regiao: $regiao,
-                        populacao: $populacao,
-                        total_stops: 0,
-                        total_reclamacoes: 0,
-                        avg_risk_score: 0.0
-                    })
-                """, **n)
+            session.run("""
+                UNWIND $neighborhoods AS n
+                MERGE (nb:Neighborhood {name: n.name})
+                ON CREATE SET
+                    nb.total_stops = 0,
+                    nb.total_reclamacoes = 0,
+                    nb.avg_risk_score = 0.0
+                SET nb += n
+            """, neighborhoods=neighborhoods)
 
     def close(self):
         self.driver.close()
@@ -263,6 +282,8 @@ class GTFSLoader:
             self.create_route_serves_relationships()
             self.create_neighborhoods()
 
+            retire_snapshot(config.SNAPSHOT_DIR)
+            bump_data_version(config.DATA_VERSION_FILE)
             print("\nGTFS data loaded successfully")
             return True
 
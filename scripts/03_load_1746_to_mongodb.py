@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 import pandas as pd
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 from datetime import datetime
 from tqdm import tqdm
+from analytics.data_version import bump_data_version
+from analytics.heatmap import grid_cells, grid_cell_ids
 import config
 import sys
 
@@ -119,6 +121,9 @@ class Reclamacoes1746Loader:
                     'type': 'Point',
                     'coordinates': [float(row['longitude']), float(row['latitude'])]
                 }
+                doc['grid'] = grid_cell_ids(
+                    doc['lat'], doc['lon'], config.HEATMAP_ZOOM_LEVELS, config.HEATMAP_CELLS_PER_TILE
+                )
 
                 try:
                     self.collection.insert_one(doc)
@@ -139,6 +144,27 @@ class Reclamacoes1746Loader:
 
         return True
 
+    def assign_grid_cells(self):
+        """Backfill heatmap grid cell ids on complaints loaded before they existed"""
+        missing = {'$or': [{f'grid.z{zoom}': {'$exists': False}} for zoom in config.HEATMAP_ZOOM_LEVELS]}
+        docs = list(self.collection.find(missing, {'lat': 1, 'lon': 1}))
+        if not docs:
+            return
+
+        print(f"Assigning heatmap grid cells to {len(docs)} complaints...")
+        lats = [doc['lat'] for doc in docs]
+        lons = [doc['lon'] for doc in docs]
+        cells = {
+            f'grid.z{zoom}': grid_cells(lats, lons, zoom, config.HEATMAP_CELLS_PER_TILE).tolist()
+            for zoom in config.HEATMAP_ZOOM_LEVELS
+        }
+
+        for i in range(0, len(docs), config.BATCH_SIZE):
+            self.collection.bulk_write([
+                UpdateOne({'_id': docs[j]['_id']}, {'$set': {field: ids[j] for field, ids in cells.items()}})
+                for j in range(i, min(i + config.BATCH_SIZE, len(docs)))
+            ], ordered=False)
+
     def create_summary(self):
         total = self.collection.count_documents({})
         print(f"\nTotal: {total} complaints")
@@ -175,7 +201,9 @@ class Reclamacoes1746Loader:
         try:
             success = self.load_from_csv()
             if success:
+                self.assign_grid_cells()
                 self.create_summary()
+                bump_data_version(config.DATA_VERSION_FILE)
                 print("\nComplaints loaded successfully")
                 return True
             return False
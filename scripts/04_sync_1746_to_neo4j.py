@@ -3,6 +3,11 @@ from pymongo import MongoClient
 from neo4j import GraphDatabase
 from datetime import datetime
 from tqdm import tqdm
+import pandas as pd
+from analytics.data_version import bump_data_version
+from analytics.neighbors import stops_near_points
+from analytics.snapshot import retire_snapshot
+from analytics.system_stats import record_complaint_sync
 import config
 import sys
 
@@ -29,8 +34,18 @@ class Neo4jSync:
 
         synced_count = 0
         error_count = 0
+        open_delta = 0
 
         with self.neo4j_driver.session() as session:
+            # Status of complaints already in the graph, to keep the open count incremental
+            previous_status = {
+                record['id']: record['status'] for record in session.run("""
+                    UNWIND $ids AS id
+                    MATCH (rec:Reclamacao {id: id})
+                    RETURN rec.id AS id, rec.status AS status
+                """, ids=[f"REC_{rec['protocolo']}" for rec in reclamacoes])
+            }
+
             for rec in tqdm(reclamacoes, desc="Complaints"):
                 try:
                     result = session.run("""
@@ -44,7 +59,8 @@ class Neo4jSync:
                             rec.lon = $lon,
                             rec.peso = $peso,
                             rec.criticidade = $criticidade,
-                            rec.bairro = $bairro
+                            rec.bairro = $bairro,
+                            rec.near_radius = $search_radius
 
                         MERGE (cat:Categoria {nome: $servico})
                         ON CREATE SET
@@ -60,13 +76,23 @@ class Neo4jSync:
                         WHERE point.distance(
                           point({latitude: rec.lat, longitude: rec.lon}),
                           point({latitude: s.lat, longitude: s.lon})
-                        ) <= $max_distance
+                        ) <= $search_radius
+
+                        WITH rec, s, round(point.distance(
+                          point({latitude: rec.lat, longitude: rec.lon}),
+                          point({latitude: s.lat, longitude: s.lon})
+                        )) AS distance
+
+                        // Every stop in the search radius is kept, the metrics step
+                        // derives AFFECTS from these for the configured radius and kernel
+                        MERGE (rec)-[n:NEAR]->(s)
+                        SET n.distance_meters = distance
+
+                        WITH rec, s, distance
+                        WHERE distance <= $max_distance
 
                         MERGE (rec)-[a:AFFECTS]->(s)
-                        SET a.distance_meters = round(point.distance(
-                              point({latitude: rec.lat, longitude: rec.lon}),
-                              point({latitude: s.lat, longitude: s.lon})
-                            )),
+                        SET a.distance_meters = distance,
                             a.impact_level = rec.criticidade,
                             a.risk_contribution = rec.peso,
                             a.started_affecting = rec.data_abertura
@@ -87,7 +113,9 @@ class Neo4jSync:
                         peso=rec['peso'],
                         criticidade=rec['criticidade'],
                         bairro=rec.get('bairro', ''),
-                        max_distance=config.MAX_DISTANCE_AFFECTS_METERS
+                        max_distance=config.MAX_DISTANCE_AFFECTS_METERS,
+                        search_radius=max(config.AFFECTS_SEARCH_RADIUS_METERS,
+                                          config.MAX_DISTANCE_AFFECTS_METERS)
                     )
 
                     self.mongo_db.reclamacoes_1746_raw.update_one(
@@ -99,17 +127,82 @@ class Neo4jSync:
                     )
 
                     synced_count += 1
+                    open_delta += (rec['status'] == 'Aberto') - \
+                        (previous_status.get(f"REC_{rec['protocolo']}") == 'Aberto')
 
                 except Exception as e:
                     error_count += 1
                     print(f"\nError syncing {rec['protocolo']}: {e}")
                     continue
 
+            record_complaint_sync(session, open_delta)
+
+        if synced_count:
+            # Stop complaint counts and stats changed; serve live until step 05 exports
+            retire_snapshot(config.SNAPSHOT_DIR)
+            bump_data_version(config.DATA_VERSION_FILE)
+
         print(f"\nSynced: {synced_count}")
         print(f"Errors: {error_count}")
 
         return True
 
+    def backfill_near(self):
+        """NEAR links for complaints synced before NEAR existed or under a smaller search radius.
+
+        Pairs are found with the stop grid in-process and written in batches; each
+        complaint then records the radius it was linked at, so this runs once.
+        """
+        search_radius = max(config.AFFECTS_SEARCH_RADIUS_METERS, config.MAX_DISTANCE_AFFECTS_METERS)
+
+        with self.neo4j_driver.session() as session:
+            complaints = pd.DataFrame(session.run("""
+                MATCH (rec:Reclamacao)
+                WHERE rec.lat IS NOT NULL AND rec.lon IS NOT NULL
+                  AND coalesce(rec.near_radius, 0) < $search_radius
+                RETURN rec.id AS id, rec.lat AS lat, rec.lon AS lon
+            """, search_radius=search_radius).data(), columns=['id', 'lat', 'lon'])
+
+            if complaints.empty:
+                return
+
+            print(f"Backfilling NEAR links for {len(complaints)} complaints...")
+            stops = pd.DataFrame(session.run("""
+                MATCH (s:Stop)
+                WHERE s.lat IS NOT NULL AND s.lon IS NOT NULL
+                RETURN s.id AS id, s.lat AS lat, s.lon AS lon
+            """).data(), columns=['id', 'lat', 'lon'])
+
+            pairs = stops_near_points(
+                stops, complaints['lat'].to_numpy(dtype=float), complaints['lon'].to_numpy(dtype=float),
+                search_radius, workers=config.ANALYSIS_WORKERS
+            )
+            rows = pd.DataFrame({
+                'rec_id': complaints['id'].to_numpy()[pairs['point'].to_numpy()],
+                'stop_id': pairs['stop_id'],
+                'distance': pairs['distance_meters'].round(),
+            }).to_dict('records')
+
+            for i in tqdm(range(0, len(rows), config.BATCH_SIZE), desc="NEAR"):
+                session.run("""
+                    UNWIND $rows AS row
+                    MATCH (rec:Reclamacao {id: row.rec_id})
+                    MATCH (s:Stop {id: row.stop_id})
+                    MERGE (rec)-[n:NEAR]->(s)
+                    SET n.distance_meters = row.distance
+                """, rows=rows[i:i + config.BATCH_SIZE])
+
+            # Marked last, so an interrupted backfill is picked up again
+            ids = complaints['id'].tolist()
+            for i in range(0, len(ids), config.BATCH_SIZE):
+                session.run("""
+                    UNWIND $ids AS id
+                    MATCH (rec:Reclamacao {id: id})
+                    SET rec.near_radius = $search_radius
+                """, ids=ids[i:i + config.BATCH_SIZE], search_radius=search_radius)
+
+        print(f"{len(rows)} NEAR links backfilled")
+
     def close(self):
         self.mongo_client.close()
         self.neo4j_driver.close()
@@ -119,6 +212,7 @@ class Neo4jSync:
 
         try:
             self.sync_reclamacoes()
+            self.backfill_near()
             print("\nSync completed successfully")
             return True
 
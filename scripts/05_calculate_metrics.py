@@ -1,5 +1,10 @@
 #!/usr/bin/env python3
 from neo4j import GraphDatabase
+from analytics.data_version import bump_data_version, new_data_version
+from analytics.incidence import RouteStopIncidence, metrics_to_rows
+from analytics.snapshot import write_snapshot
+from analytics.spatial import PolygonIndex, load_polygons_geojson
+from analytics.system_stats import refresh_system_stats
 import config
 import sys
 
@@ -10,20 +15,69 @@ class MetricsCalculator:
             auth=(config.NEO4J_USER, config.NEO4J_PASSWORD)
         )
 
+    def update_affects(self):
+        print(f"Updating AFFECTS (radius {config.MAX_DISTANCE_AFFECTS_METERS} m, "
+              f"{config.RISK_DECAY_KERNEL} kernel)...")
+
+        if config.MAX_DISTANCE_AFFECTS_METERS > config.AFFECTS_SEARCH_RADIUS_METERS:
+            print(f"Radius exceeds the sync search radius ({config.AFFECTS_SEARCH_RADIUS_METERS} m), "
+                  f"stops beyond it stay unlinked until `make sync` backfills NEAR")
+
+        with self.driver.session() as session:
+            result = session.run("""
+                MATCH (:Reclamacao)-[a:AFFECTS]->(:Stop)
+                WHERE a.distance_meters > $radius
+                CALL {
+                  WITH a
+                  DELETE a
+                } IN TRANSACTIONS OF $batch_size ROWS
+                RETURN count(*) AS removed
+            """, radius=config.MAX_DISTANCE_AFFECTS_METERS, batch_size=config.BATCH_SIZE)
+            removed = result.single()['removed']
+
+            result = session.run("""
+                MATCH (rec:Reclamacao)-[n:NEAR]->(s:Stop)
+                WHERE n.distance_meters <= $radius
+                CALL {
+                  WITH rec, n, s
+                  MERGE (rec)-[a:AFFECTS]->(s)
+                  SET a.distance_meters = n.distance_meters,
+                      a.impact_level = rec.criticidade,
+                      a.started_affecting = rec.data_abertura,
+                      a.risk_contribution = rec.peso * CASE $kernel
+                        WHEN 'linear' THEN 1.0 - n.distance_meters / $radius
+                        WHEN 'gaussian' THEN exp(-0.5 * (n.distance_meters / $bandwidth) ^ 2)
+                        WHEN 'exponential' THEN exp(-n.distance_meters / $bandwidth)
+                        ELSE 1.0
+                      END
+                } IN TRANSACTIONS OF $batch_size ROWS
+                RETURN count(*) AS linked
+            """,
+                radius=float(config.MAX_DISTANCE_AFFECTS_METERS),
+                kernel=config.RISK_DECAY_KERNEL,
+                bandwidth=config.RISK_DECAY_BANDWIDTH_METERS,
+                batch_size=config.BATCH_SIZE
+            )
+            linked = result.single()['linked']
+
+        print(f"{linked} complaint-stop links weighted, {removed} out of range removed")
+
     def calculate_risk_scores(self):
         print("Calculating risk scores...")
 
         with self.driver.session() as session:
-            # Step 1: Calculate raw risk scores
+            # Step 1: Calculate raw risk scores. Every stop is rescored, so stops that
+            # lost their AFFECTS links (smaller radius, closed or old complaints) go to 0
             result = session.run("""
-                MATCH (s:Stop)<-[a:AFFECTS]-(rec:Reclamacao)
+                MATCH (s:Stop)
+                OPTIONAL MATCH (s)<-[a:AFFECTS]-(rec:Reclamacao)
                 WHERE rec.status IN ['Aberto', 'Em Atendimento']
                   AND rec.data_abertura >= datetime() - duration({days: 30})
 
                 WITH s,
                      count(rec) AS total_reclamacoes,
                      count(CASE WHEN rec.status = 'Aberto' THEN 1 END) AS abertas,
-                     sum(a.risk_contribution) AS risk_sum
+                     coalesce(sum(a.risk_contribution), 0.0) AS risk_sum
 
                 SET s.total_reclamacoes = total_reclamacoes,
                     s.reclamacoes_abertas = abertas,
@@ -153,9 +207,18 @@ class MetricsCalculator:
             record = result.single()
             print(f"{record['conexoes_atualizadas']} connections updated")
 
+            # Marks the transport network as changed for the analysis projection fingerprint
+            session.run("""
+                MERGE (m:GraphMeta {name: 'transportNetwork'})
+                SET m.last_modified = datetime()
+            """)
+
             return True
 
     def update_route_metrics(self):
+        if config.ROUTE_METRICS_MODE == 'matrix':
+            return self.update_route_metrics_matrix()
+
         print("Updating routes...")
 
         with self.driver.session() as session:
@@ -164,20 +227,183 @@ class MetricsCalculator:
                 WITH r,
                      count(s) AS total_stops,
                      avg(s.risk_score) AS avg_risk,
-                     count(CASE WHEN s.risk_score >= 0.6 THEN 1 END) AS high_risk
+                     count(CASE WHEN s.risk_score >= $high_risk THEN 1 END) AS high_risk
 
                 SET r.total_stops = total_stops,
                     r.avg_risk_score = avg_risk,
                     r.high_risk_stops = high_risk
 
                 RETURN count(r) AS rotas_atualizadas
-            """)
+            """, high_risk=config.HIGH_RISK_THRESHOLD)
+
+            record = result.single()
+            print(f"{record['rotas_atualizadas']} routes updated")
+
+            return True
+
+    def update_route_metrics_matrix(self):
+        print("Updating routes (incidence matrix)...")
+
+        with self.driver.session() as session:
+            incidence = RouteStopIncidence.from_neo4j(session)
+            if incidence is None:
+                print("No SERVES relationships found")
+                return False
+
+            risk = incidence.load_stop_risk(session)
+            metrics = incidence.route_metrics(
+                risk,
+                high_risk_threshold=config.HIGH_RISK_THRESHOLD,
+                percentiles=config.ROUTE_RISK_PERCENTILES
+            )
+
+            print(f"Matrix: {incidence.matrix.shape[0]} routes x "
+                  f"{incidence.matrix.shape[1]} stops, {incidence.matrix.nnz} links")
+
+            result = session.run("""
+                UNWIND $rows AS row
+                MATCH (r:Route {id: row.id})
+                SET r += row
+                RETURN count(r) AS rotas_atualizadas
+            """, rows=metrics_to_rows(metrics))
 
             record = result.single()
             print(f"{record['rotas_atualizadas']} routes updated")
 
             return True
 
+    def assign_neighborhoods(self, session, index, label):
+        # Only nodes without a LOCATED_IN link are assigned, so reruns are incremental
+        result = session.run(f"""
+            MATCH (n:{label})
+            WHERE NOT (n)-[:LOCATED_IN]->(:Neighborhood)
+              AND n.lat IS NOT NULL AND n.lon IS NOT NULL
+            RETURN n.id AS id, n.lat AS lat, n.lon AS lon
+        """)
+        rows = result.values()
+
+        if not rows:
+            print(f"No new {label} nodes to assign")
+            return 0
+
+        ids, lats, lons = zip(*rows)
+        names = index.assign_names(lats, lons)
+        links = [
+            {'id': node_id, 'neighborhood': name}
+            for node_id, name in zip(ids, names)
+            if name is not None
+        ]
+
+        for i in range(0, len(links), config.BATCH_SIZE):
+            session.run(f"""
+                UNWIND $links AS link
+                MATCH (n:{label} {{id: link.id}})
+                MATCH (nb:Neighborhood {{name: link.neighborhood}})
+                MERGE (n)-[:LOCATED_IN]->(nb)
+                SET n.neighborhood = nb.name
+            """, links=links[i:i + config.BATCH_SIZE])
+
+        print(f"{len(links)}/{len(rows)} {label} nodes assigned to neighborhoods")
+        return len(links)
+
+    def assign_neighborhoods_by_bairro(self, session):
+        # Without polygons, complaints go to the neighborhood named by their bairro
+        # field and each stop to the bairro most of its AFFECTS complaints come from
+        result = session.run("""
+            MATCH (rec:Reclamacao)
+            WHERE NOT (rec)-[:LOCATED_IN]->(:Neighborhood)
+              AND rec.bairro IS NOT NULL AND trim(rec.bairro) <> ''
+            CALL {
+              WITH rec
+              MERGE (nb:Neighborhood {name: trim(rec.bairro)})
+              ON CREATE SET
+                  nb.total_stops = 0,
+                  nb.total_reclamacoes = 0,
+                  nb.avg_risk_score = 0.0
+              MERGE (rec)-[:LOCATED_IN]->(nb)
+              SET rec.neighborhood = nb.name
+            } IN TRANSACTIONS OF $batch_size ROWS
+            RETURN count(*) AS assigned
+        """, batch_size=config.BATCH_SIZE)
+        print(f"{result.single()['assigned']} Reclamacao nodes assigned by bairro")
+
+        result = session.run("""
+            MATCH (s:Stop)<-[:AFFECTS]-(rec:Reclamacao)-[:LOCATED_IN]->(nb:Neighborhood)
+            WHERE NOT (s)-[:LOCATED_IN]->(:Neighborhood)
+            WITH s, nb, count(rec) AS complaints
+            ORDER BY complaints DESC, nb.name
+            WITH s, collect(nb)[0] AS nb
+            MERGE (s)-[:LOCATED_IN]->(nb)
+            SET s.neighborhood = nb.name
+            RETURN count(s) AS assigned
+        """)
+        print(f"{result.single()['assigned']} Stop nodes assigned by complaint bairro")
+
+    def update_neighborhood_metrics(self):
+        print("Updating neighborhoods...")
+
+        polygons = load_polygons_geojson(config.NEIGHBORHOODS_FILE)
+
+        with self.driver.session() as session:
+            if polygons:
+                index = PolygonIndex(polygons)
+                self.assign_neighborhoods(session, index, 'Stop')
+                self.assign_neighborhoods(session, index, 'Reclamacao')
+            else:
+                print(f"No neighborhood polygons at {config.NEIGHBORHOODS_FILE}, using complaint bairros")
+                self.assign_neighborhoods_by_bairro(session)
+
+            result = session.run("""
+                MATCH (nb:Neighborhood)
+                CALL {
+                  WITH nb
+                  OPTIONAL MATCH (nb)<-[:LOCATED_IN]-(s:Stop)
+                  RETURN count(s) AS total_stops,
+                         avg(s.risk_score) AS avg_risk,
+                         count(CASE WHEN s.risk_level = 'Alto' THEN 1 END) AS high_risk
+                }
+                CALL {
+                  WITH nb
+                  OPTIONAL MATCH (nb)<-[:LOCATED_IN]-(rec:Reclamacao)
+                  RETURN count(rec) AS total_reclamacoes,
+                         count(CASE WHEN rec.status = 'Aberto' THEN 1 END) AS abertas
+                }
+
+                SET nb.total_stops = total_stops,
+                    nb.avg_risk_score = coalesce(avg_risk, 0.0),
+                    nb.high_risk_stops = high_risk,
+                    nb.total_reclamacoes = total_reclamacoes,
+                    nb.reclamacoes_abertas = abertas,
+                    nb.last_update = datetime()
+
+                RETURN count(nb) AS bairros_atualizados
+            """)
+
+            record = result.single()
+            print(f"{record['bairros_atualizados']} neighborhoods updated")
+
+            return True
+
+    def update_system_stats(self):
+        print("Updating system summary...")
+
+        with self.driver.session() as session:
+            stats = refresh_system_stats(session, config.HIGH_RISK_THRESHOLD)
+
+        print(f"{stats['total_stops']:,} stops, {stats['total_routes']:,} routes, "
+              f"{stats['total_complaints']:,} complaints ({stats['open_complaints']:,} open)")
+
+    def publish_snapshot(self):
+        print("Exporting dashboard snapshot...")
+
+        # Publish the version only once its bundle exists
+        version = new_data_version()
+        with self.driver.session() as session:
+            path = write_snapshot(session, config.SNAPSHOT_DIR, version)
+        bump_data_version(config.DATA_VERSION_FILE, version)
+
+        print(f"Snapshot {version} written to {path}")
+
     def close(self):
         self.driver.close()
 
@@ -185,9 +411,13 @@ class MetricsCalculator:
         print("Metrics Calculator\n")
 
         try:
+            self.update_affects()
             self.calculate_risk_scores()
             self.update_connection_costs()
             self.update_route_metrics()
+            self.update_neighborhood_metrics()
+            self.update_system_stats()
+            self.publish_snapshot()
 
             print("\nMetrics updated successfully")
             return True
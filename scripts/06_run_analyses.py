@@ -1,7 +1,22 @@
 #!/usr/bin/env python3
+import numpy as np
+import pandas as pd
 from neo4j import GraphDatabase
+from analytics.communities import (
+    COMMUNITY_STOPS_QUERY, COMMUNITY_EDGES_QUERY, community_rollup, write_community_graph
+)
+from analytics.clustering import COMPLAINTS_QUERY, find_cluster_pairs, cluster_labels
+from analytics.data_version import bump_data_version, new_data_version
+from analytics.local_graph import LocalGraphAnalytics, write_node_properties
+from analytics.scheduler import Stage, run_stages, critical_path
+from analytics.snapshot import write_snapshot
+from analytics.system_stats import read_system_stats, refresh_system_stats
 import config
 import sys
+import time
+
+PROJECTION_NAME = 'transportNetwork'
+ANALYSIS_PROPERTIES = ['betweenness_centrality', 'community_id', 'pagerank']
 
 class GraphAnalyzer:
     def __init__(self):
@@ -10,21 +25,115 @@ class GraphAnalyzer:
             auth=(config.NEO4J_USER, config.NEO4J_PASSWORD)
         )
 
+    def gds_available(self):
+        with self.driver.session() as session:
+            try:
+                session.run("RETURN gds.version() AS version").single()
+                return True
+            except Exception:
+                return False
+
+    def select_backend(self):
+        backend = config.ANALYSIS_BACKEND
+        if backend == 'auto':
+            backend = 'gds' if self.gds_available() else 'local'
+        print(f"Analysis backend: {backend}")
+        return backend
+
+    def run_local_analytics(self):
+        print("Running local graph analytics...")
+
+        with self.driver.session() as session:
+            start = time.perf_counter()
+            engine = LocalGraphAnalytics.from_neo4j(session)
+            print(f"Exported {engine.num_nodes} stops, {engine.num_relationships} connections "
+                  f"({time.perf_counter() - start:.2f}s)")
+
+        properties = {}
+
+        start = time.perf_counter()
+        if config.BETWEENNESS_SAMPLE_SIZE > 0:
+            betweenness, std_error, report = engine.approximate_betweenness(
+                initial_sample=config.BETWEENNESS_SAMPLE_SIZE,
+                target_error=config.BETWEENNESS_TARGET_ERROR,
+                top_k=config.BETWEENNESS_TOP_K,
+                confidence=config.BETWEENNESS_CONFIDENCE,
+                max_sample=config.BETWEENNESS_MAX_SAMPLE_SIZE,
+                workers=config.ANALYSIS_WORKERS
+            )
+            properties['betweenness_stderr'] = std_error
+            print(f"Sampled {report['sample_size']}/{engine.num_nodes} sources - "
+                  f"top-{report['top_k']} error ±{report['relative_error']:.1%} "
+                  f"at {report['confidence']:.0%} confidence "
+                  f"(target ±{report['target_error']:.1%})")
+        else:
+            betweenness = engine.betweenness(workers=config.ANALYSIS_WORKERS)
+        print(f"Centrality - Avg: {betweenness.mean():.6f}, Max: {betweenness.max():.6f} "
+              f"({time.perf_counter() - start:.2f}s)")
+
+        start = time.perf_counter()
+        communities = engine.communities(config.LOCAL_COMMUNITY_ALGORITHM)
+        print(f"{communities.max() + 1} communities, Modularity: {engine.modularity(communities):.4f} "
+              f"({time.perf_counter() - start:.2f}s)")
+
+        start = time.perf_counter()
+        pagerank, iterations = engine.pagerank()
+        print(f"PageRank: {iterations} iterations ({time.perf_counter() - start:.2f}s)")
+
+        with self.driver.session() as session:
+            properties.update({
+                'betweenness_centrality': betweenness,
+                'community_id': communities,
+                'pagerank': pagerank
+            })
+            written = write_node_properties(session, engine.stop_ids, properties, config.BATCH_SIZE)
+            print(f"{written} stops written")
+
+    def graph_fingerprint(self, session):
+        # Label and relationship-type counts come straight from the count store
+        stops = session.run("MATCH (s:Stop) RETURN count(s) AS total").single()["total"]
+        connections = session.run(
+            "MATCH ()-[c:CONNECTS_TO]->() RETURN count(c) AS total"
+        ).single()["total"]
+
+        record = session.run("""
+            OPTIONAL MATCH (m:GraphMeta {name: $name})
+            RETURN m.last_modified AS last_modified,
+                   m.projection_fingerprint AS projection_fingerprint
+        """, name=PROJECTION_NAME).single()
+
+        last_modified = record["last_modified"]
+        fingerprint = f"{stops}:{connections}:{last_modified.isoformat() if last_modified else '-'}"
+
+        return fingerprint, record["projection_fingerprint"]
+
     def create_graph_projection(self):
         print("Building graph projection...")
 
         with self.driver.session() as session:
-            try:
-                result = session.run("CALL gds.graph.exists('transportNetwork') YIELD exists RETURN exists")
-                exists = result.single()["exists"]
-                if exists:
-                    session.run("CALL gds.graph.drop('transportNetwork')")
-            except Exception as e:
-                pass
+            fingerprint, stored_fingerprint = self.graph_fingerprint(session)
+
+            exists = session.run(
+                "CALL gds.graph.exists($name) YIELD exists RETURN exists",
+                name=PROJECTION_NAME
+            ).single()["exists"]
+
+            if exists and fingerprint == stored_fingerprint:
+                print(f"Reusing projection '{PROJECTION_NAME}' ({fingerprint})")
+                session.run("""
+                    CALL gds.graph.nodeProperties.drop($name, $properties, {failIfMissing: false})
+                    YIELD propertiesRemoved
+                    RETURN propertiesRemoved
+                """, name=PROJECTION_NAME, properties=ANALYSIS_PROPERTIES)
+                return False
+
+            if exists:
+                print("Graph changed since last projection, rebuilding")
+                session.run("CALL gds.graph.drop($name)", name=PROJECTION_NAME)
 
             session.run("""
                 CALL gds.graph.project(
-                  'transportNetwork',
+                  $name,
                   'Stop',
                   'CONNECTS_TO',
                   {
@@ -32,27 +141,89 @@ class GraphAnalyzer:
                     relationshipProperties: ['distance_meters', 'risk_adjusted_cost']
                   }
                 )
-            """)
+            """, name=PROJECTION_NAME)
+
+            session.run("""
+                MERGE (m:GraphMeta {name: $name})
+                SET m.projection_fingerprint = $fingerprint,
+                    m.projected_at = datetime()
+            """, name=PROJECTION_NAME, fingerprint=fingerprint)
+
+            return True
 
     def calculate_betweenness_centrality(self):
         print("Calculating centrality...")
 
+        settings = {'mutateProperty': 'betweenness_centrality'}
+        if config.BETWEENNESS_SAMPLE_SIZE > 0:
+            # GDS reports no error estimate; use the local backend for adaptive sampling
+            settings.update({'samplingSize': config.BETWEENNESS_SAMPLE_SIZE, 'samplingSeed': 42})
+            print(f"Sampling {config.BETWEENNESS_SAMPLE_SIZE} sources")
+
         with self.driver.session() as session:
             result = session.run("""
-                CALL gds.betweenness.write('transportNetwork', {
-                  writeProperty: 'betweenness_centrality'
-                })
+                CALL gds.betweenness.mutate($name, $settings)
                 YIELD centralityDistribution
 
                 RETURN
                   centralityDistribution.min AS min_centrality,
                   centralityDistribution.max AS max_centrality,
                   centralityDistribution.mean AS avg_centrality
-            """)
+            """, name=PROJECTION_NAME, settings=settings)
 
             record = result.single()
             print(f"Avg: {record['avg_centrality']:.6f}, Max: {record['max_centrality']:.6f}")
 
+    def detect_communities(self):
+        print("Detecting communities...")
+
+        with self.driver.session() as session:
+            result = session.run("""
+                CALL gds.louvain.mutate($name, {
+                  mutateProperty: 'community_id',
+                  relationshipWeightProperty: 'distance_meters'
+                })
+                YIELD communityCount, modularity
+
+                RETURN communityCount, modularity
+            """, name=PROJECTION_NAME)
+
+            record = result.single()
+            print(f"{record['communityCount']} communities, Modularity: {record['modularity']:.4f}")
+
+    def calculate_pagerank(self):
+        print("Calculating PageRank...")
+
+        with self.driver.session() as session:
+            result = session.run("""
+                CALL gds.pageRank.mutate($name, {
+                  mutateProperty: 'pagerank',
+                  dampingFactor: 0.85,
+                  maxIterations: 20
+                })
+                YIELD nodePropertiesWritten, ranIterations
+
+                RETURN nodePropertiesWritten, ranIterations
+            """, name=PROJECTION_NAME)
+
+            record = result.single()
+            print(f"{record['nodePropertiesWritten']} nodes, {record['ranIterations']} iterations")
+
+    def write_analysis_properties(self):
+        print("Writing analysis properties...")
+
+        with self.driver.session() as session:
+            result = session.run("""
+                CALL gds.graph.nodeProperties.write($name, $properties)
+                YIELD propertiesWritten
+                RETURN propertiesWritten
+            """, name=PROJECTION_NAME, properties=ANALYSIS_PROPERTIES)
+
+            record = result.single()
+            print(f"{record['propertiesWritten']} properties written")
+
+    def report_critical_stops(self):
+        with self.driver.session() as session:
             result = session.run("""
                 MATCH (s:Stop)
                 WHERE s.betweenness_centrality > 0
@@ -80,41 +251,27 @@ class GraphAnalyzer:
                       f"Risk: {record['risco']:.2f} | "
                       f"{record['classificacao']}")
 
-    def detect_communities(self):
-        print("Detecting communities...")
+    def rollup_communities(self):
+        print("Rolling up communities...")
 
         with self.driver.session() as session:
-            result = session.run("""
-                CALL gds.louvain.write('transportNetwork', {
-                  writeProperty: 'community_id',
-                  relationshipWeightProperty: 'distance_meters'
-                })
-                YIELD communityCount, modularity
+            stops = pd.DataFrame(session.run(COMMUNITY_STOPS_QUERY).data())
+            if stops.empty:
+                print("No community assignments to roll up")
+                return
+            edges = pd.DataFrame(session.run(COMMUNITY_EDGES_QUERY).data(), columns=['source', 'target'])
 
-                RETURN communityCount, modularity
-            """)
+            communities, flows = community_rollup(stops, edges, config.HIGH_RISK_THRESHOLD)
+            write_community_graph(session, communities, flows, config.BATCH_SIZE)
 
-            record = result.single()
-            print(f"{record['communityCount']} communities, Modularity: {record['modularity']:.4f}")
+        print(f"{len(communities)} communities, {len(flows)} inter-community flows")
 
+    def report_communities(self):
+        with self.driver.session() as session:
             result = session.run("""
-                MATCH (s:Stop)
-                WHERE s.community_id IS NOT NULL
-
-                WITH s.community_id AS community,
-                     collect(s.name) AS paradas,
-                     count(s) AS tamanho,
-                     avg(s.risk_score) AS risco_medio,
-                     max(s.risk_score) AS risco_maximo
-
-                RETURN
-                  community,
-                  tamanho,
-                  round(risco_medio * 100) / 100 AS risco_medio,
-                  round(risco_maximo * 100) / 100 AS risco_maximo,
-                  paradas[..3] AS amostra_paradas
-
-                ORDER BY risco_medio DESC
+                MATCH (c:Community)
+                RETURN c.id AS community, c.size AS tamanho, c.avg_risk AS risco_medio
+                ORDER BY c.avg_risk DESC
                 LIMIT 10
             """)
 
@@ -124,24 +281,8 @@ class GraphAnalyzer:
                       f"Size: {record['tamanho']} | "
                       f"Risk: {record['risco_medio']:.2f}")
 
-    def calculate_pagerank(self):
-        print("Calculating PageRank...")
-
+    def report_pagerank(self):
         with self.driver.session() as session:
-            result = session.run("""
-                CALL gds.pageRank.write('transportNetwork', {
-                  writeProperty: 'pagerank',
-                  dampingFactor: 0.85,
-                  maxIterations: 20
-                })
-                YIELD nodePropertiesWritten, ranIterations
-
-                RETURN nodePropertiesWritten, ranIterations
-            """)
-
-            record = result.single()
-            print(f"{record['nodePropertiesWritten']} nodes, {record['ranIterations']} iterations")
-
             result = session.run("""
                 MATCH (s:Stop)
                 WHERE s.pagerank IS NOT NULL
@@ -163,30 +304,61 @@ class GraphAnalyzer:
         print("Identifying clusters...")
 
         with self.driver.session() as session:
-            result = session.run("""
-                MATCH (r1:Reclamacao), (r2:Reclamacao)
-                WHERE id(r1) < id(r2)
-                  AND r1.servico = r2.servico
-                  AND point.distance(
-                    point({latitude: r1.lat, longitude: r1.lon}),
-                    point({latitude: r2.lat, longitude: r2.lon})
-                  ) <= 200
-                  AND duration.between(r1.data_abertura, r2.data_abertura).days <= 7
-
-                MERGE (r1)-[c:CLUSTERS_WITH]->(r2)
-                SET c.spatial_proximity_meters = round(point.distance(
-                      point({latitude: r1.lat, longitude: r1.lon}),
-                      point({latitude: r2.lat, longitude: r2.lon})
-                    )),
-                    c.temporal_proximity_hours = duration.between(
-                      r1.data_abertura, r2.data_abertura
-                    ).hours
-
-                RETURN count(c) AS clusters_criados
+            start = time.perf_counter()
+            complaints = pd.DataFrame(session.run(COMPLAINTS_QUERY).data())
+            if complaints.empty:
+                print("No complaints to cluster")
+                return
+
+            i, j, distance, hours = find_cluster_pairs(
+                complaints,
+                radius_meters=config.CLUSTER_RADIUS_METERS,
+                window_days=config.CLUSTER_WINDOW_DAYS
+            )
+            labels, sizes = cluster_labels(len(complaints), i, j)
+            print(f"{len(i):,} close pairs among {len(complaints):,} complaints "
+                  f"({time.perf_counter() - start:.2f}s)")
+
+            session.run("""
+                MATCH (rec:Reclamacao)
+                WHERE rec.cluster_id IS NOT NULL
+                REMOVE rec.cluster_id, rec.cluster_size
             """)
 
-            record = result.single()
-            print(f"{record['clusters_criados']} cluster links created")
+            clustered = np.flatnonzero(labels >= 0)
+            rows = [
+                {'id': complaints['id'].iat[k], 'cluster_id': int(labels[k]), 'cluster_size': int(sizes[k])}
+                for k in clustered
+            ]
+            for offset in range(0, len(rows), config.BATCH_SIZE):
+                session.run("""
+                    UNWIND $rows AS row
+                    MATCH (rec:Reclamacao {id: row.id})
+                    SET rec.cluster_id = row.cluster_id,
+                        rec.cluster_size = row.cluster_size
+                """, rows=rows[offset:offset + config.BATCH_SIZE])
+
+            links = 0
+            if config.CLUSTER_WRITE_EDGES:
+                ids = complaints['id'].to_numpy(dtype=object)
+                pairs = [
+                    {'a': a, 'b': b, 'distance': round(float(d)), 'hours': int(h)}
+                    for a, b, d, h in zip(ids[i], ids[j], distance, hours)
+                ]
+                for offset in range(0, len(pairs), config.BATCH_SIZE):
+                    result = session.run("""
+                        UNWIND $pairs AS pair
+                        MATCH (r1:Reclamacao {id: pair.a})
+                        MATCH (r2:Reclamacao {id: pair.b})
+                        MERGE (r1)-[c:CLUSTERS_WITH]->(r2)
+                        SET c.spatial_proximity_meters = pair.distance,
+                            c.temporal_proximity_hours = pair.hours
+                        RETURN count(c) AS links
+                    """, pairs=pairs[offset:offset + config.BATCH_SIZE])
+                    links += result.single()['links']
+
+            print(f"{labels.max() + 1:,} clusters covering {len(clustered):,} complaints, "
+                  f"{links:,} cluster links written")
 
     def generate_summary_report(self):
         print("\n" + "=" * 60)
@@ -194,58 +366,79 @@ class GraphAnalyzer:
         print("=" * 60)
 
         with self.driver.session() as session:
-            result = session.run("""
-                MATCH (s:Stop)
-                WITH count(s) AS total_stops,
-                     avg(s.risk_score) AS avg_risk,
-                     count(CASE WHEN s.risk_score >= 0.6 THEN 1 END) AS high_risk_count
+            stats = read_system_stats(session)
+            if stats is None or stats['avg_risk_score'] is None:
+                stats = refresh_system_stats(session, config.HIGH_RISK_THRESHOLD)
 
-                MATCH (r:Route)
-                WITH total_stops, avg_risk, high_risk_count, count(r) AS total_routes
+        print(f"\nStops: {stats['total_stops']:,}")
+        print(f"Routes: {stats['total_routes']:,}")
+        print(f"Complaints: {stats['total_complaints']:,} ({stats['open_complaints']:,} open)")
+        print(f"\nAvg Risk: {stats['avg_risk_score']:.3f}")
+        print(f"High Risk Stops: {stats['high_risk_count']:,}")
 
-                MATCH (rec:Reclamacao)
-                WITH total_stops, avg_risk, high_risk_count, total_routes,
-                     count(rec) AS total_reclamacoes,
-                     count(CASE WHEN rec.status = 'Aberto' THEN 1 END) AS reclamacoes_abertas
+        print("\nTop Complaint Categories:")
+        categories = zip(stats['top_category_names'] or [], stats['top_category_counts'] or [])
+        for i, (categoria, total) in enumerate(categories, 1):
+            print(f"  {i}. {categoria:30} {total:,}")
 
-                RETURN *
-            """)
+        print("=" * 60)
 
-            stats = result.single()
+    def run_scheduled(self, stages):
+        start = time.perf_counter()
+        timings = run_stages(stages, max_workers=config.ANALYSIS_STAGE_WORKERS)
+        elapsed = time.perf_counter() - start
 
-            print(f"\nStops: {stats['total_stops']:,}")
-            print(f"Routes: {stats['total_routes']:,}")
-            print(f"Complaints: {stats['total_reclamacoes']:,} ({stats['reclamacoes_abertas']:,} open)")
-            print(f"\nAvg Risk: {stats['avg_risk']:.3f}")
-            print(f"High Risk Stops: {stats['high_risk_count']:,}")
+        print("\nStage timings:")
+        for name, (begin, end) in sorted(timings.items(), key=lambda item: item[1][0]):
+            print(f"  {name:20} {end - begin:8.2f}s (started at {begin:.2f}s)")
 
-            result = session.run("""
-                MATCH (c:Categoria)<-[:HAS_TYPE]-(rec:Reclamacao)
-                RETURN
-                  c.nome AS categoria,
-                  count(rec) AS total
-                ORDER BY total DESC
-                LIMIT 5
-            """)
-
-            print("\nTop Complaint Categories:")
-            for i, record in enumerate(result, 1):
-                print(f"  {i}. {record['categoria']:30} {record['total']:,}")
-
-            print("=" * 60)
+        path, path_seconds = critical_path(stages, timings)
+        total = sum(end - begin for begin, end in timings.values())
+        print(f"Critical path: {' -> '.join(path)} ({path_seconds:.2f}s)")
+        print(f"Wall time: {elapsed:.2f}s vs {total:.2f}s sequential\n")
 
     def close(self):
         self.driver.close()
 
+    def publish_snapshot(self):
+        print("Exporting dashboard snapshot...")
+
+        # Publish the version only once its bundle exists
+        version = new_data_version()
+        with self.driver.session() as session:
+            path = write_snapshot(session, config.SNAPSHOT_DIR, version)
+        bump_data_version(config.DATA_VERSION_FILE, version)
+
+        print(f"Snapshot {version} written to {path}")
+
     def run(self):
         print("Graph Analyzer\n")
 
         try:
-            self.create_graph_projection()
-            self.calculate_betweenness_centrality()
-            self.detect_communities()
-            self.calculate_pagerank()
-            self.identify_reclamacao_clusters()
+            if self.select_backend() == 'gds':
+                # The three algorithms only read the projection and mutate separate properties
+                stages = [
+                    Stage('projection', self.create_graph_projection),
+                    Stage('betweenness', self.calculate_betweenness_centrality, ['projection']),
+                    Stage('communities', self.detect_communities, ['projection']),
+                    Stage('pagerank', self.calculate_pagerank, ['projection']),
+                    Stage('write', self.write_analysis_properties,
+                          ['betweenness', 'communities', 'pagerank']),
+                ]
+            else:
+                stages = [Stage('local_analytics', self.run_local_analytics)]
+
+            stages.append(Stage('community_rollup', self.rollup_communities, [stages[-1].name]))
+
+            # Complaint clustering touches only Reclamacao nodes
+            stages.append(Stage('clusters', self.identify_reclamacao_clusters))
+
+            self.run_scheduled(stages)
+            self.publish_snapshot()
+
+            self.report_critical_stops()
+            self.report_communities()
+            self.report_pagerank()
             self.generate_summary_report()
 
             print("\nAnalysis completed successfully\n")
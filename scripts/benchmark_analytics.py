@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark the local graph analytics engine against Neo4j GDS
+Usage: python benchmark_analytics.py
+"""
+import time
+import numpy as np
+import pandas as pd
+from neo4j import GraphDatabase
+from analytics.local_graph import LocalGraphAnalytics
+import config
+
+BENCHMARK_GRAPH = 'benchmarkNetwork'
+
+GDS_QUERIES = {
+    'pagerank': """
+        CALL gds.pageRank.stream($name, {dampingFactor: 0.85, maxIterations: 20})
+        YIELD nodeId, score
+        RETURN gds.util.asNode(nodeId).id AS id, score AS value
+    """,
+    'betweenness': """
+        CALL gds.betweenness.stream($name)
+        YIELD nodeId, score
+        RETURN gds.util.asNode(nodeId).id AS id, score AS value
+    """,
+    'communities': """
+        CALL gds.louvain.stream($name, {relationshipWeightProperty: 'distance_meters'})
+        YIELD nodeId, communityId
+        RETURN gds.util.asNode(nodeId).id AS id, communityId AS value
+    """,
+}
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    value = fn(*args, **kwargs)
+    return value, time.perf_counter() - start
+
+
+def run_gds(session):
+    exists = session.run(
+        "CALL gds.graph.exists($name) YIELD exists RETURN exists", name=BENCHMARK_GRAPH
+    ).single()["exists"]
+    if exists:
+        session.run("CALL gds.graph.drop($name)", name=BENCHMARK_GRAPH)
+
+    _, project_seconds = timed(lambda: session.run("""
+        CALL gds.graph.project($name, 'Stop', 'CONNECTS_TO',
+          {relationshipProperties: ['distance_meters']})
+        YIELD nodeCount
+        RETURN nodeCount
+    """, name=BENCHMARK_GRAPH).consume())
+
+    results = {}
+    timings = {'export': project_seconds}
+    try:
+        for name, query in GDS_QUERIES.items():
+            data, seconds = timed(lambda: session.run(query, name=BENCHMARK_GRAPH).data())
+            results[name] = pd.DataFrame(data).set_index('id')['value']
+            timings[name] = seconds
+    finally:
+        session.run("CALL gds.graph.drop($name)", name=BENCHMARK_GRAPH)
+
+    return results, timings
+
+
+def run_local(session):
+    engine, export_seconds = timed(LocalGraphAnalytics.from_neo4j, session)
+    timings = {'export': export_seconds}
+
+    (pagerank, _), timings['pagerank'] = timed(engine.pagerank)
+    betweenness, timings['betweenness'] = timed(engine.betweenness, workers=config.ANALYSIS_WORKERS)
+    communities, timings['communities'] = timed(engine.communities, config.LOCAL_COMMUNITY_ALGORITHM)
+
+    index = pd.Index(engine.stop_ids, name='id')
+    results = {
+        'pagerank': pd.Series(pagerank, index=index),
+        'betweenness': pd.Series(betweenness, index=index),
+        'communities': pd.Series(communities, index=index),
+    }
+    return engine, results, timings
+
+
+def top_k_overlap(a, b, k=10):
+    return len(set(a.nlargest(k).index) & set(b.nlargest(k).index)) / k
+
+
+def main():
+    driver = GraphDatabase.driver(
+        config.NEO4J_URI,
+        auth=(config.NEO4J_USER, config.NEO4J_PASSWORD)
+    )
+
+    try:
+        with driver.session() as session:
+            print("Running local engine...")
+            engine, local, local_timings = run_local(session)
+
+            print("Running GDS...")
+            try:
+                gds, gds_timings = run_gds(session)
+            except Exception as e:
+                print(f"GDS unavailable: {e}")
+                gds, gds_timings = None, None
+
+        print(f"\n{'='*80}")
+        print(f"Graph: {engine.num_nodes:,} stops, {engine.num_relationships:,} connections")
+        print(f"{'='*80}\n")
+
+        print(f"{'Stage':15} {'Local (s)':>12} {'GDS (s)':>12}")
+        for stage in ['export', 'pagerank', 'betweenness', 'communities']:
+            gds_value = f"{gds_timings[stage]:12.3f}" if gds_timings else f"{'-':>12}"
+            print(f"{stage:15} {local_timings[stage]:12.3f} {gds_value}")
+
+        if gds is None:
+            return
+
+        print("\nAgreement with GDS:")
+        for name in ['pagerank', 'betweenness']:
+            joined = pd.concat([local[name], gds[name]], axis=1, join='inner', keys=['local', 'gds'])
+            spearman = joined['local'].corr(joined['gds'], method='spearman')
+            max_error = np.max(np.abs(joined['local'] - joined['gds']))
+            print(f"  {name:12} Spearman: {spearman:.4f} | "
+                  f"Top-10 overlap: {top_k_overlap(joined['local'], joined['gds']):.0%} | "
+                  f"Max abs diff: {max_error:.6f}")
+
+        gds_labels = gds['communities'].reindex(engine.stop_ids).fillna(-1)
+        _, gds_labels = np.unique(gds_labels.to_numpy(), return_inverse=True)
+        print(f"  {'communities':12} Modularity local: {engine.modularity(local['communities'].to_numpy()):.4f} | "
+              f"GDS: {engine.modularity(gds_labels):.4f} | "
+              f"Count local: {local['communities'].nunique()} | GDS: {gds['communities'].nunique()}")
+
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
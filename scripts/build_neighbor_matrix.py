@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Precompute stop pairs within NEIGHBOR_RADIUS_METERS and their distances
+Usage: python build_neighbor_matrix.py [radius_meters]
+"""
+import sys
+import time
+import pandas as pd
+from neo4j import GraphDatabase
+from analytics.data_version import bump_data_version
+from analytics.neighbors import StopNeighbors
+from analytics.routing import STOPS_QUERY
+import config
+
+
+def main():
+    radius = float(sys.argv[1]) if len(sys.argv) > 1 else config.NEIGHBOR_RADIUS_METERS
+
+    driver = GraphDatabase.driver(
+        config.NEO4J_URI,
+        auth=(config.NEO4J_USER, config.NEO4J_PASSWORD)
+    )
+
+    try:
+        with driver.session() as session:
+            stops = pd.DataFrame(session.run(STOPS_QUERY).data())
+
+        if stops.empty:
+            print("No stops loaded. Run the ETL pipeline first.")
+            sys.exit(1)
+
+        start = time.perf_counter()
+        neighbors = StopNeighbors.from_frame(stops, radius, workers=config.ANALYSIS_WORKERS)
+        elapsed = time.perf_counter() - start
+
+        neighbors.save(config.NEIGHBOR_MATRIX_DIR)
+        bump_data_version(config.DATA_VERSION_FILE)
+
+        n = len(neighbors.stop_ids)
+        print(f"{n:,} stops, {neighbors.matrix.nnz:,} neighbour pairs within {radius:.0f} m "
+              f"({neighbors.matrix.nnz / max(n, 1):.1f} per stop, {elapsed:.2f}s)")
+        print(f"Saved {config.NEIGHBOR_MATRIX_DIR}")
+
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Build or incrementally update the map tile pyramid (connections, complaints)
+Usage: python build_tiles.py [--full]
+"""
+import sys
+import time
+import pandas as pd
+from neo4j import GraphDatabase
+from pymongo import MongoClient
+from analytics.heatmap import heatmap_pipeline, heatmap_frame
+from analytics.routing import EDGES_QUERY
+from analytics.snapshot import SNAPSHOT_STOPS_QUERY
+from analytics.tiles import TileStore, tile_features
+import config
+
+
+def main():
+    full = '--full' in sys.argv[1:]
+
+    driver = GraphDatabase.driver(
+        config.NEO4J_URI,
+        auth=(config.NEO4J_USER, config.NEO4J_PASSWORD)
+    )
+    client = MongoClient(config.MONGO_URI)
+
+    try:
+        with driver.session() as session:
+            stops = pd.DataFrame(session.run(SNAPSHOT_STOPS_QUERY).data())
+            edges = pd.DataFrame(session.run(EDGES_QUERY).data(), columns=['source', 'target'])
+
+        if stops.empty:
+            print("No stops loaded. Run the ETL pipeline first.")
+            sys.exit(1)
+
+        collection = client[config.MONGO_DB].reclamacoes_1746_raw
+        complaint_cells = {
+            zoom: heatmap_frame(list(collection.aggregate(heatmap_pipeline(zoom))),
+                                zoom, config.HEATMAP_CELLS_PER_TILE)
+            for zoom in config.HEATMAP_ZOOM_LEVELS
+        }
+
+        start = time.perf_counter()
+        features = tile_features(
+            stops, edges, complaint_cells, config.TILE_MIN_ZOOM, config.TILE_MAX_ZOOM,
+            connections_min_zoom=config.TILE_CONNECTIONS_MIN_ZOOM
+        )
+        written, deleted = TileStore(config.TILES_FILE).update(
+            features, config.TILE_MIN_ZOOM, config.TILE_MAX_ZOOM, full=full
+        )
+        elapsed = time.perf_counter() - start
+
+        print(f"{len(features):,} features, zoom {config.TILE_MIN_ZOOM}-{config.TILE_MAX_ZOOM}: "
+              f"{written:,} tiles written, {deleted:,} removed ({elapsed:.2f}s)")
+        print(f"Saved {config.TILES_FILE}")
+
+    finally:
+        driver.close()
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
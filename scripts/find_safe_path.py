@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Find the safest and the shortest path between two stops
+Usage: python find_safe_path.py <origin_stop_id> <destination_stop_id>
+"""
+import sys
+import time
+from neo4j import GraphDatabase
+from analytics.routing import TransitGraph
+import config
+
+
+def print_path(title, path):
+    print(f"\n{title}")
+    print("-" * 80)
+
+    if path is None:
+        print("  No path found")
+        return
+
+    print(f"  Distance: {path['distance_meters']:,.0f} m | "
+          f"Risk-adjusted cost: {path['risk_adjusted_cost']:,.0f} | "
+          f"Max stop risk: {path['max_stop_risk']:.3f} | "
+          f"Hops: {path['hops']}")
+
+    for i, name in enumerate(path['names'], 1):
+        print(f"  {i:3}. {name}")
+
+
+def main():
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+
+    origin, destination = sys.argv[1], sys.argv[2]
+
+    driver = GraphDatabase.driver(
+        config.NEO4J_URI,
+        auth=(config.NEO4J_USER, config.NEO4J_PASSWORD)
+    )
+
+    try:
+        start = time.perf_counter()
+        with driver.session() as session:
+            graph = TransitGraph.from_neo4j(session)
+        print(f"Graph loaded: {graph.num_stops:,} stops, {graph.num_edges:,} connections "
+              f"({time.perf_counter() - start:.2f}s)")
+
+        for title, weight in [("Safest path (risk_adjusted_cost)", "cost"),
+                              ("Shortest path (distance_meters)", "distance")]:
+            start = time.perf_counter()
+            path = graph.shortest_path(origin, destination, weight=weight)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            print_path(f"{title} - {elapsed_ms:.2f} ms", path)
+
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
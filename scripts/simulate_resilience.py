@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Simulate the removal of the riskiest / most central stops from the network
+Usage: python simulate_resilience.py [strategy ...]
+"""
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+from neo4j import GraphDatabase
+from analytics.data_version import bump_data_version
+from analytics.resilience import (
+    RESILIENCE_STOPS_QUERY, RESILIENCE_EDGES_QUERY, STRATEGIES,
+    ResilienceSimulator, removal_order
+)
+import config
+
+ARTIFACT_NAME = 'resilience.json'
+
+
+def print_report(strategy, stops, order, sweep):
+    print(f"\nStrategy: {strategy}")
+    print("-" * 80)
+    print(f"  First removed: {', '.join(stops['name'].iloc[order[:5]].fillna('?'))}")
+    print(f"  {'Removed':>8} {'Components':>11} {'Largest':>9} {'Disconnected':>13} {'Avg path':>9}")
+
+    for row in sweep[sweep['removed'].isin(config.RESILIENCE_CHECKPOINTS)].itertuples():
+        avg_path = f"{row.avg_path_length:9.2f}" if pd.notna(row.avg_path_length) else f"{'-':>9}"
+        print(f"  {row.removed:8} {row.components:11,} {row.largest_component_fraction:9.1%} "
+              f"{row.disconnected_fraction:13.1%} {avg_path}")
+
+
+def main():
+    strategies = sys.argv[1:] or list(STRATEGIES)
+    unknown = [s for s in strategies if s not in STRATEGIES]
+    if unknown:
+        print(__doc__)
+        print(f"Unknown strategies: {unknown}, expected {STRATEGIES}")
+        sys.exit(1)
+
+    driver = GraphDatabase.driver(
+        config.NEO4J_URI,
+        auth=(config.NEO4J_USER, config.NEO4J_PASSWORD)
+    )
+
+    try:
+        start = time.perf_counter()
+        with driver.session() as session:
+            stops = pd.DataFrame(session.run(RESILIENCE_STOPS_QUERY).data())
+            edges = pd.DataFrame(session.run(RESILIENCE_EDGES_QUERY).data(), columns=['source', 'target'])
+
+        if stops.empty:
+            print("No stops loaded. Run the ETL pipeline first.")
+            sys.exit(1)
+
+        simulator = ResilienceSimulator.from_frames(stops, edges)
+        print(f"Graph loaded: {simulator.num_stops:,} stops, {simulator.graph.nnz // 2:,} links "
+              f"({time.perf_counter() - start:.2f}s)")
+
+        artifact = {
+            'generated_at': datetime.now().isoformat(),
+            'num_stops': simulator.num_stops,
+            'max_removed': config.RESILIENCE_MAX_REMOVED,
+            'sample_size': config.RESILIENCE_SAMPLE_SIZE,
+            'strategies': {},
+        }
+
+        for strategy in strategies:
+            start = time.perf_counter()
+            order = removal_order(stops, strategy)
+            sweep = simulator.simulate(
+                order,
+                max_removed=config.RESILIENCE_MAX_REMOVED,
+                checkpoints=config.RESILIENCE_CHECKPOINTS,
+                sample_size=config.RESILIENCE_SAMPLE_SIZE
+            )
+            print_report(strategy, stops, order, sweep)
+            print(f"  ({time.perf_counter() - start:.2f}s)")
+
+            sweep = sweep.astype(object).where(sweep.notna(), None)
+            artifact['strategies'][strategy] = {
+                'removed_stops': stops['id'].iloc[order[:config.RESILIENCE_MAX_REMOVED]].tolist(),
+                'sweep': sweep.to_dict('records'),
+            }
+
+        path = Path(config.ARTIFACTS_DIR) / ARTIFACT_NAME
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(artifact))
+        bump_data_version(config.DATA_VERSION_FILE)
+        print(f"\nSaved {path}")
+
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
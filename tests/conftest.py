@@ -0,0 +1,16 @@
+import os
+import sys
+from pathlib import Path
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def neo4j_test_uri():
+    """Bolt URI of a throwaway Neo4j database; tests using it delete all of its data"""
+    uri = os.getenv('NEO4J_TEST_URI')
+    if not uri:
+        pytest.skip("NEO4J_TEST_URI is not set")
+    return uri
@@ -0,0 +1,74 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from analytics.data_version import bump_data_version
+from webapp.utils.cache import SharedCache
+
+
+@pytest.fixture
+def paths(tmp_path):
+    version_file = tmp_path / 'data_version'
+    bump_data_version(version_file, 'v1')
+    return version_file, str(tmp_path / 'cache.db')
+
+
+def stored_versions(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return sorted(row[0] for row in conn.execute("SELECT version FROM cache"))
+    finally:
+        conn.close()
+
+
+def test_entries_are_shared_between_processes(paths):
+    version_file, db_path = paths
+    writer = SharedCache(version_file, db_path=db_path)
+    frame = pd.DataFrame({'id': ['s1', 's2'], 'risk_score': [0.1, 0.9]})
+    writer.put('stops', writer.version(), frame)
+
+    # A second instance stands in for another server process
+    reader = SharedCache(version_file, db_path=db_path)
+    found, value = reader.get('stops', reader.version())
+    assert found
+    pd.testing.assert_frame_equal(value, frame)
+
+
+def test_version_bump_invalidates_memory_and_sqlite(paths):
+    version_file, db_path = paths
+    cache = SharedCache(version_file, db_path=db_path)
+    cache.put('a', cache.version(), 1)
+    cache.put('b', cache.version(), 2)
+
+    bump_data_version(version_file, 'v2')
+    assert cache.version() == 'v2'
+    assert cache.get('a', 'v2') == (False, None)
+    assert stored_versions(db_path) == ['v1', 'v1']
+
+    # The first write under the new version drops the old rows, later ones do not purge
+    cache.put('a', 'v2', 10)
+    assert stored_versions(db_path) == ['v2']
+    cache.put('b', 'v2', 20)
+    assert cache.get('b', 'v2') == (True, 20)
+    assert stored_versions(db_path) == ['v2', 'v2']
+
+
+def test_memory_lru_evicts_oldest(paths):
+    version_file, _ = paths
+    cache = SharedCache(version_file, max_entries=2)
+    for key in 'abc':
+        cache.put(key, 'v1', key)
+
+    assert cache.get('a', 'v1') == (False, None)
+    assert cache.get('c', 'v1') == (True, 'c')
+
+
+def test_clear_empties_both_levels(paths):
+    version_file, db_path = paths
+    cache = SharedCache(version_file, db_path=db_path)
+    cache.put('a', 'v1', 1)
+    cache.clear()
+
+    assert cache.get('a', 'v1') == (False, None)
+    assert stored_versions(db_path) == []
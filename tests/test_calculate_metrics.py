@@ -0,0 +1,69 @@
+import importlib.util
+from pathlib import Path
+import pytest
+
+import config
+
+ROOT = Path(__file__).resolve().parent.parent
+spec = importlib.util.spec_from_file_location(
+    'calculate_metrics', ROOT / 'scripts' / '05_calculate_metrics.py'
+)
+calculate_metrics = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(calculate_metrics)
+
+
+@pytest.fixture
+def calculator(neo4j_test_uri, monkeypatch):
+    monkeypatch.setattr(config, 'NEO4J_URI', neo4j_test_uri)
+    monkeypatch.setattr(config, 'RISK_DECAY_KERNEL', 'linear')
+    calc = calculate_metrics.MetricsCalculator()
+
+    with calc.driver.session() as session:
+        session.run("MATCH (n) DETACH DELETE n")
+        session.run("""
+            CREATE (near:Stop {id: 'near', risk_score: 0.0, total_reclamacoes: 0}),
+                   (far:Stop {id: 'far', risk_score: 0.0, total_reclamacoes: 0}),
+                   (rec:Reclamacao {protocolo: 'p1', status: 'Aberto', peso: 2.0,
+                                    criticidade: 'Alta', data_abertura: datetime()}),
+                   (rec)-[:NEAR {distance_meters: 100.0}]->(near),
+                   (rec)-[:NEAR {distance_meters: 400.0}]->(far)
+        """)
+
+    yield calc
+
+    with calc.driver.session() as session:
+        session.run("MATCH (n) DETACH DELETE n")
+    calc.close()
+
+
+def stop_risk(calc):
+    with calc.driver.session() as session:
+        result = session.run("""
+            MATCH (s:Stop)
+            RETURN s.id AS id, s.risk_score AS risk_score, s.risk_level AS risk_level,
+                   s.total_reclamacoes AS total_reclamacoes, COUNT { (s)<-[:AFFECTS]-() } AS affects
+        """)
+        return {record['id']: record.data() for record in result}
+
+
+def test_shrinking_radius_clears_stops_out_of_range(calculator, monkeypatch):
+    monkeypatch.setattr(config, 'MAX_DISTANCE_AFFECTS_METERS', 500)
+    calculator.update_affects()
+    calculator.calculate_risk_scores()
+
+    before = stop_risk(calculator)
+    assert before['far']['affects'] == 1
+    assert before['far']['risk_score'] > 0
+    assert before['far']['total_reclamacoes'] == 1
+
+    monkeypatch.setattr(config, 'MAX_DISTANCE_AFFECTS_METERS', 200)
+    calculator.update_affects()
+    calculator.calculate_risk_scores()
+
+    after = stop_risk(calculator)
+    assert after['far']['affects'] == 0
+    assert after['far']['risk_score'] == 0.0
+    assert after['far']['total_reclamacoes'] == 0
+    assert after['far']['risk_level'] == 'Baixo'
+    assert after['near']['risk_score'] > 0
+    assert after['near']['total_reclamacoes'] == 1
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from analytics.clustering import cluster_labels, find_cluster_pairs
+from analytics.routing import haversine_meters
+
+
+def complaints(n=300, seed=11):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'servico': rng.choice(['Buraco', 'Iluminação', None], size=n),
+        'lat': -22.91 + rng.uniform(0, 0.02, n),
+        'lon': -43.19 + rng.uniform(0, 0.02, n),
+        'timestamp': 1.7e9 + rng.uniform(0, 30 * 86400, n),
+    })
+
+
+def brute_force_pairs(frame, radius_meters, window_days):
+    lat, lon, ts = frame['lat'].to_numpy(), frame['lon'].to_numpy(), frame['timestamp'].to_numpy()
+    category = frame['servico'].fillna('').to_numpy()
+    i, j = np.triu_indices(len(frame), k=1)
+    keep = (
+        (category[i] == category[j])
+        & (haversine_meters(lat[i], lon[i], lat[j], lon[j]) <= radius_meters)
+        & (np.abs(ts[i] - ts[j]) <= window_days * 86400)
+    )
+    return {(a, b) for a, b in zip(i[keep].tolist(), j[keep].tolist())}
+
+
+def test_find_cluster_pairs_matches_brute_force():
+    frame = complaints()
+    i, j, distance, hours = find_cluster_pairs(frame, radius_meters=200, window_days=7)
+
+    found = {(min(a, b), max(a, b)) for a, b in zip(i.tolist(), j.tolist())}
+    assert len(found) == len(i)
+    assert found == brute_force_pairs(frame, 200, 7)
+    assert (distance <= 200).all() and (hours <= 7 * 24).all()
+
+
+def test_find_cluster_pairs_handles_tiny_frames():
+    i, j, distance, hours = find_cluster_pairs(complaints(n=1))
+    assert len(i) == len(j) == len(distance) == len(hours) == 0
+
+
+def test_cluster_labels_are_dense_and_largest_first():
+    # Components {0, 1, 2}, {3, 4} and singleton 5
+    labels, sizes = cluster_labels(6, np.array([0, 1, 3]), np.array([1, 2, 4]))
+
+    assert labels.tolist() == [0, 0, 0, 1, 1, -1]
+    assert sizes.tolist() == [3, 3, 3, 2, 2, 1]
@@ -0,0 +1,22 @@
+import numpy as np
+
+from analytics.heatmap import breakdown_pipeline, breakdown_series, heatmap_pipeline
+
+
+def test_breakdown_filters_like_the_heatmap():
+    match = {'servico': {'$in': ['Buraco']}, 'status': {'$in': ['Aberto']}}
+    breakdown = breakdown_pipeline(12, ('status', 'servico'), match)
+
+    assert breakdown[0] == heatmap_pipeline(12, match)[0]
+    assert set(breakdown[1]['$facet']) == {'status', 'servico'}
+
+
+def test_breakdown_series_keeps_mongo_order():
+    result = {
+        'status': [{'_id': 'Aberto', 'count': 7}, {'_id': 'Fechado', 'count': 2}],
+        'servico': [],
+    }
+    series = breakdown_series(result, ('status', 'servico'))
+
+    assert series['status'].to_dict() == {'Aberto': 7, 'Fechado': 2}
+    assert series['servico'].empty and series['servico'].dtype == np.int64
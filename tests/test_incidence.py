@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from analytics.incidence import RouteStopIncidence, metrics_to_rows
+
+ROUTES = ['r1', 'r1', 'r1', 'r2', 'r2', 'r3']
+STOPS = ['a', 'b', 'c', 'b', 'd', 'd']
+TRIPS = [10.0, 10.0, 0.0, 4.0, 1.0, 2.0]
+RISK = {'a': 0.2, 'b': 0.8, 'c': np.nan, 'd': 0.5}
+
+
+def build():
+    route_codes, route_ids = pd.factorize(pd.Series(ROUTES))
+    stop_codes, stop_ids = pd.factorize(pd.Series(STOPS))
+    incidence = RouteStopIncidence(
+        np.asarray(route_ids), np.asarray(stop_ids), route_codes, stop_codes, np.asarray(TRIPS)
+    )
+    risk = np.array([RISK[stop] for stop in incidence.stop_ids])
+    return incidence, risk
+
+
+def test_route_metrics_match_groupby():
+    incidence, risk = build()
+    metrics = incidence.route_metrics(risk, high_risk_threshold=0.6, percentiles=(50, 90)).set_index('id')
+
+    links = pd.DataFrame({'route': ROUTES, 'stop': STOPS, 'trips': TRIPS})
+    links['risk'] = links['stop'].map(RISK)
+    grouped = links.groupby('route')
+
+    assert metrics['total_stops'].to_dict() == {'r1': 3, 'r2': 2, 'r3': 1}
+    assert metrics['high_risk_stops'].to_dict() == {'r1': 1, 'r2': 1, 'r3': 0}
+    np.testing.assert_allclose(metrics['avg_risk_score'], grouped['risk'].mean().reindex(metrics.index))
+
+    for p in (50, 90):
+        expected = grouped['risk'].apply(lambda r: np.nanpercentile(r, p)).reindex(metrics.index)
+        np.testing.assert_allclose(metrics[f'risk_p{p}'], expected)
+
+    # Trip-weighted over stops with a risk score: r1 = (10*0.2 + 10*0.8) / 20
+    np.testing.assert_allclose(metrics.loc['r1', 'weighted_risk_score'], 0.5)
+    np.testing.assert_allclose(metrics.loc['r2', 'weighted_risk_score'], (4 * 0.8 + 0.5) / 5)
+
+
+def test_metrics_to_rows_maps_nan_to_none():
+    rows = metrics_to_rows(pd.DataFrame({'id': ['r1'], 'avg_risk_score': [np.nan]}))
+    assert rows == [{'id': 'r1', 'avg_risk_score': None}]
@@ -0,0 +1,89 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.local_graph import LocalGraphAnalytics
+
+
+def analytics_for(graph):
+    nodes = sorted(graph.nodes)
+    stops = pd.DataFrame({'id': nodes})
+    edges = pd.DataFrame(
+        [(u, v, data.get('distance', 1.0)) for u, v, data in graph.edges(data=True)],
+        columns=['source', 'target', 'distance']
+    )
+    return nodes, LocalGraphAnalytics.from_frames(stops, edges)
+
+
+@pytest.fixture
+def directed():
+    return nx.gnp_random_graph(40, 0.08, seed=3, directed=True)
+
+
+@pytest.fixture
+def two_communities():
+    """Two 6-cliques joined by a single bridge, both directions"""
+    graph = nx.DiGraph()
+    for offset in (0, 6):
+        for i in range(6):
+            for j in range(6):
+                if i != j:
+                    graph.add_edge(offset + i, offset + j, distance=1.0)
+    graph.add_edge(5, 6, distance=1.0)
+    graph.add_edge(6, 5, distance=1.0)
+    return graph
+
+
+def test_betweenness_matches_networkx(directed):
+    nodes, local = analytics_for(directed)
+    expected = nx.betweenness_centrality(directed, normalized=False)
+
+    np.testing.assert_allclose(local.betweenness(workers=1), [expected[v] for v in nodes], atol=1e-9)
+
+
+def test_betweenness_counts_parallel_edges():
+    # Two parallel a->b connections double the a->b->c shortest paths against a->d->c
+    stops = pd.DataFrame({'id': ['a', 'b', 'c', 'd']})
+    edges = pd.DataFrame({'source': ['a', 'a', 'b', 'a', 'd'], 'target': ['b', 'b', 'c', 'd', 'c']})
+    local = LocalGraphAnalytics.from_frames(stops, edges)
+
+    np.testing.assert_allclose(local.betweenness(workers=1), [0.0, 2 / 3, 0.0, 1 / 3])
+
+
+def test_pagerank_matches_networkx_scaled(two_communities):
+    nodes, local = analytics_for(two_communities)
+    scores, _ = local.pagerank(max_iterations=200, tolerance=1e-12)
+    expected = nx.pagerank(two_communities, alpha=0.85, tol=1e-12)
+
+    # GDS scores are unnormalized: without dangling nodes they sum to n
+    np.testing.assert_allclose(scores, [len(nodes) * expected[v] for v in nodes], rtol=1e-6)
+
+
+@pytest.mark.parametrize('algorithm', ['louvain', 'label_propagation'])
+def test_communities_split_the_cliques(two_communities, algorithm):
+    nodes, local = analytics_for(two_communities)
+    labels = local.communities(algorithm)
+
+    assert len(set(labels[:6])) == 1 and len(set(labels[6:])) == 1
+    assert labels[0] != labels[6]
+
+    partition = [{v for v, label in zip(nodes, labels) if label == c} for c in set(labels)]
+    expected = nx.community.modularity(two_communities.to_undirected(), partition, weight='distance')
+    assert local.modularity(labels) == pytest.approx(expected)
+
+
+def test_approximate_betweenness_is_exact_with_every_source(directed):
+    nodes, local = analytics_for(directed)
+    estimate, std_error, report = local.approximate_betweenness(initial_sample=8, target_error=0.0, workers=1)
+
+    assert report['exact'] and report['sample_size'] == len(nodes)
+    np.testing.assert_allclose(estimate, local.betweenness(workers=1), atol=1e-9)
+    np.testing.assert_allclose(std_error, 0.0, atol=1e-9)
+
+
+def test_approximate_betweenness_stops_at_max_sample(directed):
+    _, local = analytics_for(directed)
+    _, _, report = local.approximate_betweenness(initial_sample=4, target_error=0.0, max_sample=10, workers=1)
+
+    assert report['sample_size'] == 10 and not report['exact']
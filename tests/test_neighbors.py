@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics import neighbors
+from analytics.neighbors import StopNeighbors, stops_near_points
+from analytics.routing import haversine_meters
+
+
+@pytest.fixture
+def stops():
+    rng = np.random.default_rng(21)
+    frame = pd.DataFrame({
+        'id': [f's{i}' for i in range(400)],
+        'lat': -22.91 + rng.uniform(0, 0.03, 400),
+        'lon': -43.19 + rng.uniform(0, 0.03, 400),
+    })
+    # Two stops sharing coordinates must still be neighbours at distance 0
+    frame.loc[1, ['lat', 'lon']] = frame.loc[0, ['lat', 'lon']]
+    return frame
+
+
+def brute_force(lats, lons, stops, radius_meters):
+    distance = haversine_meters(
+        lats[:, None], lons[:, None], stops['lat'].to_numpy()[None, :], stops['lon'].to_numpy()[None, :]
+    )
+    i, j = np.nonzero(distance <= radius_meters)
+    return {(a, stops['id'].iloc[b]): distance[a, b] for a, b in zip(i.tolist(), j.tolist())}
+
+
+def test_stop_matrix_matches_brute_force(stops):
+    matrix = StopNeighbors.from_frame(stops, 300, workers=1)
+    lats, lons = stops['lat'].to_numpy(), stops['lon'].to_numpy()
+    expected = {
+        (stops['id'].iloc[a], stop_id): d
+        for (a, stop_id), d in brute_force(lats, lons, stops, 300).items()
+        if stops['id'].iloc[a] != stop_id
+    }
+
+    found = {}
+    for stop_id in stops['id']:
+        near = matrix.neighbors(stop_id)
+        assert near['distance_meters'].is_monotonic_increasing
+        found.update({(stop_id, other): d for other, d in zip(near['id'], near['distance_meters'])})
+
+    assert found.keys() == expected.keys()
+    for pair, distance in expected.items():
+        assert found[pair] == pytest.approx(distance, abs=0.01)
+    assert matrix.neighbors('s0')['id'].iloc[0] == 's1'
+
+
+def test_save_and_load_round_trip(stops, tmp_path):
+    matrix = StopNeighbors.from_frame(stops, 300, workers=1)
+    for _ in range(3):
+        matrix.save(tmp_path, keep=2)
+
+    loaded = StopNeighbors.load(tmp_path)
+    assert StopNeighbors.exists(tmp_path)
+    assert len([p for p in tmp_path.iterdir() if (p / 'meta.json').exists()]) == 2
+    pd.testing.assert_frame_equal(loaded.neighbors('s5', 150), matrix.neighbors('s5', 150))
+    assert loaded.neighbors('unknown').empty
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_stops_near_points_matches_brute_force(stops, monkeypatch, workers):
+    # Force the process pool onto a small point set
+    monkeypatch.setattr(neighbors, 'PARALLEL_MIN_POINTS', 10)
+    rng = np.random.default_rng(4)
+    lats = -22.91 + rng.uniform(0, 0.03, 500)
+    lons = -43.19 + rng.uniform(0, 0.03, 500)
+    lats[3] = np.nan
+
+    pairs = stops_near_points(stops, lats, lons, 200, workers=workers)
+    expected = brute_force(lats, lons, stops, 200)
+
+    assert pairs['point'].is_monotonic_increasing
+    assert set(zip(pairs['point'], pairs['stop_id'])) == expected.keys()
+    np.testing.assert_allclose(
+        pairs['distance_meters'], [expected[key] for key in zip(pairs['point'], pairs['stop_id'])]
+    )
+
+
+def test_radius_larger_than_cells_is_rejected(stops):
+    grid = neighbors.SpatialGrid(stops['lat'], stops['lon'], 100)
+    with pytest.raises(ValueError):
+        grid.query(stops['lat'], stops['lon'], 200)
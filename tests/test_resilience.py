@@ -0,0 +1,58 @@
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.resilience import ResilienceSimulator, removal_order
+
+
+@pytest.fixture
+def network():
+    graph = nx.gnp_random_graph(60, 0.05, seed=9, directed=True)
+    stops = pd.DataFrame({'id': [f's{v}' for v in graph.nodes]})
+    edges = pd.DataFrame([(f's{u}', f's{v}') for u, v in graph.edges], columns=['source', 'target'])
+    return graph.to_undirected(), ResilienceSimulator.from_frames(stops, edges)
+
+
+def test_sweep_matches_networkx_components(network):
+    reference, simulator = network
+    order = np.random.default_rng(1).permutation(simulator.num_stops)
+    sweep = simulator.sweep(order, max_removed=40).set_index('removed')
+
+    graph = reference.copy()
+    for k in range(41):
+        if k > 0:
+            graph.remove_node(int(order[k - 1]))
+        sizes = [len(c) for c in nx.connected_components(graph)]
+        remaining = graph.number_of_nodes()
+        connected = sum(s * (s - 1) // 2 for s in sizes)
+
+        row = sweep.loc[k]
+        assert row['components'] == len(sizes)
+        assert row['largest_component'] == max(sizes)
+        assert row['connected_pairs'] == connected
+        assert row['disconnected_pairs'] == remaining * (remaining - 1) // 2 - connected
+
+
+def test_sweep_on_a_path_splits_at_the_middle():
+    stops = pd.DataFrame({'id': list('abcde')})
+    edges = pd.DataFrame({'source': list('abcd'), 'target': list('bcde')})
+    sweep = ResilienceSimulator.from_frames(stops, edges).sweep([2, 0], max_removed=2)
+
+    assert sweep['components'].tolist() == [1, 2, 2]
+    assert sweep['largest_component'].tolist() == [5, 2, 2]
+    assert sweep['disconnected_pairs'].tolist() == [0, 4, 2]
+
+
+def test_removal_order_strategies():
+    stops = pd.DataFrame({
+        'risk_score': [0.9, 0.2, 0.5],
+        'betweenness_centrality': [1.0, 30.0, 5.0],
+        'risk_level': ['Alto', 'Baixo', 'Alto'],
+    })
+
+    assert removal_order(stops, 'risk').tolist() == [0, 2, 1]
+    assert removal_order(stops, 'betweenness').tolist() == [1, 2, 0]
+    assert removal_order(stops, 'critical').tolist() == [2, 0, 1]
+    with pytest.raises(ValueError):
+        removal_order(stops, 'random')
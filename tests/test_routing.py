@@ -0,0 +1,116 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.routing import TransitGraph, haversine_meters
+
+
+@pytest.fixture(scope='module')
+def network():
+    """A 6 x 6 street grid with random diagonals; weights are distinct to avoid ties"""
+    rng = np.random.default_rng(7)
+    side = 6
+    ids = [f's{i}' for i in range(side * side)]
+    lats = -22.90 + 0.002 * np.repeat(np.arange(side), side)
+    lons = -43.20 + 0.002 * np.tile(np.arange(side), side)
+    risk = rng.uniform(0, 1, side * side)
+    stops = pd.DataFrame({'id': ids, 'name': ids, 'lat': lats, 'lon': lons, 'risk_score': risk})
+
+    pairs = []
+    for i in range(side * side):
+        row, col = divmod(i, side)
+        if col + 1 < side:
+            pairs.append((i, i + 1))
+        if row + 1 < side:
+            pairs.append((i, i + side))
+        if row + 1 < side and col + 1 < side and rng.random() < 0.3:
+            pairs.append((i, i + side + 1))
+    pairs += [(j, i) for i, j in pairs]
+
+    source, target = np.array(pairs).T
+    # Never shorter than the straight line, so the A* heuristic stays admissible
+    distance = haversine_meters(lats[source], lons[source], lats[target], lons[target])
+    distance *= rng.uniform(1.0, 1.5, len(pairs))
+    edges = pd.DataFrame({
+        'source': np.array(ids)[source],
+        'target': np.array(ids)[target],
+        'distance': distance,
+        'cost': distance * (1 + (risk[source] + risk[target]) / 2),
+        'travel_time': distance / rng.uniform(5, 12, len(pairs)),
+    })
+
+    reference = nx.DiGraph()
+    for row in edges.itertuples():
+        reference.add_edge(row.source, row.target, distance=row.distance, cost=row.cost,
+                           travel_time=row.travel_time)
+    return TransitGraph(stops, edges, tree_cache_size=4), reference
+
+
+@pytest.mark.parametrize('weight', ['distance', 'cost'])
+@pytest.mark.parametrize('use_heuristic', [True, False])
+def test_shortest_path_matches_networkx(network, weight, use_heuristic):
+    graph, reference = network
+    for source, target in [('s0', 's35'), ('s5', 's30'), ('s14', 's21')]:
+        path = graph.shortest_path(source, target, weight=weight, use_heuristic=use_heuristic)
+        expected = nx.dijkstra_path(reference, source, target, weight=weight)
+        assert path['stop_ids'] == expected
+        assert path['distance_meters'] == pytest.approx(
+            nx.path_weight(reference, expected, 'distance'))
+
+
+def test_heuristic_expands_fewer_stops(network):
+    graph, _ = network
+    astar = graph.shortest_path('s0', 's35', weight='distance')
+    dijkstra = graph.shortest_path('s0', 's35', weight='distance', use_heuristic=False)
+    assert astar['expanded_stops'] <= dijkstra['expanded_stops']
+
+
+def test_k_shortest_paths_follow_yen_order(network):
+    graph, reference = network
+    paths = graph.k_shortest_paths('s0', 's35', k=5, risk_weight=1.0)
+
+    expected = list(islice(nx.shortest_simple_paths(reference, 's0', 's35', weight='cost'), 5))
+    assert [p['rank'] for p in paths] == [1, 2, 3, 4, 5]
+    assert [p['blended_cost'] for p in paths] == pytest.approx(
+        [nx.path_weight(reference, p, 'cost') for p in expected])
+    assert paths[0]['stop_ids'] == expected[0]
+    assert len({tuple(p['stop_ids']) for p in paths}) == 5
+
+
+def test_pareto_paths_are_non_dominated(network):
+    graph, _ = network
+    frontier = graph.pareto_paths('s0', 's35', k=2)
+
+    assert frontier
+    for a in frontier:
+        for b in frontier:
+            assert not (b['distance_meters'] < a['distance_meters']
+                        and b['risk_adjusted_cost'] < a['risk_adjusted_cost'])
+
+
+def test_reachable_matches_bounded_dijkstra(network):
+    graph, reference = network
+    reached = graph.reachable('s14', 600, weight='distance').set_index('id')
+
+    expected = nx.single_source_dijkstra_path_length(reference, 's14', cutoff=600, weight='distance')
+    assert set(reached.index) == set(expected)
+    for stop_id, length in expected.items():
+        assert reached.loc[stop_id, 'distance'] == pytest.approx(length)
+
+
+def test_caches_survive_concurrent_sessions(network):
+    graph, _ = network
+    budgets = [300 + 10 * i for i in range(40)]
+
+    # More keys than tree_cache_size, hit from several threads at once
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        reached = list(executor.map(lambda b: len(graph.reachable('s0', b, 'distance')), budgets))
+        trees = list(executor.map(lambda i: graph.shortest_path_tree(i % 36, 0.5)[0][i % 36], range(200)))
+
+    assert reached == sorted(reached)
+    assert len(graph._reach) <= graph.tree_cache_size
+    assert len(graph._trees) <= graph.tree_cache_size
+    assert trees == [0.0] * 200
@@ -0,0 +1,71 @@
+import threading
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.local_graph import LocalGraphAnalytics
+from analytics.scheduler import Stage, critical_path, run_stages
+
+
+def test_stages_start_after_their_dependencies():
+    log, lock = [], threading.Lock()
+
+    def record(name):
+        def fn():
+            with lock:
+                log.append(name)
+        return fn
+
+    stages = [
+        Stage('write', record('write'), ['betweenness', 'pagerank']),
+        Stage('betweenness', record('betweenness'), ['projection']),
+        Stage('pagerank', record('pagerank'), ['projection']),
+        Stage('projection', record('projection')),
+    ]
+    timings = run_stages(stages, max_workers=2)
+
+    assert log[0] == 'projection' and log[-1] == 'write'
+    for stage in stages:
+        for dependency in stage.depends_on:
+            assert timings[dependency][1] <= timings[stage.name][0]
+
+    path, total = critical_path(stages, timings)
+    assert path[0] == 'projection' and path[-1] == 'write'
+    assert total >= 0
+
+
+def test_first_error_stops_new_stages():
+    ran = []
+
+    def fail():
+        raise RuntimeError('projection failed')
+
+    stages = [Stage('projection', fail), Stage('write', lambda: ran.append('write'), ['projection'])]
+    with pytest.raises(RuntimeError, match='projection failed'):
+        run_stages(stages)
+    assert ran == []
+
+
+@pytest.mark.parametrize('stages', [
+    [Stage('a', None, ['b']), Stage('b', None, ['a'])],
+    [Stage('a', None, ['missing'])],
+    [Stage('a', None), Stage('a', None)],
+])
+def test_invalid_stage_graphs_are_rejected(stages):
+    with pytest.raises(ValueError):
+        run_stages(stages)
+
+
+def test_process_pool_runs_inside_a_stage():
+    # The local-analytics stage runs on a scheduler thread and starts its own pool
+    graph = nx.gnp_random_graph(30, 0.1, seed=5, directed=True)
+    stops = pd.DataFrame({'id': list(range(30))})
+    edges = pd.DataFrame(list(graph.edges), columns=['source', 'target'])
+    local = LocalGraphAnalytics.from_frames(stops, edges)
+    result = {}
+
+    run_stages([Stage('local_analytics', lambda: result.update(values=local.betweenness(workers=2)))])
+
+    expected = nx.betweenness_centrality(graph, normalized=False)
+    np.testing.assert_allclose(result['values'], [expected[v] for v in range(30)], atol=1e-9)
@@ -0,0 +1,92 @@
+import pandas as pd
+import pytest
+
+import config
+from analytics.data_version import bump_data_version, read_data_version
+from analytics.snapshot import (
+    SNAPSHOT_STOPS_QUERY, SNAPSHOT_ROUTES_QUERY, SNAPSHOT_EDGES_QUERY,
+    load_snapshot, retire_snapshot, write_snapshot
+)
+
+TABLE_ROWS = {
+    SNAPSHOT_STOPS_QUERY: [{'id': 's1', 'name': 'Stop 1', 'lat': -22.9, 'lon': -43.2,
+                            'risk_score': 0.4, 'risk_score_normalized': 100.0,
+                            'risk_level': 'Alto', 'total_complaints': 3}],
+    SNAPSHOT_ROUTES_QUERY: [{'id': 'r1', 'name': '100', 'full_name': 'Centro',
+                             'avg_risk': 0.4, 'total_stops': 1, 'high_risk_stops': 1}],
+    SNAPSHOT_EDGES_QUERY: [{'source': 's1', 'target': 's2', 'source_name': 'Stop 1',
+                            'target_name': 'Stop 2', 'distance': 120.0, 'cost': 168.0,
+                            'source_risk': 0.4, 'target_risk': 0.4}],
+}
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def data(self):
+        return self.rows
+
+    def single(self):
+        return None
+
+
+class FakeSession:
+    """Answers the snapshot export queries with fixed rows"""
+
+    def run(self, query, **params):
+        return FakeResult(TABLE_ROWS.get(query, []))
+
+
+@pytest.fixture
+def published(tmp_path):
+    """A snapshot written by step 05/06 and the data version it published"""
+    directory, version_file = tmp_path / 'snapshots', tmp_path / 'data_version'
+    version = 'v1'
+    write_snapshot(FakeSession(), directory, version)
+    bump_data_version(version_file, version)
+    return directory, version_file, version
+
+
+def test_bump_without_new_snapshot_keeps_serving_last_bundle(published):
+    directory, version_file, version = published
+
+    # e.g. make resilience / neighbors
+    bump_data_version(version_file)
+    assert read_data_version(version_file) != version
+
+    snapshot = load_snapshot(directory)
+    assert snapshot is not None
+    assert snapshot.version == version
+    assert snapshot.stops['id'].tolist() == ['s1']
+
+
+def test_fetchers_serve_last_bundle_after_bump(published, monkeypatch):
+    data_fetchers = pytest.importorskip('webapp.utils.data_fetchers')
+    directory, version_file, version = published
+    monkeypatch.setattr(config, 'SNAPSHOT_DIR', str(directory))
+    monkeypatch.setattr(config, 'WEBAPP_USE_SNAPSHOT', True)
+    monkeypatch.setattr(data_fetchers, 'data_version', lambda: read_data_version(version_file))
+
+    bump_data_version(version_file)
+
+    snapshot = data_fetchers.get_snapshot()
+    assert snapshot is not None and snapshot.version == version
+    pd.testing.assert_frame_equal(data_fetchers.get_stops_with_risk(), snapshot.stops)
+
+
+def test_retired_snapshot_is_not_served(published):
+    directory, version_file, version = published
+
+    retire_snapshot(directory)
+    bump_data_version(version_file)
+
+    assert load_snapshot(directory) is None
+    assert load_snapshot(directory, version).version == version
+
+
+def test_new_snapshot_replaces_current(published):
+    directory, version_file, version = published
+
+    write_snapshot(FakeSession(), directory, 'v2')
+    assert load_snapshot(directory).version == 'v2'
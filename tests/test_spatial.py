@@ -0,0 +1,43 @@
+import json
+import numpy as np
+
+from analytics.spatial import PolygonIndex, load_polygons_geojson, points_in_rings
+
+
+def square(x0, y0, size):
+    return [[x0, y0], [x0 + size, y0], [x0 + size, y0 + size], [x0, y0 + size], [x0, y0]]
+
+
+def test_points_in_rings_respects_holes():
+    rings = [np.array(square(0, 0, 4), dtype=float), np.array(square(1, 1, 2), dtype=float)]
+    lons = np.array([0.5, 2.0, 3.5, 5.0])
+    lats = np.array([0.5, 2.0, 3.5, 2.0])
+
+    assert points_in_rings(lons, lats, rings).tolist() == [True, False, True, False]
+
+
+def test_polygon_index_assigns_names(tmp_path):
+    path = tmp_path / 'bairros.geojson'
+    path.write_text(json.dumps({'type': 'FeatureCollection', 'features': [
+        {'type': 'Feature', 'properties': {'NOME': 'Centro', 'RP': 'Centro', 'pop': '41142'},
+         'geometry': {'type': 'Polygon', 'coordinates': [square(-43.19, -22.91, 0.02)]}},
+        {'type': 'Feature', 'properties': {'nome': 'Lapa'},
+         'geometry': {'type': 'MultiPolygon', 'coordinates': [
+             [square(-43.17, -22.91, 0.02)], [square(-43.10, -22.91, 0.005)]]}},
+        {'type': 'Feature', 'properties': {}, 'geometry': {'type': 'Point', 'coordinates': [0, 0]}},
+    ]}))
+
+    polygons = load_polygons_geojson(path)
+    assert [p['name'] for p in polygons] == ['Centro', 'Lapa']
+    assert polygons[0]['populacao'] == 41142 and polygons[0]['regiao'] == 'Centro'
+
+    index = PolygonIndex(polygons, cell_size_deg=0.005)
+    names = index.assign_names(
+        [-22.90, -22.90, -22.907, -22.80, np.nan],
+        [-43.18, -43.16, -43.098, -43.18, -43.18]
+    )
+    assert names.tolist() == ['Centro', 'Lapa', 'Lapa', None, None]
+
+
+def test_missing_polygon_file_is_empty(tmp_path):
+    assert load_polygons_geojson(tmp_path / 'missing.geojson') == []
@@ -0,0 +1,62 @@
+import importlib.util
+from pathlib import Path
+import pytest
+
+import config
+
+ROOT = Path(__file__).resolve().parent.parent
+spec = importlib.util.spec_from_file_location('sync', ROOT / 'scripts' / '04_sync_1746_to_neo4j.py')
+sync = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(sync)
+
+
+@pytest.fixture
+def syncer(neo4j_test_uri, monkeypatch):
+    monkeypatch.setattr(config, 'NEO4J_URI', neo4j_test_uri)
+    monkeypatch.setattr(config, 'AFFECTS_SEARCH_RADIUS_METERS', 300)
+    monkeypatch.setattr(config, 'MAX_DISTANCE_AFFECTS_METERS', 100)
+    monkeypatch.setattr(config, 'ANALYSIS_WORKERS', 1)
+    neo4j_sync = sync.Neo4jSync()
+
+    with neo4j_sync.neo4j_driver.session() as session:
+        session.run("MATCH (n) DETACH DELETE n")
+        # Roughly 100 m and 1 km north of the complaint; no NEAR links yet
+        session.run("""
+            CREATE (:Stop {id: 'near', lat: -22.9091, lon: -43.1900}),
+                   (:Stop {id: 'far', lat: -22.9000, lon: -43.1900}),
+                   (:Reclamacao {id: 'REC_1', lat: -22.9100, lon: -43.1900})
+        """)
+
+    yield neo4j_sync
+
+    with neo4j_sync.neo4j_driver.session() as session:
+        session.run("MATCH (n) DETACH DELETE n")
+    neo4j_sync.close()
+
+
+def near_links(neo4j_sync):
+    with neo4j_sync.neo4j_driver.session() as session:
+        return {
+            record['stop']: record['distance'] for record in session.run("""
+                MATCH (:Reclamacao {id: 'REC_1'})-[n:NEAR]->(s:Stop)
+                RETURN s.id AS stop, n.distance_meters AS distance
+            """)
+        }
+
+
+def test_backfill_links_old_complaints_once(syncer, monkeypatch):
+    syncer.backfill_near()
+
+    links = near_links(syncer)
+    assert set(links) == {'near'}
+    assert links['near'] == pytest.approx(100, abs=2)
+
+    with syncer.neo4j_driver.session() as session:
+        session.run("MATCH (:Reclamacao)-[n:NEAR]->() DELETE n")
+    syncer.backfill_near()
+    assert near_links(syncer) == {}
+
+    # A larger search radius links the complaint again, up to the new radius
+    monkeypatch.setattr(config, 'AFFECTS_SEARCH_RADIUS_METERS', 1500)
+    syncer.backfill_near()
+    assert set(near_links(syncer)) == {'near', 'far'}
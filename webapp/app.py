@@ -4,7 +4,7 @@ from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent))
 
-from utils.data_fetchers import get_system_stats
+from utils.data_fetchers import get_system_stats, get_neighborhood_metrics
 from utils.footer_console import render_query_console
 from utils.query_logger import QueryLogger
 
@@ -74,6 +74,32 @@ try:
 
     st.divider()
 
+    st.subheader("Bairros com Maior Risco")
+    neighborhoods = get_neighborhood_metrics()
+    if not neighborhoods.empty:
+        neighborhoods = neighborhoods[neighborhoods['total_stops'].fillna(0) > 0]
+    if neighborhoods.empty:
+        st.info("Nenhum bairro com paradas atribuídas. Execute o cálculo de métricas primeiro.")
+    else:
+        st.dataframe(
+            neighborhoods.head(10)[[
+                'name', 'regiao', 'total_stops', 'avg_risk', 'high_risk_stops',
+                'total_complaints', 'open_complaints'
+            ]].rename(columns={
+                'name': 'Bairro',
+                'regiao': 'Região',
+                'total_stops': 'Paradas',
+                'avg_risk': 'Risco Médio',
+                'high_risk_stops': 'Paradas de Alto Risco',
+                'total_complaints': 'Reclamações',
+                'open_complaints': 'Abertas'
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+
+    st.divider()
+
     st.subheader("Sobre")
     st.markdown("""
     **RioMobiAnalytics** integra dados de trânsito GTFS com 1746 reclamações de cidadãos para:
@@ -94,7 +120,7 @@ try:
 
     st.divider()
 
-    st.info("Nota: Os dados são armazenados em cache por 5 minutos. Atualize para ver as alterações mais recentes.")
+    st.info("Nota: Os dados ficam em cache até a próxima execução do pipeline, que invalida o cache automaticamente.")
 
 except Exception as e:
     st.error(f"Erro ao carregar dados do sistema: {str(e)}")
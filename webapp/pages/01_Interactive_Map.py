@@ -1,5 +1,7 @@
 import streamlit as st
 import folium
+from folium.plugins import HeatMap
+import numpy as np
 from streamlit_folium import st_folium
 import sys
 from pathlib import Path
@@ -7,12 +9,16 @@ from datetime import datetime
 
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
+import config
+
 from webapp.utils.data_fetchers import (
-    get_stops_with_risk, get_complaints_by_location, get_stop_details,
-    get_stop_complaints, get_complaint_details, get_nearby_complaints,
-    get_stop_routes, get_connected_stops
+    get_stops_with_risk, get_complaints_by_location, get_complaint_details,
+    get_nearby_complaints, get_stop_page_data, get_stop_viewport,
+    get_complaints_summary, get_complaint_heatmap, get_complaint_breakdown,
+    get_complaint_statuses, get_tile_store, get_map_tiles
 )
 from webapp.utils.footer_console import render_query_console
+from webapp.utils.map_layers import stop_marker_layer, cluster_marker_layer
 
 st.set_page_config(page_title="Mapa Interativo", page_icon="🗺️", layout="wide")
 
@@ -51,50 +57,98 @@ with tab1:
                     0
                 )
 
-                if risk_filter != "Todos":
-                    stops_df = stops_df[stops_df['risk_level'] == risk_filter]
-
-                stops_df = stops_df[stops_df['total_complaints'] >= min_complaints]
+                viewport = get_stop_viewport(
+                    None if risk_filter == "Todos" else risk_filter, min_complaints
+                )
+                stops_df = viewport.stops
 
                 st.metric("Paradas Exibidas", len(stops_df))
                 st.metric("Risco Médio", f"{stops_df['risk_score_normalized'].mean():.1f}")
 
+                # Extra layers come from the pre-built tile pyramid, when there is one
+                has_tiles = get_tile_store() is not None
+                show_connections = has_tiles and st.checkbox(
+                    "Conexões", help=f"Visível a partir do zoom {config.TILE_CONNECTIONS_MIN_ZOOM}"
+                )
+                show_density = has_tiles and st.checkbox("Densidade de Reclamações")
+
             with col1:
                 rio_center = [-22.9068, -43.1729]
+                view = st.session_state.setdefault(
+                    "stop_map_view", {"center": rio_center, "zoom": 11, "bounds": None}
+                )
+
                 m = folium.Map(
                     location=rio_center,
                     zoom_start=11,
                     tiles="OpenStreetMap"
                 )
 
-                def get_color(risk_score_norm):
-                    if risk_score_norm >= 67:
-                        return 'red'
-                    elif risk_score_norm >= 33:
-                        return 'orange'
-                    else:
-                        return 'green'
-
-                for _, stop in stops_df.iterrows():
-                    folium.CircleMarker(
-                        location=[stop['lat'], stop['lon']],
-                        radius=6,
-                        popup=folium.Popup(f"""
-                            <b>{stop['name']}</b><br>
-                            Pontuação de Risco: {stop['risk_score_normalized']:.1f}/100<br>
-                            Nível de Risco: {stop['risk_level']}<br>
-                            Reclamações: {int(stop['total_complaints'])}
-                        """, max_width=200),
-                        color=get_color(stop['risk_score_normalized']),
-                        fill=True,
-                        fillColor=get_color(stop['risk_score_normalized']),
-                        fillOpacity=0.7,
-                        weight=2
-                    ).add_to(m)
-
-                folium.LayerControl().add_to(m)
+                # Only what lies inside the last reported viewport is sent to the browser
+                mode, visible = viewport.view(view["bounds"], view["zoom"])
+                layer = folium.FeatureGroup(name="Paradas")
+
+                # Markers are built column-wise and drawn client-side, popups on demand
+                if mode == "clusters":
+                    cluster_marker_layer(visible).add_to(layer)
+                else:
+                    stop_marker_layer(visible, disable_clustering_at_zoom=config.MAP_DETAIL_ZOOM).add_to(layer)
+
+                tiles = {}
+                if (show_connections or show_density) and view["bounds"] is not None:
+                    tiles = get_map_tiles(view["zoom"], view["bounds"])
+
+                if show_connections and "connections" in tiles:
+                    def connection_style(feature):
+                        risk = feature["properties"]["risk"]
+                        color = 'red' if risk >= 0.6 else 'orange' if risk >= 0.333 else 'green'
+                        return {"color": color, "weight": 2, "opacity": 0.6}
+
+                    folium.GeoJson(
+                        tiles["connections"], name="Conexões", style_function=connection_style
+                    ).add_to(layer)
+
+                if show_density and "complaints" in tiles:
+                    cells = tiles["complaints"]["features"]
+                    top = max(cell["properties"]["count"] for cell in cells)
+                    HeatMap(
+                        [[cell["geometry"]["coordinates"][1], cell["geometry"]["coordinates"][0],
+                          cell["properties"]["count"] / top] for cell in cells],
+                        name="Densidade de Reclamações",
+                        radius=15,
+                        blur=12,
+                        min_opacity=0.3
+                    ).add_to(layer)
+
+                map_state = st_folium(
+                    m,
+                    width=None,
+                    height=600,
+                    center=view["center"],
+                    zoom=view["zoom"],
+                    feature_group_to_add=layer,
+                    returned_objects=["bounds", "zoom", "center"],
+                    key="stop_map"
+                )
 
-                st_folium(m, width=None, height=600)
+                if mode == "clusters":
+                    st.caption(f"{len(visible)} agrupamentos na área visível. "
+                               f"Aproxime o mapa para ver as paradas individualmente.")
+                else:
+                    st.caption(f"{len(visible)} paradas na área visível")
+
+                # Reload the layer for the new viewport after a pan or zoom
+                bounds = (map_state or {}).get("bounds") or {}
+                south_west, north_east = bounds.get("_southWest") or {}, bounds.get("_northEast") or {}
+                if south_west.get("lat") is not None and north_east.get("lat") is not None:
+                    new_view = {
+                        "center": [map_state["center"]["lat"], map_state["center"]["lng"]],
+                        "zoom": map_state["zoom"],
+                        "bounds": (south_west["lat"], south_west["lng"], north_east["lat"], north_east["lng"]),
+                    }
+                    if new_view["bounds"] != view["bounds"] or new_view["zoom"] != view["zoom"]:
+                        st.session_state.stop_map_view = new_view
+                        st.rerun()
 
             st.divider()
 
@@ -131,8 +185,11 @@ with tab1:
                 st.subheader("Detalhes da Parada")
 
                 stop_id = st.session_state.selected_stop_id
+                location = stops_df.loc[stops_df['id'] == stop_id, ['lat', 'lon']]
+                lat, lon = location.iloc[0] if not location.empty else (None, None)
                 try:
-                    stop_details = get_stop_details(stop_id)
+                    page_data = get_stop_page_data(stop_id, hops=1, lat=lat, lon=lon)
+                    stop_details = page_data["details"]
                     if stop_details:
                         col1, col2 = st.columns(2)
 
@@ -150,7 +207,7 @@ with tab1:
 
                         # Show complaints affecting this stop
                         st.markdown("### Reclamações Afetando Esta Parada")
-                        complaints_df = get_stop_complaints(stop_id)
+                        complaints_df = page_data["complaints"]
                         if not complaints_df.empty:
                             # Display summary
                             by_category = complaints_df['servico'].value_counts()
@@ -168,9 +225,17 @@ with tab1:
                         else:
                             st.info("Nenhuma reclamação afetando esta parada")
 
+                        # Complaints around the stop, including ones not linked to it
+                        st.markdown("### Reclamações Próximas (raio de 500m)")
+                        nearby = page_data["nearby"]
+                        if nearby is not None and not nearby.empty:
+                            st.dataframe(nearby[['protocolo', 'servico', 'status', 'criticidade', 'peso']].head(10), use_container_width=True, hide_index=True)
+                        else:
+                            st.info("Nenhuma reclamação próxima")
+
                         # Show connected stops
                         st.markdown("### Paradas Conectadas (Próximo Nó)")
-                        connected = get_connected_stops(stop_id, hops=1)
+                        connected = page_data["connected"]
                         if not connected.empty:
                             st.dataframe(connected[['name', 'risk_level', 'risk_score', 'total_complaints']], use_container_width=True, hide_index=True)
                         else:
@@ -192,8 +257,9 @@ with tab2:
 
     try:
         complaints_df = get_complaints_by_location()
+        summary_df = get_complaints_summary()
 
-        if complaints_df.empty:
+        if summary_df.empty:
             st.warning("Nenhum dado de reclamação disponível.")
         else:
             col1, col2 = st.columns([3, 1])
@@ -203,23 +269,37 @@ with tab2:
 
                 category_filter = st.multiselect(
                     "Categorias",
-                    options=complaints_df['servico'].unique(),
+                    options=summary_df['category'].dropna().tolist(),
                     default=None
                 )
 
                 status_filter = st.multiselect(
                     "Status",
-                    options=complaints_df['status'].unique(),
+                    options=get_complaint_statuses(),
                     default=None
                 )
 
-                if category_filter:
+                zoom_level = st.select_slider(
+                    "Resolução da Grade",
+                    options=config.HEATMAP_ZOOM_LEVELS,
+                    value=config.HEATMAP_ZOOM_LEVELS[len(config.HEATMAP_ZOOM_LEVELS) // 2]
+                )
+
+                weight_by = st.radio("Intensidade", ["Contagem", "Peso"], horizontal=True)
+
+                if category_filter and not complaints_df.empty:
                     complaints_df = complaints_df[complaints_df['servico'].isin(category_filter)]
 
-                if status_filter:
+                if status_filter and not complaints_df.empty:
                     complaints_df = complaints_df[complaints_df['status'].isin(status_filter)]
 
-                st.metric("Reclamações Exibidas", len(complaints_df))
+                # Aggregated in MongoDB over every complaint, not a sample
+                heatmap_df = get_complaint_heatmap(
+                    zoom_level, tuple(category_filter), tuple(status_filter)
+                )
+
+                st.metric("Reclamações no Mapa", f"{int(heatmap_df['count'].sum()):,}")
+                st.metric("Células Ocupadas", f"{len(heatmap_df):,}")
 
             with col1:
                 rio_center = [-22.9068, -43.1729]
@@ -229,30 +309,15 @@ with tab2:
                     tiles="OpenStreetMap"
                 )
 
-                def get_complaint_color(peso):
-                    if peso >= 1.0:
-                        return 'red'
-                    elif peso >= 0.5:
-                        return 'orange'
-                    else:
-                        return 'blue'
-
-                for _, complaint in complaints_df.iterrows():
-                    folium.CircleMarker(
-                        location=[complaint['lat'], complaint['lon']],
-                        radius=4,
-                        popup=folium.Popup(f"""
-                            <b>Reclamação {complaint['protocolo']}</b><br>
-                            Categoria: {complaint['servico']}<br>
-                            Status: {complaint['status']}<br>
-                            Criticidade: {complaint['criticidade']}<br>
-                            Peso: {complaint['peso']:.2f}
-                        """, max_width=200),
-                        color=get_complaint_color(complaint['peso']),
-                        fill=True,
-                        fillColor=get_complaint_color(complaint['peso']),
-                        fillOpacity=0.6,
-                        weight=1
+                if not heatmap_df.empty:
+                    weights = heatmap_df['count' if weight_by == "Contagem" else 'peso'].to_numpy(dtype=float)
+                    weights = weights / weights.max() if weights.max() > 0 else weights
+                    HeatMap(
+                        np.column_stack([heatmap_df['lat'], heatmap_df['lon'], weights]).tolist(),
+                        name="Densidade de Reclamações",
+                        radius=15,
+                        blur=12,
+                        min_opacity=0.3
                     ).add_to(m)
 
                 st_folium(m, width=None, height=600)
@@ -325,22 +390,23 @@ with tab2:
                     st.error(f"Erro ao carregar detalhes da reclamação: {str(e)}")
             else:
                 # Show summary of complaints
-                st.write(f"**Total de Reclamações**: {len(complaints_df)}")
+                st.write(f"**Total de Reclamações**: {int(heatmap_df['count'].sum()):,}")
 
-                if not complaints_df.empty:
-                    # Summary by status
-                    st.write("**Por Status**:")
-                    by_status = complaints_df['status'].value_counts()
-                    for status, count in by_status.items():
-                        emoji = "🟢" if status == 'Fechado' else "🟠" if status == 'Em Atendimento' else "🔴"
-                        st.write(f"  {emoji} {status}: {count}")
-
-                    # Summary by category
-                    st.write("**Por Categoria**:")
-                    by_category = complaints_df['servico'].value_counts()
-                    for category, count in by_category.items():
-                        st.write(f"  • {category}: {count}")
+                # Grouped in MongoDB over the same complaints as the heatmap
+                breakdown = get_complaint_breakdown(
+                    zoom_level, tuple(category_filter), tuple(status_filter)
+                )
 
+                st.write("**Por Status**:")
+                for status, count in breakdown['status'].items():
+                    emoji = "🟢" if status == 'Fechado' else "🟠" if status == 'Em Atendimento' else "🔴"
+                    st.write(f"  {emoji} {status}: {count:,}")
+
+                st.write("**Por Categoria**:")
+                for category, count in breakdown['servico'].items():
+                    st.write(f"  • {category}: {count:,}")
+
+                if not complaints_df.empty:
                     # Sample complaints
                     st.write("**Amostra de Reclamações**:")
                     for _, comp in complaints_df.head(10).iterrows():
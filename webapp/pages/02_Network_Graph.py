@@ -1,12 +1,16 @@
 import streamlit as st
 import plotly.graph_objects as go
-import networkx as nx
+import numpy as np
+import pandas as pd
 import sys
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from webapp.utils.data_fetchers import get_network_graph_data, get_stops_with_risk
+from webapp.utils.data_fetchers import (
+    get_network_graph_data, get_network_layout, get_stops_with_risk,
+    get_community_graph, get_resilience_report
+)
 from webapp.utils.footer_console import render_query_console
 
 st.set_page_config(page_title="Grafo de Rede", page_icon="🕸️", layout="wide")
@@ -26,119 +30,106 @@ try:
         with col2:
             st.markdown("### Configurações")
 
+            edge_limit = max(len(network_df), 50)
             max_edges = st.slider(
                 "Máximo de Arestas para Exibir",
                 min_value=50,
-                max_value=500,
-                value=200,
+                max_value=edge_limit,
+                value=min(2000, edge_limit),
                 step=50,
-                help="Mais arestas = renderização mais lenta"
+                help="Arestas e nós são desenhados em WebGL; o layout é calculado uma vez por versão dos dados"
             )
 
             show_labels = st.checkbox("Mostrar Rótulos de Nós", value=False)
 
             layout_algo = st.selectbox(
                 "Algoritmo de Layout",
-                ["Spring", "Kamada-Kawai", "Circular"],
-                index=0
+                ["Geográfico", "Spring", "Kamada-Kawai", "Circular"],
+                index=0,
+                help="Spring e Kamada-Kawai ficam lentos acima de alguns milhares de nós"
             )
 
         network_subset = network_df.head(max_edges)
+        nodes = get_network_layout(max_edges, layout_algo).merge(
+            stops_df.drop_duplicates('id')[['id', 'name', 'risk_score', 'total_complaints']],
+            on='id', how='left'
+        )
+        node_index = pd.Series(np.arange(len(nodes)), index=nodes['id'])
+        source = node_index.reindex(network_subset['source']).to_numpy()
+        target = node_index.reindex(network_subset['target']).to_numpy()
+        node_x = nodes['x'].to_numpy(dtype=np.float64)
+        node_y = nodes['y'].to_numpy(dtype=np.float64)
+
+        # All edges as one polyline: x0, x1, gap for each edge
+        edge_x = np.full(3 * len(source), np.nan)
+        edge_y = np.full(3 * len(source), np.nan)
+        edge_x[0::3], edge_x[1::3] = node_x[source], node_x[target]
+        edge_y[0::3], edge_y[1::3] = node_y[source], node_y[target]
+
+        edge_trace = go.Scattergl(
+            x=edge_x,
+            y=edge_y,
+            mode='lines',
+            line=dict(width=0.5, color='#888'),
+            hoverinfo='none',
+            showlegend=False
+        )
 
-        G = nx.Graph()
-
-        for _, row in network_subset.iterrows():
-            G.add_edge(
-                row['source'],
-                row['target'],
-                distance=row['distance'],
-                cost=row['cost']
-            )
-
-        stop_dict = stops_df.set_index('id').to_dict('index')
-
-        for node in G.nodes():
-            if node in stop_dict:
-                G.nodes[node].update(stop_dict[node])
-
-        if layout_algo == "Spring":
-            pos = nx.spring_layout(G, k=0.5, iterations=50)
-        elif layout_algo == "Kamada-Kawai":
-            pos = nx.kamada_kawai_layout(G)
-        else:
-            pos = nx.circular_layout(G)
-
-        edge_trace = []
-        for edge in G.edges():
-            x0, y0 = pos[edge[0]]
-            x1, y1 = pos[edge[1]]
-            edge_trace.append(
-                go.Scatter(
-                    x=[x0, x1, None],
-                    y=[y0, y1, None],
-                    mode='lines',
-                    line=dict(width=0.5, color='#888'),
-                    hoverinfo='none',
-                    showlegend=False
-                )
-            )
-
-        node_x = []
-        node_y = []
-        node_text = []
-        node_color = []
-
-        for node in G.nodes():
-            x, y = pos[node]
-            node_x.append(x)
-            node_y.append(y)
-
-            if node in stop_dict:
-                info = stop_dict[node]
-                node_text.append(
-                    f"Nome: {info.get('name', 'Desconhecido')}<br>"
-                    f"Risco: {info.get('risk_score', 0):.3f}<br>"
-                    f"Reclamações: {int(info.get('total_complaints', 0))}"
-                )
-                node_color.append(info.get('risk_score', 0))
-            else:
-                node_text.append("Sem dados")
-                node_color.append(0)
+        known = nodes['name'].notna().to_numpy()
+        risk = nodes['risk_score'].fillna(0).to_numpy(dtype=np.float64)
+        complaints = nodes['total_complaints'].fillna(0).astype(np.int64).astype(str)
+        node_text = np.where(
+            known,
+            "Nome: " + nodes['name'].fillna('').astype(str) +
+            "<br>Risco: " + pd.Series(risk).map('{:.3f}'.format) +
+            "<br>Reclamações: " + complaints,
+            "Sem dados"
+        )
 
-        node_trace = go.Scatter(
+        node_trace = go.Scattergl(
             x=node_x,
             y=node_y,
             mode='markers+text' if show_labels else 'markers',
             hoverinfo='text',
-            text=[stop_dict.get(node, {}).get('name', '')[:10] for node in G.nodes()] if show_labels else None,
+            text=nodes['name'].fillna('').astype(str).str[:10] if show_labels else None,
             textposition="top center",
             hovertext=node_text,
             marker=dict(
                 showscale=True,
                 colorscale='Reds',
-                color=node_color,
-                size=10,
+                color=risk,
+                size=10 if len(nodes) <= 2000 else 5,
                 colorbar=dict(
                     thickness=15,
                     title="Pontuação de Risco",
                     xanchor='left',
                     x=1.02
                 ),
-                line_width=2
+                line_width=2 if len(nodes) <= 2000 else 0
             )
         )
 
-        fig = go.Figure(data=edge_trace + [node_trace],
+        # Undirected, deduplicated edge count, as nx.Graph would keep them
+        low, high = np.minimum(source, target), np.maximum(source, target)
+        n_nodes = len(nodes)
+        n_edges = len(np.unique(low * n_nodes + high))
+
+        xaxis = dict(showgrid=False, zeroline=False, showticklabels=False)
+        yaxis = dict(showgrid=False, zeroline=False, showticklabels=False)
+        if layout_algo == "Geográfico":
+            yaxis.update(scaleanchor='x', scaleratio=1 / np.cos(np.radians(np.nanmean(node_y))))
+
+        fig = go.Figure(data=[edge_trace, node_trace],
                        layout=go.Layout(
                            title=dict(
-                               text=f'Grafo de Rede de Trânsito ({len(G.nodes())} nós, {len(G.edges())} arestas)',
+                               text=f'Grafo de Rede de Trânsito ({n_nodes} nós, {n_edges} arestas)',
                                font=dict(size=16)
                            ),
                            showlegend=False,
                            hovermode='closest',
                            margin=dict(b=0, l=0, r=0, t=40),
-                           xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
-                           yaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+                           xaxis=xaxis,
+                           yaxis=yaxis,
                            height=700
                        ))
 
@@ -152,39 +143,160 @@ try:
         col3, col4, col5, col6 = st.columns(4)
 
         with col3:
-            st.metric("Total de Nós", len(G.nodes()))
+            st.metric("Total de Nós", n_nodes)
 
         with col4:
-            st.metric("Total de Arestas", len(G.edges()))
+            st.metric("Total de Arestas", n_edges)
 
         with col5:
-            avg_degree = sum(dict(G.degree()).values()) / len(G.nodes())
+            avg_degree = 2 * n_edges / n_nodes
             st.metric("Grau Médio", f"{avg_degree:.2f}")
 
         with col6:
-            density = nx.density(G)
+            density = 2 * n_edges / (n_nodes * (n_nodes - 1)) if n_nodes > 1 else 0
             st.metric("Densidade de Rede", f"{density:.4f}")
 
         st.divider()
 
         st.subheader("Paradas com Maior Risco")
 
-        # Sort stops by risk score instead
-        top_stops_by_risk = sorted([(node_id, stop_dict.get(node_id, {}).get('risk_score', 0))
-                                     for node_id in G.nodes() if node_id in stop_dict],
-                                    key=lambda x: x[1], reverse=True)[:10]
-
-        top_nodes_data = []
-        for node_id, risk_score in top_stops_by_risk:
-            info = stop_dict[node_id]
-            top_nodes_data.append({
-                "Nome": info.get('name', 'Desconhecido'),
-                "Pontuação de Risco": f"{info.get('risk_score', 0):.3f}",
-                "Total de Reclamações": int(info.get('total_complaints', 0))
-            })
+        top_nodes = nodes[known].nlargest(10, 'risk_score')
+        top_nodes_data = pd.DataFrame({
+            "Nome": top_nodes['name'].to_numpy(),
+            "Pontuação de Risco": top_nodes['risk_score'].fillna(0).map('{:.3f}'.format).to_numpy(),
+            "Total de Reclamações": top_nodes['total_complaints'].fillna(0).astype(np.int64).to_numpy()
+        })
 
         st.table(top_nodes_data)
 
+        st.divider()
+
+        st.subheader("Rede de Comunidades")
+
+        communities_df, flows_df = get_community_graph()
+
+        if communities_df.empty:
+            st.info("Nenhuma comunidade calculada. Execute as análises de grafo primeiro.")
+        else:
+            community_pos = communities_df.set_index('id')[['lon', 'lat']]
+
+            # One NaN-separated polyline per width bucket instead of a trace per flow
+            flow_traces = []
+            if not flows_df.empty:
+                source_pos = community_pos.reindex(flows_df['source']).to_numpy(dtype=np.float64)
+                target_pos = community_pos.reindex(flows_df['target']).to_numpy(dtype=np.float64)
+                share = flows_df['connections'].to_numpy(dtype=np.float64) / flows_df['connections'].max()
+                bucket = np.minimum((share * 5).astype(np.int64), 4)
+
+                for b in np.unique(bucket):
+                    members = np.flatnonzero(bucket == b)
+                    flow_x = np.full(3 * len(members), np.nan)
+                    flow_y = np.full(3 * len(members), np.nan)
+                    flow_x[0::3], flow_x[1::3] = source_pos[members, 0], target_pos[members, 0]
+                    flow_y[0::3], flow_y[1::3] = source_pos[members, 1], target_pos[members, 1]
+
+                    flow_traces.append(go.Scatter(
+                        x=flow_x,
+                        y=flow_y,
+                        mode='lines',
+                        # Width at the bucket's midpoint connection share
+                        line=dict(width=1.0 + int(b), color='#888'),
+                        hoverinfo='none',
+                        showlegend=False
+                    ))
+
+            community_trace = go.Scatter(
+                x=communities_df['lon'],
+                y=communities_df['lat'],
+                mode='markers',
+                hoverinfo='text',
+                hovertext=[
+                    f"Comunidade {row.id}<br>"
+                    f"Paradas: {row.size}<br>"
+                    f"Risco Médio: {row.avg_risk:.3f}<br>"
+                    f"Risco Máximo: {row.max_risk:.3f}<br>"
+                    f"Paradas de Alto Risco: {row.high_risk_stops}"
+                    for row in communities_df.itertuples()
+                ],
+                marker=dict(
+                    showscale=True,
+                    colorscale='Reds',
+                    color=communities_df['avg_risk'],
+                    size=6 + 30 * (communities_df['size'] / communities_df['size'].max()) ** 0.5,
+                    colorbar=dict(title="Risco Médio"),
+                    line_width=1
+                )
+            )
+
+            community_fig = go.Figure(
+                data=flow_traces + [community_trace],
+                layout=go.Layout(
+                    title=dict(
+                        text=f'Comunidades ({len(communities_df)} nós, {len(flows_df)} fluxos)',
+                        font=dict(size=16)
+                    ),
+                    showlegend=False,
+                    hovermode='closest',
+                    margin=dict(b=0, l=0, r=0, t=40),
+                    xaxis=dict(showgrid=False, zeroline=False, showticklabels=False),
+                    yaxis=dict(showgrid=False, zeroline=False, showticklabels=False,
+                               scaleanchor='x'),
+                    height=600
+                )
+            )
+
+            st.plotly_chart(community_fig, use_container_width=True)
+
+        st.divider()
+
+        st.subheader("Resiliência da Rede")
+
+        resilience = get_resilience_report()
+
+        if resilience is None:
+            st.info("Nenhuma simulação de resiliência disponível. Execute `make resilience`.")
+        else:
+            strategy_labels = {
+                'risk': 'Maior Risco',
+                'betweenness': 'Maior Centralidade',
+                'critical': 'Alto Risco por Centralidade'
+            }
+            metric_labels = {
+                'largest_component_fraction': 'Maior Componente (% das paradas)',
+                'disconnected_fraction': 'Pares Desconectados (%)',
+                'components': 'Componentes'
+            }
+
+            metric = st.selectbox(
+                "Métrica",
+                list(metric_labels),
+                format_func=metric_labels.get
+            )
+
+            resilience_fig = go.Figure()
+            for strategy, result in resilience['strategies'].items():
+                sweep = result['sweep']
+                resilience_fig.add_trace(go.Scatter(
+                    x=sweep['removed'],
+                    y=sweep[metric],
+                    mode='lines',
+                    name=strategy_labels.get(strategy, strategy)
+                ))
+
+            resilience_fig.update_layout(
+                xaxis_title="Paradas Removidas",
+                yaxis_title=metric_labels[metric],
+                yaxis_tickformat='.0%' if metric.endswith('fraction') else None,
+                height=450,
+                margin=dict(b=0, l=0, r=0, t=20)
+            )
+
+            st.plotly_chart(resilience_fig, use_container_width=True)
+            st.caption(
+                f"Simulação com {resilience['num_stops']:,} paradas, "
+                f"gerada em {resilience['generated_at'][:16].replace('T', ' ')}"
+            )
+
 except Exception as e:
     st.error(f"Erro ao carregar grafo de rede: {str(e)}")
     st.exception(e)
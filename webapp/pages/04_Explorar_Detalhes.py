@@ -6,9 +6,9 @@ import pandas as pd
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
 from webapp.utils.data_fetchers import (
-    get_stops_with_risk, get_stop_details, get_stop_complaints,
-    get_stop_routes, get_connected_stops, get_complaint_details,
-    get_nearby_complaints, get_complaints_by_location
+    get_stops_with_risk, get_complaint_details, get_nearby_complaints,
+    get_complaints_by_location, get_safe_path, get_alternative_paths,
+    get_reachable_stops, get_walkable_stops, get_stop_page_data
 )
 from webapp.utils.footer_console import render_query_console
 
@@ -17,7 +17,7 @@ st.set_page_config(page_title="Explorar Detalhes", page_icon="🔍", layout="wid
 st.title("Explorador de Detalhes")
 st.markdown("Busque e explore informações detalhadas sobre paradas e reclamações")
 
-tab1, tab2 = st.tabs(["Explorar Parada", "Explorar Reclamação"])
+tab1, tab2, tab3 = st.tabs(["Explorar Parada", "Explorar Reclamação", "Rota Segura"])
 
 with tab1:
     st.subheader("Pesquisar Parada")
@@ -45,7 +45,10 @@ with tab1:
 
             # Get detailed info
             try:
-                stop_details = get_stop_details(stop_id)
+                page_data = get_stop_page_data(
+                    stop_id, hops=1, lat=selected_stop['lat'], lon=selected_stop['lon']
+                )
+                stop_details = page_data["details"]
 
                 if stop_details:
                     # Overview metrics
@@ -89,7 +92,7 @@ with tab1:
                     st.divider()
                     st.subheader("🚌 Rotas que Servem Esta Parada")
 
-                    routes_df = get_stop_routes(stop_id)
+                    routes_df = page_data["routes"]
                     if not routes_df.empty:
                         display_cols = st.columns([1, 3, 1, 1])
                         with display_cols[0]:
@@ -118,7 +121,7 @@ with tab1:
                     st.divider()
                     st.subheader("⚠️ Reclamações Afetando Esta Parada")
 
-                    complaints_df = get_stop_complaints(stop_id)
+                    complaints_df = page_data["complaints"]
 
                     if not complaints_df.empty:
                         # Category distribution
@@ -167,11 +170,26 @@ with tab1:
                     else:
                         st.info("Nenhuma reclamação afetando esta parada nos últimos 30 dias")
 
+                    # Complaints around the stop, including ones not linked to it
+                    st.divider()
+                    st.subheader("🔎 Reclamações Próximas (raio de 500m)")
+
+                    nearby = page_data["nearby"]
+
+                    if nearby is not None and not nearby.empty:
+                        st.dataframe(
+                            nearby[['protocolo', 'servico', 'status', 'criticidade', 'peso']],
+                            use_container_width=True,
+                            hide_index=True
+                        )
+                    else:
+                        st.info("Nenhuma reclamação próxima")
+
                     # Connected stops
                     st.divider()
                     st.subheader("🔗 Paradas Conectadas")
 
-                    connected_df = get_connected_stops(stop_id, hops=1)
+                    connected_df = page_data["connected"]
 
                     if not connected_df.empty:
                         st.dataframe(
@@ -182,6 +200,77 @@ with tab1:
                     else:
                         st.info("Nenhuma parada diretamente conectada")
 
+                    walkable_df = get_walkable_stops(stop_id)
+
+                    if walkable_df is not None:
+                        st.markdown("**Paradas a Pé**")
+                        if walkable_df.empty:
+                            st.info("Nenhuma outra parada dentro do raio pré-calculado")
+                        else:
+                            walkable_df = walkable_df.merge(
+                                stops_df[['id', 'name', 'risk_level', 'risk_score']], on='id', how='left'
+                            )
+                            st.dataframe(
+                                walkable_df[['name', 'distance_meters', 'risk_level', 'risk_score']].rename(columns={
+                                    'name': 'Parada',
+                                    'distance_meters': 'Distância (m)',
+                                    'risk_level': 'Nível de Risco',
+                                    'risk_score': 'Risco'
+                                }),
+                                use_container_width=True,
+                                hide_index=True
+                            )
+
+                    # Reachability
+                    st.divider()
+                    st.subheader("⏱️ Alcance a Partir Desta Parada")
+
+                    col1, col2 = st.columns(2)
+
+                    with col1:
+                        reach_weight = st.radio(
+                            "Limite por:",
+                            ["Tempo de Viagem", "Custo Ajustado ao Risco"],
+                            horizontal=True,
+                            key="reach_weight"
+                        )
+
+                    with col2:
+                        if reach_weight == "Tempo de Viagem":
+                            minutes = st.slider("Minutos", 5, 60, 15, step=5, key="reach_minutes")
+                            weight, budget = "travel_time", minutes * 60
+                        else:
+                            budget = st.slider("Custo máximo", 500, 10000, 2000, step=500, key="reach_cost")
+                            weight = "cost"
+
+                    reachable_df = get_reachable_stops(stop_id, budget, weight=weight)
+
+                    if reachable_df is not None and len(reachable_df) > 1:
+                        reached = reachable_df.iloc[1:]
+
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            st.metric("Paradas Alcançáveis", len(reached))
+                        with col2:
+                            st.metric("Risco Médio", f"{reached['risk_score'].mean():.3f}")
+                        with col3:
+                            st.metric("Paradas de Alto Risco", int((reached['risk_score'] >= 0.6).sum()))
+
+                        st.dataframe(
+                            reached[['name', weight, 'hops', 'risk_score', 'exposure', 'max_risk']].rename(columns={
+                                'name': 'Parada',
+                                weight: 'Tempo (s)' if weight == 'travel_time' else 'Custo',
+                                'hops': 'Conexões',
+                                'risk_score': 'Risco',
+                                'exposure': 'Exposição Acumulada',
+                                'max_risk': 'Risco Máximo no Caminho'
+                            }),
+                            use_container_width=True,
+                            hide_index=True
+                        )
+                    else:
+                        st.info("Nenhuma parada alcançável dentro do limite")
+
                 else:
                     st.error("Parada não encontrada")
 
@@ -298,6 +387,92 @@ with tab2:
         else:
             st.info("Digite um protocolo para buscar detalhes da reclamação")
 
+with tab3:
+    st.subheader("Rota Mais Segura Entre Duas Paradas")
+
+    stops_df = get_stops_with_risk()
+
+    if stops_df.empty:
+        st.warning("Nenhum dado de parada disponível. Execute o pipeline ETL primeiro.")
+    else:
+        stop_names = sorted(stops_df[stops_df['name'].notna()]['name'].unique())
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            origin_name = st.selectbox("Origem:", options=stop_names, key="route_origin")
+
+        with col2:
+            destination_name = st.selectbox("Destino:", options=stop_names, key="route_destination")
+
+        if origin_name and destination_name and origin_name != destination_name:
+            origin_id = stops_df[stops_df['name'] == origin_name].iloc[0]['id']
+            destination_id = stops_df[stops_df['name'] == destination_name].iloc[0]['id']
+
+            try:
+                safest = get_safe_path(origin_id, destination_id, weight="cost")
+                shortest = get_safe_path(origin_id, destination_id, weight="distance")
+
+                if safest is None:
+                    st.info("Nenhum caminho encontrado entre as paradas selecionadas")
+                else:
+                    col1, col2 = st.columns(2)
+
+                    for col, title, path in [(col1, "🛡️ Mais Segura", safest), (col2, "📏 Mais Curta", shortest)]:
+                        with col:
+                            st.markdown(f"### {title}")
+                            st.metric("Distância (m)", f"{path['distance_meters']:,.0f}")
+                            st.metric("Custo Ajustado ao Risco", f"{path['risk_adjusted_cost']:,.0f}")
+                            st.metric("Risco Máximo no Caminho", f"{path['max_stop_risk']:.3f}")
+                            st.caption(f"{path['hops']} conexões")
+
+                            st.dataframe(
+                                pd.DataFrame({"Parada": path['names']}),
+                                use_container_width=True,
+                                hide_index=True
+                            )
+
+                    st.divider()
+                    st.markdown("### Rotas Alternativas")
+
+                    col1, col2 = st.columns(2)
+
+                    with col1:
+                        k_paths = st.slider("Número de alternativas", 2, 10, 3, key="route_k")
+
+                    with col2:
+                        tradeoff = st.select_slider(
+                            "Critério",
+                            options=["Pareto", "Distância", "Equilibrado", "Risco"],
+                            value="Pareto",
+                            help="Pareto mostra apenas rotas não dominadas em (distância, risco)"
+                        )
+
+                    risk_weight = {"Pareto": None, "Distância": 0.0, "Equilibrado": 0.5, "Risco": 1.0}[tradeoff]
+                    alternatives = get_alternative_paths(origin_id, destination_id, k=k_paths, risk_weight=risk_weight)
+
+                    if alternatives:
+                        st.dataframe(
+                            pd.DataFrame([
+                                {
+                                    "Alternativa": i,
+                                    "Distância (m)": round(p['distance_meters']),
+                                    "Custo Ajustado ao Risco": round(p['risk_adjusted_cost']),
+                                    "Risco Máximo": round(p['max_stop_risk'], 3),
+                                    "Conexões": p['hops'],
+                                    "Paradas": " → ".join(p['names'])
+                                }
+                                for i, p in enumerate(alternatives, 1)
+                            ]),
+                            use_container_width=True,
+                            hide_index=True
+                        )
+
+            except Exception as e:
+                st.error(f"Erro ao calcular rota: {str(e)}")
+        else:
+            st.info("Selecione duas paradas diferentes")
+
 st.divider()
 st.info("💡 Este explorador fornece detalhes abrangentes sobre paradas e reclamações incluindo distribuição de reclamações e relacionamentos.")
 
@@ -0,0 +1,151 @@
+import contextlib
+import copy
+import functools
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+from collections import OrderedDict
+import pandas as pd
+import config
+from analytics.data_version import read_data_version
+
+
+class SharedCache:
+    """Query results keyed by call and data version.
+
+    Entries live in a process-wide LRU and, when WEBAPP_CACHE_DB is set, in a SQLite
+    file shared by every server process. Nothing expires on a timer: a pipeline step
+    bumping the data version makes every older entry unreachable.
+    """
+
+    def __init__(self, version_file, max_entries=256, db_path=''):
+        self.version_file = version_file
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_stamp = None
+        self._purged_version = None
+
+        if self.db_path:
+            with self._connect() as conn, conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS cache (
+                        key TEXT PRIMARY KEY,
+                        version TEXT NOT NULL,
+                        value BLOB NOT NULL
+                    )
+                """)
+
+    def _connect(self):
+        # sqlite3's own context manager only commits; closing() releases the connection.
+        # Callers use `with self._connect() as conn, conn:` for both
+        return contextlib.closing(sqlite3.connect(self.db_path, timeout=5))
+
+    def version(self):
+        """Current data version, re-read only when the token file changes"""
+        try:
+            stamp = os.stat(self.version_file).st_mtime_ns
+        except FileNotFoundError:
+            stamp = None
+
+        if stamp != self._version_stamp or self._version is None:
+            version = read_data_version(self.version_file)
+            with self._lock:
+                if version != self._version:
+                    self._entries.clear()
+                self._version, self._version_stamp = version, stamp
+        return self._version
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                return True, entry[1]
+
+        if self.db_path:
+            with self._connect() as conn, conn:
+                row = conn.execute(
+                    "SELECT value FROM cache WHERE key = ? AND version = ?", (key, version)
+                ).fetchone()
+            if row is not None:
+                value = pickle.loads(row[0])
+                self._remember(key, version, value)
+                return True, value
+
+        return False, None
+
+    def put(self, key, version, value):
+        self._remember(key, version, value)
+
+        if self.db_path:
+            with self._lock:
+                purge = version != self._purged_version
+                self._purged_version = version
+
+            with self._connect() as conn, conn:
+                if purge:
+                    # Rows of older versions are unreachable; drop them once per version
+                    conn.execute("DELETE FROM cache WHERE version != ?", (version,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, version, value) VALUES (?, ?, ?)",
+                    (key, version, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+                )
+
+    def _remember(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            with self._connect() as conn, conn:
+                conn.execute("DELETE FROM cache")
+
+
+_cache = SharedCache(
+    config.DATA_VERSION_FILE,
+    max_entries=config.WEBAPP_CACHE_MAX_ENTRIES,
+    db_path=config.WEBAPP_CACHE_DB
+)
+
+
+def data_version():
+    return _cache.version()
+
+
+def _copy(value):
+    # Callers get their own copy, as with st.cache_data
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    return copy.deepcopy(value)
+
+
+def shared_cache(fn):
+    """Cache fn's result per (arguments, data version) in the shared cache"""
+    # The webapp imports its utils both as utils.* and webapp.utils.*
+    name = f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        call = pickle.dumps((name, args, sorted(kwargs.items())), protocol=pickle.HIGHEST_PROTOCOL)
+        key = hashlib.sha1(call).hexdigest()
+        version = _cache.version()
+
+        found, value = _cache.get(key, version)
+        if not found:
+            value = fn(*args, **kwargs)
+            _cache.put(key, version, value)
+        return _copy(value)
+
+    wrapper.clear = _cache.clear
+    return wrapper
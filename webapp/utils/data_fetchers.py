@@ -1,36 +1,79 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import networkx as nx
+import numpy as np
 import pandas as pd
-from .db_connections import get_mongo_db, query_neo4j
+import config
+from .db_connections import get_mongo_db, query_neo4j, query_neo4j_df
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from .query_logger import QueryLogger
+from .cache import shared_cache, data_version
+from analytics.routing import TransitGraph, STOPS_QUERY, EDGES_QUERY
+from analytics.heatmap import heatmap_pipeline, heatmap_frame, breakdown_pipeline, breakdown_series
+from analytics.neighbors import StopNeighbors
+from analytics.tiles import TileStore
+from analytics.viewport import StopViewport
+from analytics.snapshot import (
+    SNAPSHOT_STOPS_QUERY, SNAPSHOT_ROUTES_QUERY, SNAPSHOT_EDGES_QUERY, load_snapshot
+)
+from analytics.system_stats import SYSTEM_STATS_NAME, READ_QUERY as SYSTEM_STATS_READ_QUERY
 import time
 
-@st.cache_data(ttl=300)
+# Dtype hints for the large columnar fetches; other columns are inferred
+STOP_DTYPES = {"lat": "float64", "lon": "float64", "risk_score": "float64",
+               "risk_score_normalized": "float64"}
+EDGE_DTYPES = {"distance": "float64", "cost": "float64", "travel_time": "float64",
+               "source_risk": "float64", "target_risk": "float64"}
+
+def get_snapshot():
+    """The current dashboard bundle, or None when there is none to serve"""
+    if not config.WEBAPP_USE_SNAPSHOT:
+        return None
+    return _load_snapshot(data_version())
+
+@st.cache_resource(max_entries=1)
+def _load_snapshot(version):
+    # Steps that only rebuild side artifacts bump the data version without a new
+    # bundle, so the bundle is found through its own CURRENT pointer
+    return load_snapshot(config.SNAPSHOT_DIR)
+
 def get_stops_with_risk():
-    query = """
-    MATCH (s:Stop)
-    RETURN s.id as id, s.name as name, s.lat as lat, s.lon as lon,
-           s.risk_score as risk_score,
-           COALESCE(s.risk_score_normalized, 0) as risk_score_normalized,
-           s.risk_level as risk_level,
-           s.total_reclamacoes as total_complaints
-    ORDER BY s.risk_score_normalized DESC
-    """
-    data = query_neo4j(query)
-    return pd.DataFrame(data)
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.stops.copy()
+    return _query_stops_with_risk()
+
+@shared_cache
+def _query_stops_with_risk():
+    return query_neo4j_df(SNAPSHOT_STOPS_QUERY, dtypes=STOP_DTYPES)
 
-@st.cache_data(ttl=300)
 def get_routes_with_metrics():
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.routes.copy()
+    return _query_routes_with_metrics()
+
+@shared_cache
+def _query_routes_with_metrics():
+    return query_neo4j_df(SNAPSHOT_ROUTES_QUERY)
+
+@shared_cache
+def get_neighborhood_metrics():
     query = """
-    MATCH (r:Route)
-    RETURN r.id as id, r.short_name as name, r.long_name as full_name,
-           r.avg_risk_score as avg_risk, r.total_stops as total_stops,
-           r.high_risk_stops as high_risk_stops
-    ORDER BY r.avg_risk_score DESC
+    MATCH (n:Neighborhood)
+    RETURN n.name as name, n.regiao as regiao, n.populacao as populacao,
+           n.total_stops as total_stops, n.avg_risk_score as avg_risk,
+           n.high_risk_stops as high_risk_stops,
+           n.total_reclamacoes as total_complaints,
+           n.reclamacoes_abertas as open_complaints
+    ORDER BY n.avg_risk_score DESC
     """
-    data = query_neo4j(query)
-    return pd.DataFrame(data)
+    return query_neo4j_df(query)
 
-@st.cache_data(ttl=300)
+@shared_cache
 def get_complaints_summary():
     db = get_mongo_db()
     start_time = time.time()
@@ -51,21 +94,64 @@ def get_complaints_summary():
 
     return pd.DataFrame(results).rename(columns={"_id": "category"})
 
-@st.cache_data(ttl=300)
-def get_network_graph_data():
-    query = """
-    MATCH (s1:Stop)-[c:CONNECTS_TO]->(s2:Stop)
-    RETURN s1.id as source, s2.id as target, s1.name as source_name,
-           s2.name as target_name, c.distance_meters as distance,
-           c.risk_adjusted_cost as cost, s1.risk_score as source_risk,
-           s2.risk_score as target_risk
-    LIMIT 500
+def get_network_graph_data(limit=None):
+    limit = limit or config.NETWORK_GRAPH_MAX_EDGES
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.edges.head(limit).copy()
+    return _query_network_graph_data(limit)
+
+@shared_cache
+def _query_network_graph_data(limit):
+    return query_neo4j_df(SNAPSHOT_EDGES_QUERY + f"LIMIT {int(limit)}", dtypes=EDGE_DTYPES)
+
+@shared_cache
+def get_network_layout(max_edges, algorithm="Geográfico"):
+    """Node positions (id, x, y) for the first max_edges network edges.
+
+    Cached per data version, so Streamlit reruns do not recompute the layout.
+    'Geográfico' places stops at their coordinates; the force-directed layouts
+    get slow beyond a few thousand nodes.
     """
-    data = query_neo4j(query)
-    return pd.DataFrame(data)
+    edges = get_network_graph_data().head(max_edges)
+    nodes = pd.unique(pd.concat([edges['source'], edges['target']], ignore_index=True))
+
+    if algorithm == "Geográfico":
+        coords = get_stops_with_risk().drop_duplicates('id').set_index('id').reindex(nodes)
+        x = coords['lon'].to_numpy(dtype=np.float64, copy=True)
+        y = coords['lat'].to_numpy(dtype=np.float64, copy=True)
+        # Stops without coordinates go to the centre rather than off the plot
+        x[np.isnan(x)] = np.nanmean(x) if np.isfinite(x).any() else 0.0
+        y[np.isnan(y)] = np.nanmean(y) if np.isfinite(y).any() else 0.0
+        return pd.DataFrame({"id": nodes, "x": x, "y": y})
+
+    G = nx.Graph()
+    G.add_nodes_from(nodes)
+    G.add_edges_from(zip(edges['source'], edges['target']))
+
+    if algorithm == "Spring":
+        pos = nx.spring_layout(G, k=0.5, iterations=50, seed=42)
+    elif algorithm == "Kamada-Kawai":
+        pos = nx.kamada_kawai_layout(G)
+    else:
+        pos = nx.circular_layout(G)
+
+    xy = np.array([pos[node] for node in nodes]).reshape(-1, 2)
+    return pd.DataFrame({"id": nodes, "x": xy[:, 0], "y": xy[:, 1]})
 
-@st.cache_data(ttl=300)
 def get_system_stats():
+    snapshot = get_snapshot()
+    if snapshot is not None and snapshot.stats.get('avg_risk') is not None:
+        return dict(snapshot.stats)
+    return _query_system_stats()
+
+@shared_cache
+def _query_system_stats():
+    data = query_neo4j(SYSTEM_STATS_READ_QUERY, {"name": SYSTEM_STATS_NAME})
+    if data and data[0]['avg_risk'] is not None:
+        return data[0]
+
+    # SystemStats is written by the metrics step; until then aggregate directly
     query = """
     MATCH (s:Stop)
     WHERE s.risk_score IS NOT NULL
@@ -85,7 +171,34 @@ def get_system_stats():
     data = query_neo4j(query)
     return data[0] if data else {}
 
-@st.cache_data(ttl=300)
+@shared_cache
+def get_community_graph():
+    nodes = query_neo4j_df("""
+    MATCH (c:Community)
+    RETURN c.id as id, c.size as size, c.avg_risk as avg_risk, c.max_risk as max_risk,
+           c.high_risk_stops as high_risk_stops, c.centroid_lat as lat, c.centroid_lon as lon,
+           c.internal_connections as internal_connections
+    """)
+    edges = query_neo4j_df("""
+    MATCH (a:Community)-[f:FLOWS_TO]->(b:Community)
+    RETURN a.id as source, b.id as target, f.connections as connections,
+           f.risk_flow as risk_flow, f.avg_risk as avg_risk
+    """)
+    return nodes, edges
+
+@shared_cache
+def get_resilience_report():
+    """Sweeps written by scripts/simulate_resilience.py, or None if it has not run"""
+    path = Path(config.ARTIFACTS_DIR) / "resilience.json"
+    if not path.exists():
+        return None
+
+    report = json.loads(path.read_text())
+    for strategy in report["strategies"].values():
+        strategy["sweep"] = pd.DataFrame(strategy["sweep"])
+    return report
+
+@shared_cache
 def get_top_critical_stops(limit=10):
     query = f"""
     MATCH (s:Stop)
@@ -95,10 +208,9 @@ def get_top_critical_stops(limit=10):
     ORDER BY s.risk_score DESC
     LIMIT {limit}
     """
-    data = query_neo4j(query)
-    return pd.DataFrame(data)
+    return query_neo4j_df(query)
 
-@st.cache_data(ttl=300)
+@shared_cache
 def get_complaints_by_location():
     db = get_mongo_db()
     start_time = time.time()
@@ -113,50 +225,131 @@ def get_complaints_by_location():
 
     return pd.DataFrame(complaints)
 
-@st.cache_data(ttl=300)
-def get_stop_details(stop_id):
-    """Get detailed information about a specific stop"""
+STOP_ROUTE_COLUMNS = ["id", "short_name", "long_name", "type", "avg_risk"]
+STOP_COMPLAINT_COLUMNS = ["protocolo", "data_abertura", "servico", "status",
+                          "criticidade", "peso", "bairro", "descricao"]
+CONNECTED_STOP_COLUMNS = ["id", "name", "risk_score", "risk_level", "total_complaints"]
+
+@shared_cache
+def get_complaint_heatmap(zoom, categories=(), statuses=()):
+    """Complaint counts and peso sums per grid cell over the whole collection.
+
+    Groups on the cell ids stored at ingest for this zoom level (one of
+    config.HEATMAP_ZOOM_LEVELS), so only one row per occupied cell leaves MongoDB.
+    """
+    db = get_mongo_db()
+    start_time = time.time()
+
+    groups = list(db.reclamacoes_1746_raw.aggregate(
+        heatmap_pipeline(zoom, _complaint_filter(categories, statuses))
+    ))
+
+    duration_ms = (time.time() - start_time) * 1000
+    QueryLogger.log_mongodb("aggregate", {"collection": "reclamacoes_1746_raw"}, None, duration_ms)
+
+    return heatmap_frame(groups, zoom, config.HEATMAP_CELLS_PER_TILE)
+
+@shared_cache
+def get_complaint_breakdown(zoom, categories=(), statuses=()):
+    """Complaint counts by status and by category over the complaints on the heatmap.
+
+    Uses the same filter as get_complaint_heatmap, so the totals agree with the map.
+    Returns {'status': Series, 'servico': Series} of counts, largest first.
+    """
+    db = get_mongo_db()
+    start_time = time.time()
+
+    fields = ("status", "servico")
+    result = next(db.reclamacoes_1746_raw.aggregate(
+        breakdown_pipeline(zoom, fields, _complaint_filter(categories, statuses))
+    ), {})
+
+    duration_ms = (time.time() - start_time) * 1000
+    QueryLogger.log_mongodb("aggregate", {"collection": "reclamacoes_1746_raw"}, None, duration_ms)
+
+    return breakdown_series(result, fields)
+
+def _complaint_filter(categories, statuses):
+    match = {}
+    if categories:
+        match["servico"] = {"$in": list(categories)}
+    if statuses:
+        match["status"] = {"$in": list(statuses)}
+    return match
+
+@shared_cache
+def get_complaint_statuses():
+    db = get_mongo_db()
+    return sorted(filter(None, db.reclamacoes_1746_raw.distinct("status")))
+
+@shared_cache
+def get_stop_profile(stop_id, neighbor_limit=50):
+    """Details, routes, complaints and directly connected stops of one stop.
+
+    One round trip: each collection is gathered in its own CALL {} subquery, so
+    routes and complaints are never multiplied against each other. Cached per
+    stop and data version like every other fetcher. Returns None for an unknown
+    stop, otherwise a dict with details (dict) and routes, complaints and
+    connected (DataFrames).
+    """
     query = """
     MATCH (s:Stop {id: $stop_id})
-    OPTIONAL MATCH (r:Route)-[:SERVES]->(s)
-    OPTIONAL MATCH (rec:Reclamacao)-[:AFFECTS]->(s)
-    WHERE rec.status IN ['Aberto', 'Em Atendimento']
-    RETURN
-      s.id as id,
-      s.name as name,
-      s.lat as lat,
-      s.lon as lon,
-      s.risk_score as risk_score,
-      s.risk_level as risk_level,
-      s.total_reclamacoes as total_complaints,
-      s.reclamacoes_abertas as open_complaints,
-      s.wheelchair_accessible as wheelchair_accessible,
-      collect(DISTINCT r.short_name) as routes,
-      count(DISTINCT rec) as active_complaints
+    CALL {
+      WITH s
+      OPTIONAL MATCH (r:Route)-[:SERVES]->(s)
+      WITH r ORDER BY r.short_name
+      RETURN collect(r {.id, .short_name, .long_name, .type, avg_risk: r.avg_risk_score}) as routes
+    }
+    CALL {
+      WITH s
+      OPTIONAL MATCH (rec:Reclamacao)-[:AFFECTS]->(s)
+      WITH rec ORDER BY rec.data_abertura DESC
+      RETURN collect(rec {.protocolo, .data_abertura, .servico, .status,
+                          .criticidade, .peso, .bairro, .descricao}) as complaints
+    }
+    CALL {
+      WITH s
+      OPTIONAL MATCH (s)-[:CONNECTS_TO]-(connected:Stop)
+      WHERE connected <> s
+      WITH DISTINCT connected ORDER BY connected.risk_score DESC
+      LIMIT $neighbor_limit
+      RETURN collect(connected {.id, .name, .risk_score, .risk_level,
+                                total_complaints: connected.total_reclamacoes}) as connected
+    }
+    RETURN s {.id, .name, .lat, .lon, .risk_score, .risk_level, .wheelchair_accessible,
+              total_complaints: s.total_reclamacoes,
+              open_complaints: s.reclamacoes_abertas} as details,
+           routes, complaints, connected
     """
-    data = query_neo4j(query, {"stop_id": stop_id})
-    return data[0] if data else None
+    data = query_neo4j(query, {"stop_id": stop_id, "neighbor_limit": neighbor_limit})
+    if not data:
+        return None
+
+    row = data[0]
+    details = row["details"]
+    details["routes"] = sorted({r["short_name"] for r in row["routes"] if r["short_name"] is not None})
+    details["active_complaints"] = sum(
+        rec["status"] in ("Aberto", "Em Atendimento") for rec in row["complaints"]
+    )
+
+    return {
+        "details": details,
+        "routes": pd.DataFrame(row["routes"], columns=STOP_ROUTE_COLUMNS),
+        "complaints": pd.DataFrame(row["complaints"], columns=STOP_COMPLAINT_COLUMNS),
+        "connected": pd.DataFrame(row["connected"], columns=CONNECTED_STOP_COLUMNS),
+    }
+
+def get_stop_details(stop_id):
+    """Get detailed information about a specific stop"""
+    profile = get_stop_profile(stop_id)
+    return profile["details"] if profile else None
 
-@st.cache_data(ttl=300)
 def get_stop_complaints(stop_id):
     """Get all complaints affecting a specific stop"""
-    query = """
-    MATCH (rec:Reclamacao)-[:AFFECTS]->(s:Stop {id: $stop_id})
-    RETURN
-      rec.protocolo as protocolo,
-      rec.data_abertura as data_abertura,
-      rec.servico as servico,
-      rec.status as status,
-      rec.criticidade as criticidade,
-      rec.peso as peso,
-      rec.bairro as bairro,
-      rec.descricao as descricao
-    ORDER BY rec.data_abertura DESC
-    """
-    data = query_neo4j(query, {"stop_id": stop_id})
-    return pd.DataFrame(data)
+    profile = get_stop_profile(stop_id)
+    return profile["complaints"] if profile else pd.DataFrame(columns=STOP_COMPLAINT_COLUMNS)
 
-@st.cache_data(ttl=300)
+@shared_cache
 def get_complaint_details(protocolo):
     """Get detailed information about a specific complaint"""
     query = """
@@ -182,7 +375,7 @@ def get_complaint_details(protocolo):
     data = query_neo4j(query, {"protocolo": protocolo})
     return data[0] if data else None
 
-@st.cache_data(ttl=300)
+@shared_cache
 def get_nearby_complaints(lat, lon, radius_meters=500):
     """Get complaints near a specific location"""
     db = get_mongo_db()
@@ -218,27 +411,22 @@ def get_nearby_complaints(lat, lon, radius_meters=500):
 
     return pd.DataFrame(complaints)
 
-@st.cache_data(ttl=300)
 def get_stop_routes(stop_id):
     """Get all routes serving a specific stop"""
-    query = """
-    MATCH (r:Route)-[:SERVES]->(s:Stop {id: $stop_id})
-    RETURN
-      r.id as id,
-      r.short_name as short_name,
-      r.long_name as long_name,
-      r.type as type,
-      r.avg_risk_score as avg_risk
-    ORDER BY r.short_name
-    """
-    data = query_neo4j(query, {"stop_id": stop_id})
-    return pd.DataFrame(data)
+    profile = get_stop_profile(stop_id)
+    return profile["routes"] if profile else pd.DataFrame(columns=STOP_ROUTE_COLUMNS)
 
-@st.cache_data(ttl=300)
+@shared_cache
 def get_connected_stops(stop_id, hops=2):
     """Get stops connected to a specific stop"""
-    query = f"""
-    MATCH (start:Stop {{id: $stop_id}})-[:CONNECTS_TO*1..{hops}]-(connected:Stop)
+    graph = get_transit_graph()
+    if graph is None:
+        return pd.DataFrame()
+
+    # Neighbourhood from the in-memory graph, details by indexed id lookup
+    query = """
+    UNWIND $ids AS id
+    MATCH (connected:Stop {id: id})
     RETURN
       connected.id as id,
       connected.name as name,
@@ -248,5 +436,126 @@ def get_connected_stops(stop_id, hops=2):
     ORDER BY connected.risk_score DESC
     LIMIT 50
     """
-    data = query_neo4j(query, {"stop_id": stop_id})
-    return pd.DataFrame(data)
+    return query_neo4j_df(query, {"ids": graph.neighbors(stop_id, hops=hops)})
+
+def get_stop_page_data(stop_id, hops=1, lat=None, lon=None, nearby_radius=500):
+    """Everything a stop panel shows, fetched concurrently.
+
+    The Neo4j side is the single stop-profile query; connected stops beyond one hop
+    come from the in-memory graph and nearby complaints (only when lat/lon are
+    given) from MongoDB. These run on a thread pool, so the selection costs the
+    slowest query instead of their sum. Returns a dict with details, routes,
+    complaints, connected and nearby (None when not requested).
+    """
+    calls = {"profile": (get_stop_profile, (stop_id,))}
+    if hops != 1:
+        calls["connected"] = (get_connected_stops, (stop_id, hops))
+    if lat is not None and lon is not None and not (pd.isna(lat) or pd.isna(lon)):
+        calls["nearby"] = (get_nearby_complaints, (float(lat), float(lon), nearby_radius))
+
+    # Workers need the script context for session_state (query log) and st caches
+    ctx = get_script_run_ctx()
+    with ThreadPoolExecutor(
+        max_workers=min(config.WEBAPP_FETCH_WORKERS, len(calls)),
+        initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)
+    ) as executor:
+        futures = {name: executor.submit(fn, *args) for name, (fn, args) in calls.items()}
+        results = {name: future.result() for name, future in futures.items()}
+
+    profile = results.pop("profile") or {
+        "details": None,
+        "routes": pd.DataFrame(columns=STOP_ROUTE_COLUMNS),
+        "complaints": pd.DataFrame(columns=STOP_COMPLAINT_COLUMNS),
+        "connected": pd.DataFrame(columns=CONNECTED_STOP_COLUMNS),
+    }
+    profile.update(results)
+    profile.setdefault("nearby", None)
+    return profile
+
+def get_reachable_stops(stop_id, budget, weight="travel_time"):
+    """Stops reachable within a travel_time (seconds) or cost budget, with risk exposure"""
+    graph = get_transit_graph()
+    if graph is None:
+        return None
+    return graph.reachable(stop_id, budget, weight=weight)
+
+def get_transit_graph():
+    """Load the Stop/CONNECTS_TO network into an in-memory CSR graph"""
+    return _load_transit_graph(data_version())
+
+@st.cache_resource(max_entries=1)
+def _load_transit_graph(version):
+    stops = query_neo4j_df(STOPS_QUERY, dtypes=STOP_DTYPES)
+    if stops.empty:
+        return None
+    edges = query_neo4j_df(EDGES_QUERY, dtypes=EDGE_DTYPES)
+    return TransitGraph(stops, edges)
+
+def get_stop_neighbors():
+    """Memory-mapped neighbour matrix from scripts/build_neighbor_matrix.py, or None"""
+    return _load_stop_neighbors(data_version())
+
+@st.cache_resource(max_entries=1)
+def _load_stop_neighbors(version):
+    if not StopNeighbors.exists(config.NEIGHBOR_MATRIX_DIR):
+        return None
+    return StopNeighbors.load(config.NEIGHBOR_MATRIX_DIR)
+
+def get_stop_viewport(risk_level=None, min_complaints=0):
+    """Bounding-box index and zoom clusters over the stops matching the map filters"""
+    return _build_stop_viewport(data_version(), risk_level, min_complaints)
+
+@st.cache_resource(max_entries=8)
+def _build_stop_viewport(version, risk_level, min_complaints):
+    stops = get_stops_with_risk()
+    stops = stops[stops['risk_level'].notna()]
+    if risk_level is not None:
+        stops = stops[stops['risk_level'] == risk_level]
+    stops = stops[stops['total_complaints'].fillna(0) >= min_complaints]
+
+    return StopViewport(
+        stops,
+        detail_zoom=config.MAP_DETAIL_ZOOM,
+        cells_per_tile=config.MAP_CLUSTER_CELLS_PER_TILE,
+        max_markers=config.MAP_MAX_MARKERS
+    )
+
+def get_tile_store():
+    """Map tile pyramid from scripts/build_tiles.py, or None"""
+    store = TileStore(config.TILES_FILE)
+    return store if store.exists() else None
+
+def get_map_tiles(zoom, bounds):
+    """Tile layers covering a viewport (south, west, north, east); {} without tiles"""
+    store = get_tile_store()
+    if store is None:
+        return {}
+    return store.read(zoom, bounds)
+
+def get_walkable_stops(stop_id, radius_meters=None):
+    """Stops within walking distance of a stop, nearest first"""
+    neighbors = get_stop_neighbors()
+    if neighbors is None:
+        return None
+    return neighbors.neighbors(stop_id, radius_meters)
+
+def get_safe_path(source_id, target_id, weight="cost"):
+    """Safest (weight='cost') or shortest (weight='distance') path between two stops"""
+    graph = get_transit_graph()
+    if graph is None:
+        return None
+    return graph.shortest_path(source_id, target_id, weight=weight)
+
+@shared_cache
+def get_alternative_paths(source_id, target_id, k=3, risk_weight=None):
+    """k alternative paths for a distance/risk tradeoff, or the Pareto front when risk_weight is None.
+
+    Cached per (source, target, k, risk_weight) and data version: each call runs up
+    to five pure-Python Yen searches.
+    """
+    graph = get_transit_graph()
+    if graph is None:
+        return []
+    if risk_weight is None:
+        return graph.pareto_paths(source_id, target_id, k=k)
+    return graph.k_shortest_paths(source_id, target_id, k=k, risk_weight=risk_weight)
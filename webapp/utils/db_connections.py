@@ -1,4 +1,5 @@
 from pymongo import MongoClient
+import pandas as pd
 from neo4j import GraphDatabase
 import streamlit as st
 import config
@@ -21,13 +22,36 @@ def get_mongo_db():
     return client[config.MONGO_DB]
 
 def query_neo4j(cypher_query, parameters=None):
+    return _run_neo4j(cypher_query, parameters, lambda result: [record.data() for record in result])
+
+def query_neo4j_df(cypher_query, parameters=None, dtypes=None):
+    """Run a query straight into a DataFrame, one column at a time.
+
+    Records are tuples, so zip(*result) transposes them into per-column tuples
+    without building a dict per row. dtypes maps column names to pandas dtypes;
+    columns without a hint are inferred. The frame keeps the query's column order,
+    even when it returns no rows.
+    """
+    dtypes = dtypes or {}
+
+    def collect(result):
+        keys = result.keys()
+        columns = list(zip(*result)) or [()] * len(keys)
+        return pd.DataFrame({
+            key: pd.Series(values, dtype=dtypes.get(key))
+            for key, values in zip(keys, columns)
+        }, columns=keys)
+
+    return _run_neo4j(cypher_query, parameters, collect)
+
+def _run_neo4j(cypher_query, parameters, collect):
     driver = get_neo4j_driver()
     start_time = time.time()
 
     try:
         with driver.session() as session:
             result = session.run(cypher_query, parameters or {})
-            records = [record.data() for record in result]
+            records = collect(result)
 
         duration_ms = (time.time() - start_time) * 1000
         QueryLogger.log_neo4j(cypher_query, parameters, duration_ms)
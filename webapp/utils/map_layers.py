@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+from folium.plugins import FastMarkerCluster
+
+# Rows arrive as plain arrays; markers and their popup HTML are built in the browser,
+# the popup only when it is first opened
+_ESCAPE = "function esc(s) { return String(s).replace(/[&<>\"']/g, function (c) { return '&#' + c.charCodeAt(0) + ';'; }); }"
+
+STOP_CALLBACK = """
+function (row) {
+    %s
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+        radius: 6, color: row[2], fillColor: row[2], fillOpacity: 0.7, weight: 2
+    });
+    marker.bindPopup(function () {
+        return '<b>' + esc(row[3]) + '</b><br>' +
+               'Pontuação de Risco: ' + row[4].toFixed(1) + '/100<br>' +
+               'Nível de Risco: ' + esc(row[5]) + '<br>' +
+               'Reclamações: ' + row[6];
+    }, {maxWidth: 200});
+    return marker;
+}
+""" % _ESCAPE
+
+CLUSTER_CALLBACK = """
+function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+        radius: row[3], color: row[2], fillColor: row[2], fillOpacity: 0.5, weight: 2
+    });
+    marker.bindTooltip(row[4] + ' paradas');
+    marker.bindPopup(function () {
+        return '<b>' + row[4] + ' paradas</b><br>' +
+               'Risco Médio: ' + row[5].toFixed(1) + '/100<br>' +
+               'Risco Máximo: ' + row[6].toFixed(1) + '/100<br>' +
+               'Paradas de Alto Risco: ' + row[7];
+    }, {maxWidth: 200});
+    return marker;
+}
+"""
+
+
+def risk_colors(risk_score_normalized):
+    """red / orange / green for normalized risk scores >= 67 / >= 33 / below"""
+    scores = np.nan_to_num(np.asarray(risk_score_normalized, dtype=np.float64))
+    return np.select([scores >= 67, scores >= 33], ['red', 'orange'], 'green')
+
+
+def _rows(columns):
+    # Column-wise frame to row lists; NaN becomes null in the page's JSON
+    frame = pd.DataFrame(columns).astype(object)
+    return frame.where(frame.notna(), None).to_numpy().tolist()
+
+
+def stop_marker_layer(stops, name="Paradas", disable_clustering_at_zoom=16):
+    """All stops as one client-side clustered layer"""
+    score = stops['risk_score_normalized'].to_numpy(dtype=np.float64)
+    data = _rows({
+        'lat': stops['lat'].to_numpy(dtype=np.float64),
+        'lon': stops['lon'].to_numpy(dtype=np.float64),
+        'color': risk_colors(score),
+        'name': stops['name'].to_numpy(dtype=object),
+        'score': np.nan_to_num(score),
+        'level': stops['risk_level'].to_numpy(dtype=object),
+        'complaints': stops['total_complaints'].fillna(0).to_numpy(dtype=np.int64),
+    })
+    return FastMarkerCluster(
+        data, callback=STOP_CALLBACK, name=name,
+        options={'disableClusteringAtZoom': disable_clustering_at_zoom, 'chunkedLoading': True}
+    )
+
+
+def cluster_marker_layer(clusters, name="Agrupamentos"):
+    """Pre-aggregated stop clusters as sized circles, without client-side clustering"""
+    count = clusters['count'].to_numpy(dtype=np.int64)
+    data = _rows({
+        'lat': clusters['lat'].to_numpy(dtype=np.float64),
+        'lon': clusters['lon'].to_numpy(dtype=np.float64),
+        'color': risk_colors(clusters['avg_risk']),
+        'radius': np.minimum(6 + np.sqrt(count), 30),
+        'count': count,
+        'avg_risk': clusters['avg_risk'].to_numpy(dtype=np.float64),
+        'max_risk': clusters['max_risk'].to_numpy(dtype=np.float64),
+        'high_risk_stops': clusters['high_risk_stops'].to_numpy(dtype=np.int64),
+    })
+    return FastMarkerCluster(
+        data, callback=CLUSTER_CALLBACK, name=name, options={'disableClusteringAtZoom': 0}
+    )